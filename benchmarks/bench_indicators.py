@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地技术指标引擎微基准测试
+
+使用随机游走生成的OHLCV数据，测量单只股票一次性计算全部指标（含信号汇总）的耗时。
+
+使用方法:
+    python benchmarks/bench_indicators.py
+    python benchmarks/bench_indicators.py --bars 250 1000 5000 --repeat 200
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.tools.indicators import compute_indicators, summarize_indicators
+
+
+def make_bars(n: int, seed: int = 0):
+    """生成随机游走行情"""
+    rng = np.random.default_rng(seed)
+    close = 10.0 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    high = close * (1 + rng.uniform(0, 0.02, n))
+    low = close * (1 - rng.uniform(0, 0.02, n))
+    volume = rng.integers(1_000, 100_000, n).astype(np.float64)
+    return close, high, low, volume
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地技术指标引擎微基准测试")
+    parser.add_argument("--bars", type=int, nargs="+", default=[250, 1000, 5000], help="每只股票的K线数量")
+    parser.add_argument("--repeat", type=int, default=100, help="重复次数 (默认: 100)")
+    args = parser.parse_args()
+    
+    print(f"{'K线数':>8}{'中位数(ms)':>12}{'P95(ms)':>12}")
+    print("-" * 32)
+    for n in args.bars:
+        close, high, low, volume = make_bars(n)
+        # 预热
+        summarize_indicators(compute_indicators(close, high, low, volume), close)
+        
+        samples = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            indicators = compute_indicators(close, high, low, volume)
+            summarize_indicators(indicators, close)
+            samples.append((time.perf_counter() - start) * 1000)
+        
+        samples.sort()
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        print(f"{n:>8}{statistics.median(samples):>12.3f}{p95:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
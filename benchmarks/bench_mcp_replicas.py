@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MCP多副本负载均衡基准测试
+
+在本地启动若干个替身MCP服务器作为同一逻辑服务器的副本，通过MCPToolLayer并发调用工具，
+测量吞吐量和各副本的请求分布；可在压测中途停掉一个副本，验证故障切换和健康检查。
+
+使用方法:
+    python benchmarks/bench_mcp_replicas.py
+    python benchmarks/bench_mcp_replicas.py --replicas 1 3 --calls 200 --concurrency 20
+    python benchmarks/bench_mcp_replicas.py --replicas 3 --kill-one
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.tools.mcp_layer import MCPToolLayer
+
+STUB_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_mcp_server.py")
+
+
+def start_replicas(count: int, base_port: int, latency: float):
+    """启动替身服务器子进程"""
+    processes = []
+    for index in range(count):
+        processes.append(subprocess.Popen(
+            [sys.executable, STUB_SERVER, "--port", str(base_port + index), "--latency", str(latency)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        ))
+    return processes
+
+
+async def wait_until_ready(ports, timeout: float = 15.0):
+    """等待替身服务器端口可连接"""
+    deadline = time.perf_counter() + timeout
+    for port in ports:
+        while True:
+            try:
+                _, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.close()
+                break
+            except OSError:
+                if time.perf_counter() > deadline:
+                    raise
+                await asyncio.sleep(0.2)
+
+
+async def run(count: int, args) -> dict:
+    processes = start_replicas(count, args.base_port, args.latency)
+    mcp_config = {"servers": {"finance-data-server": {
+        "transport": "sse",
+        "replicas": [{"url": f"http://127.0.0.1:{args.base_port + index}/sse"} for index in range(count)],
+        "health_check_interval": 2
+    }}}
+    
+    try:
+        await wait_until_ready([args.base_port + index for index in range(count)])
+        layer = MCPToolLayer(mcp_config, {"timeout": 10, "circuit_breaker": {"enabled": False}})
+        await layer.initialize()
+        semaphore = asyncio.Semaphore(args.concurrency)
+        failures = 0
+        
+        async def call(index: int):
+            nonlocal failures
+            async with semaphore:
+                try:
+                    await layer.call_tool("money_flow", {"ts_code": f"{600000 + index % 50}.SH"})
+                except Exception:
+                    failures += 1
+        
+        async def kill_later():
+            await asyncio.sleep(args.kill_after)
+            processes[0].terminate()
+            print(f"  💥 已停止副本 1（端口 {args.base_port}）")
+        
+        killer = asyncio.create_task(kill_later()) if args.kill_one and count > 1 else None
+        start = time.perf_counter()
+        await asyncio.gather(*[call(index) for index in range(args.calls)])
+        elapsed = time.perf_counter() - start
+        if killer:
+            killer.cancel()
+        
+        status = layer.get_status()["replicas"]["finance-data-server"]
+        await layer.close()
+        return {
+            "elapsed": elapsed,
+            "failures": failures,
+            "distribution": [replica["total_calls"] for replica in status["replicas"].values()],
+            "failovers": status["failover_count"]
+        }
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MCP多副本负载均衡基准测试")
+    parser.add_argument("--replicas", type=int, nargs="+", default=[1, 3], help="副本数量")
+    parser.add_argument("--calls", type=int, default=200, help="工具调用次数 (默认: 200)")
+    parser.add_argument("--concurrency", type=int, default=20, help="并发数 (默认: 20)")
+    parser.add_argument("--latency", type=float, default=0.05, help="替身服务器模拟延迟秒数 (默认: 0.05)")
+    parser.add_argument("--base-port", type=int, default=3201, help="替身服务器起始端口 (默认: 3201)")
+    parser.add_argument("--kill-one", action="store_true", help="压测中途停止第一个副本")
+    parser.add_argument("--kill-after", type=float, default=1.0, help="停止副本前等待的秒数 (默认: 1.0)")
+    args = parser.parse_args()
+    
+    print(f"{'副本数':>6}{'耗时(s)':>10}{'吞吐(次/s)':>12}{'失败':>6}{'切换':>6}  请求分布")
+    print("-" * 60)
+    for count in args.replicas:
+        result = asyncio.run(run(count, args))
+        print(f"{count:>6}{result['elapsed']:>10.2f}{args.calls / result['elapsed']:>12.1f}"
+              f"{result['failures']:>6}{result['failovers']:>6}  {result['distribution']}")
+
+
+if __name__ == "__main__":
+    main()
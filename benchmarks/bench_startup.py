@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动耗时基准测试
+
+在独立子进程中测量各运行模式从解释器启动到就绪的耗时（含导入开销），
+用于跟踪 main.py 的启动延迟。
+
+使用方法:
+    python benchmarks/bench_startup.py            # 默认每项运行5次
+    python benchmarks/bench_startup.py --repeat 10
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 各场景在子进程中执行的代码：模拟对应模式在进入业务逻辑前需要完成的导入
+SCENARIOS = {
+    "help": None,  # 直接运行 python main.py --help
+    "cli": "import main; main.check_dependencies('cli'); import src.agents.team_manager",
+    "demo": "import main; main.check_dependencies('demo'); import src.agents.team_manager",
+    "web": "import main; main.check_dependencies('web'); import yaml",
+    # 对照组：旧版启动流程，无论何种模式都先导入全部依赖
+    "eager(旧版)": (
+        "import main; "
+        "[__import__(m) for m in ('langchain_openai', 'langchain_mcp_adapters', "
+        "'langgraph', 'dotenv', 'yaml', 'streamlit')]; "
+        "import src.agents.team_manager"
+    ),
+}
+
+
+def run_once(code) -> float:
+    """运行一次子进程并返回耗时（毫秒）"""
+    if code is None:
+        cmd = [sys.executable, "main.py", "--help"]
+    else:
+        cmd = [sys.executable, "-c", code]
+    
+    start = time.perf_counter()
+    result = subprocess.run(cmd, cwd=PROJECT_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    elapsed = (time.perf_counter() - start) * 1000
+    
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode("utf-8", errors="replace").strip().splitlines()[-1])
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="main.py 各模式启动耗时基准测试")
+    parser.add_argument("--repeat", type=int, default=5, help="每个场景的重复次数 (默认: 5)")
+    args = parser.parse_args()
+    
+    print(f"{'场景':<14}{'中位数(ms)':>12}{'最小(ms)':>12}{'最大(ms)':>12}")
+    print("-" * 50)
+    for name, code in SCENARIOS.items():
+        try:
+            samples = [run_once(code) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"{name:<14}{'失败':>12}  {e}")
+            continue
+        print(f"{name:<14}{statistics.median(samples):>12.1f}{min(samples):>12.1f}{max(samples):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
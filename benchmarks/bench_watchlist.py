@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自选股定时运行离线演练
+
+在本地启动替身MCP服务器和替身大模型服务器，基于 config.yaml 生成指向替身服务的临时配置，
+用 WatchlistScheduler 立即运行一批自选股（不等待cron触发），输出批次报告：
+各股票耗时、token用量、预算跳过情况，以及完成时间相对截止时间的余量。
+结果库、检查点和报告都写入临时目录，不影响正式数据。
+
+使用方法:
+    python benchmarks/bench_watchlist.py
+    python benchmarks/bench_watchlist.py --stocks 000001 600036 000002 --concurrency 2 --token-budget 60000
+    python benchmarks/bench_watchlist.py --max-rps 8 --llm-rpm 420  # 替身服务限流8次/秒，客户端限速7次/秒
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import urllib.request
+from datetime import datetime, timedelta
+
+import yaml
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+
+from src.agents.team_manager import AgentTeamManager
+from src.agents.watchlist_scheduler import WatchlistScheduler
+from src.monitoring.logs import setup_logging
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+async def wait_until_ready(ports, timeout: float = 15.0):
+    """等待替身服务器端口可连接"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    for port in ports:
+        while True:
+            try:
+                _, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.close()
+                break
+            except OSError:
+                if loop.time() > deadline:
+                    raise
+                await asyncio.sleep(0.2)
+
+
+def write_offline_config(workdir: str, args) -> tuple:
+    """生成指向替身服务的配置文件和MCP配置文件"""
+    with open(os.path.join(PROJECT_ROOT, "config.yaml"), 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    
+    for agent_config in config["agents"].values():
+        agent_config.update({"model": "stub", "api_key": "stub",
+                             "base_url": f"http://127.0.0.1:{args.llm_port}/v1"})
+        agent_config.pop("phases", None)
+    config["result_store"] = {"root": os.path.join(workdir, "results")}
+    config["checkpoint"] = {"enabled": True, "root": os.path.join(workdir, "checkpoints")}
+    config["logging"] = {**(config.get("logging") or {}), "log_file": os.path.join(workdir, "agent_team.log"),
+                         "enable_conversation_logging": False}
+    config["llm_rate_limit"] = {"requests_per_minute": args.llm_rpm, "burst": 5}
+    config["scheduler"] = {**(config.get("scheduler") or {}), "max_rounds": args.rounds}
+    config["watchlist"] = {
+        **(config.get("watchlist") or {}),
+        "stocks": args.stocks,
+        "max_concurrency": args.concurrency,
+        "token_budget": args.token_budget,
+        "estimated_tokens_per_run": args.estimated_tokens,
+        "start_interval_seconds": args.start_interval,
+        "jitter_seconds": 0,
+        "incremental": False,
+        "deadline": (datetime.now() + timedelta(minutes=args.deadline_minutes)).strftime("%H:%M"),
+        "report_dir": os.path.join(workdir, "reports")
+    }
+    
+    config_file = os.path.join(workdir, "config.yaml")
+    with open(config_file, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(config, f, allow_unicode=True)
+    mcp_file = os.path.join(workdir, "mcp.json")
+    with open(mcp_file, 'w', encoding='utf-8') as f:
+        json.dump({"servers": {"finance-data-server": {
+            "url": f"http://127.0.0.1:{args.mcp_port}/sse", "transport": "sse"}}}, f)
+    return config, config_file, mcp_file
+
+
+async def run(args):
+    processes = [
+        subprocess.Popen([sys.executable, os.path.join(BENCH_DIR, "stub_mcp_server.py"), "--port", str(args.mcp_port)],
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL),
+        subprocess.Popen([sys.executable, os.path.join(BENCH_DIR, "stub_llm_server.py"), "--port", str(args.llm_port),
+                          "--latency", str(args.llm_latency), "--max-rps", str(args.max_rps)],
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    ]
+    try:
+        await wait_until_ready([args.mcp_port, args.llm_port])
+        with tempfile.TemporaryDirectory() as workdir:
+            config, config_file, mcp_file = write_offline_config(workdir, args)
+            setup_logging(config["logging"])
+            scheduler = WatchlistScheduler(config["watchlist"], lambda: AgentTeamManager(config_file, mcp_file))
+            report = await scheduler.run_once()
+        with urllib.request.urlopen(f"http://127.0.0.1:{args.llm_port}/stats") as response:
+            report["llm_stats"] = json.loads(response.read())
+        return report
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="自选股定时运行离线演练")
+    parser.add_argument("--stocks", nargs="+", default=["000001", "600036", "000002"], help="自选股列表")
+    parser.add_argument("--concurrency", type=int, default=2, help="并发团队数 (默认: 2)")
+    parser.add_argument("--token-budget", type=int, default=0, help="token预算，0表示不限 (默认: 0)")
+    parser.add_argument("--estimated-tokens", type=int, default=40000, help="首次运行完成前每次运行预留的token数 (默认: 40000)")
+    parser.add_argument("--start-interval", type=float, default=1.0, help="相邻运行启动间隔秒数 (默认: 1.0)")
+    parser.add_argument("--deadline-minutes", type=int, default=10, help="截止时间距现在的分钟数 (默认: 10)")
+    parser.add_argument("--rounds", type=int, default=2, help="辩论轮数上限 (默认: 2)")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="替身模型的模拟延迟秒数 (默认: 0.05)")
+    parser.add_argument("--max-rps", type=int, default=0, help="替身模型每秒请求上限，0表示不限 (默认: 0)")
+    parser.add_argument("--llm-rpm", type=int, default=0, help="客户端模型请求限速（次/分钟），0表示不限 (默认: 0)")
+    parser.add_argument("--mcp-port", type=int, default=3301, help="替身MCP服务器端口 (默认: 3301)")
+    parser.add_argument("--llm-port", type=int, default=3399, help="替身模型服务器端口 (默认: 3399)")
+    args = parser.parse_args()
+    
+    report = asyncio.run(run(args))
+    print(f"\n{'股票':<10}{'状态':<16}{'槽位':>6}{'耗时(s)':>10}{'token':>10}")
+    print("-" * 52)
+    for item in report["results"]:
+        print(f"{item['stock_code']:<10}{item['status']:<16}{item.get('slot', '-'):>6}"
+              f"{item.get('seconds', 0):>10.1f}{item.get('tokens', 0):>10}")
+    print("-" * 52)
+    print(f"总耗时 {report['elapsed_seconds']:.1f}s，共 {report['tokens_used']} token，"
+          f"截止余量 {report['slack_seconds']:.0f}s（{'按时' if report['met_deadline'] else '超时'}）")
+    print(f"模型请求 {report['llm_stats']['requests']} 次，其中被限流 {report['llm_stats']['throttled']} 次")
+
+
+if __name__ == "__main__":
+    main()
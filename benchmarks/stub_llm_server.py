@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地替身大模型服务器
+
+提供OpenAI兼容的 /v1/chat/completions 接口，返回确定性的模拟回复和token用量，
+可配置响应延迟和每秒请求上限（超出时返回429，模拟服务商限流）。
+请求中带有工具且尚未调用过工具时，先发起一次行情工具调用，以便同时演练MCP工具链路。
+配合 stub_mcp_server.py 可在完全离线的环境下运行完整的智能体流水线。
+
+使用方法:
+    python benchmarks/stub_llm_server.py --port 3199
+    python benchmarks/stub_llm_server.py --port 3199 --latency 0.5 --max-rps 5
+
+智能体配置中将 base_url 设为 http://127.0.0.1:3199/v1，model 和 api_key 可任意填写。
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CODE_PARAMS = ("code", "ts_code", "stock_code", "symbol")
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 2)
+
+
+def pick_tool_call(tools, code: str):
+    """选择第一个只需要股票代码参数的工具"""
+    for tool in tools:
+        function = tool.get("function") or {}
+        parameters = function.get("parameters") or {}
+        required = parameters.get("required") or []
+        if required and all(name in CODE_PARAMS for name in required):
+            return {"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+                    "function": {"name": function["name"], "arguments": json.dumps({name: code for name in required})}}
+    return None
+
+
+def build_reply(body: dict) -> dict:
+    messages = body.get("messages") or []
+    text = "\n".join(str(message.get("content") or "") for message in messages)
+    match = re.search(r"\d{6}(?:\.(?:SH|SZ|BJ))?", text)
+    code = match.group(0) if match else "000001"
+    
+    message = {"role": "assistant", "content": ""}
+    tools = body.get("tools") or []
+    if tools and not any(item.get("role") == "tool" for item in messages):
+        tool_call = pick_tool_call(tools, code)
+        if tool_call:
+            message["tool_calls"] = [tool_call]
+    if "tool_calls" not in message:
+        message["content"] = (
+            f"针对{code}的模拟观点：近期走势震荡，成交量平稳，基本面没有明显变化，"
+            f"估值处于历史中位附近，短期风险可控。综合判断：持有，建议仓位维持在中等水平。"
+        )
+    
+    prompt_tokens = estimate_tokens(json.dumps(messages, ensure_ascii=False))
+    completion_tokens = estimate_tokens(message["content"] or json.dumps(message.get("tool_calls")))
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{"index": 0, "message": message,
+                     "finish_reason": "tool_calls" if "tool_calls" in message else "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens}
+    }
+
+
+def create_handler(args):
+    lock = threading.Lock()
+    window = {"second": 0, "count": 0, "requests": 0, "throttled": 0}
+    
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            
+            with lock:
+                window["requests"] += 1
+                second = int(time.time())
+                if second != window["second"]:
+                    window["second"], window["count"] = second, 0
+                window["count"] += 1
+                throttled = args.max_rps and window["count"] > args.max_rps
+                if throttled:
+                    window["throttled"] += 1
+            if throttled:
+                self._send(429, {"error": {"message": "rate limit exceeded", "type": "rate_limit_error"}})
+                return
+            
+            time.sleep(args.latency)
+            self._send(200, build_reply(body))
+        
+        def do_GET(self):
+            # 简单的统计接口，便于基准测试读取限流次数
+            with lock:
+                stats = {"requests": window["requests"], "throttled": window["throttled"]}
+            self._send(200, stats)
+        
+        def _send(self, status: int, payload: dict):
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        
+        def log_message(self, format, *args):
+            pass
+    
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地替身大模型服务器")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址 (默认: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=3199, help="监听端口 (默认: 3199)")
+    parser.add_argument("--latency", type=float, default=0.2, help="每次请求的模拟延迟秒数 (默认: 0.2)")
+    parser.add_argument("--max-rps", type=int, default=0, help="每秒请求上限，超出返回429，0表示不限 (默认: 0)")
+    args = parser.parse_args()
+    
+    server = ThreadingHTTPServer((args.host, args.port), create_handler(args))
+    server.daemon_threads = True
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
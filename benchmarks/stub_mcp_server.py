@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地替身MCP服务器
+
+提供与金融数据服务器同名的工具（stock_data、money_flow、company_performance），
+返回确定性的模拟数据，可配置响应延迟和失败率，用于离线测试多副本负载均衡、
+故障切换和熔断，无需访问真实数据源。
+
+使用方法:
+    python benchmarks/stub_mcp_server.py --port 3101
+    python benchmarks/stub_mcp_server.py --port 3102 --latency 0.2 --fail-rate 0.1
+"""
+
+import argparse
+import asyncio
+import json
+import random
+from datetime import date, timedelta
+
+from mcp.server.fastmcp import FastMCP
+
+
+def make_bars(code: str, start_date: str = "", end_date: str = "", days: int = 400):
+    """按股票代码生成确定性的模拟日线"""
+    rng = random.Random(code)
+    price = 10.0
+    bars = []
+    current = date.today() - timedelta(days=days)
+    for _ in range(days):
+        current += timedelta(days=1)
+        if current.weekday() >= 5:
+            continue
+        open_price = price
+        price = price * (1 + rng.gauss(0, 0.02))
+        trade_date = current.strftime("%Y%m%d")
+        if (start_date and trade_date < start_date) or (end_date and trade_date > end_date):
+            continue
+        bars.append({
+            "trade_date": trade_date,
+            "open": round(open_price, 2),
+            "high": round(max(open_price, price) * 1.01, 2),
+            "low": round(min(open_price, price) * 0.99, 2),
+            "close": round(price, 2),
+            "vol": rng.randint(100000, 500000),
+            "amount": round(rng.uniform(1e7, 5e7), 2)
+        })
+    return bars
+
+
+def create_server(args) -> FastMCP:
+    server = FastMCP(f"stub-finance-data-{args.port}", host=args.host, port=args.port, log_level="WARNING")
+    
+    async def simulate():
+        """模拟网络和后端延迟以及偶发故障"""
+        await asyncio.sleep(args.latency)
+        if random.random() < args.fail_rate:
+            raise RuntimeError(f"stub server {args.port} simulated failure")
+    
+    @server.tool()
+    async def stock_data(code: str, market_type: str = "cn", start_date: str = "", end_date: str = "") -> str:
+        """获取股票日线行情"""
+        await simulate()
+        return json.dumps(make_bars(code, start_date, end_date), ensure_ascii=False)
+    
+    @server.tool()
+    async def money_flow(ts_code: str, start_date: str = "", end_date: str = "") -> str:
+        """获取个股资金流向"""
+        await simulate()
+        rng = random.Random(ts_code)
+        items = [[bar["trade_date"], round(rng.uniform(-5000, 5000), 2)]
+                 for bar in make_bars(ts_code, start_date, end_date)]
+        return json.dumps({"fields": ["trade_date", "net_mf_amount"], "items": items}, ensure_ascii=False)
+    
+    @server.tool()
+    async def company_performance(ts_code: str, data_type: str = "indicators",
+                                  start_date: str = "", end_date: str = "") -> str:
+        """获取公司财务指标"""
+        await simulate()
+        rng = random.Random(ts_code + data_type)
+        return json.dumps([{"end_date": f"{year}1231", "roe": round(rng.uniform(2, 20), 2),
+                            "grossprofit_margin": round(rng.uniform(10, 60), 2)}
+                           for year in range(2020, 2025)], ensure_ascii=False)
+    
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地替身MCP服务器")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址 (默认: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=3101, help="监听端口 (默认: 3101)")
+    parser.add_argument("--latency", type=float, default=0.05, help="每次调用的模拟延迟秒数 (默认: 0.05)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="模拟失败概率 (默认: 0)")
+    args = parser.parse_args()
+    
+    create_server(args).run(transport="sse")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,10 +8,14 @@ A-Scope Research - 金融智能体团队主入口
 1. 命令行模式: python main.py --mode cli --stock 000001
 2. Web界面模式: python main.py --mode web
 3. 演示模式: python main.py --mode demo
+4. 组合风险模式: python main.py --mode portfolio --portfolio holdings.csv
+5. 自选股定时模式: python main.py --mode schedule
+6. 量化初筛模式: python main.py --mode screen
 """
 
 import argparse
 import asyncio
+import importlib.util
 import sys
 import os
 from datetime import datetime
@@ -19,7 +23,29 @@ from datetime import datetime
 # 添加项目根目录到路径
 sys.path.append(os.path.dirname(__file__))
 
-from src.agents.team_manager import AgentTeamManager
+# 各运行模式所需的依赖包：pip包名 -> 导入名
+# 只检查当前模式真正需要的包，避免 --help 或CLI模式承担Streamlit等重量级导入
+COMMON_PACKAGES = {
+    'python-dotenv': 'dotenv',
+    'pyyaml': 'yaml'
+}
+
+AGENT_PACKAGES = {
+    'langchain-openai': 'langchain_openai',
+    'langchain-mcp-adapters': 'langchain_mcp_adapters',
+    'langgraph': 'langgraph',
+    'numpy': 'numpy',
+    'pandas': 'pandas'
+}
+
+MODE_PACKAGES = {
+    'cli': {**COMMON_PACKAGES, **AGENT_PACKAGES},
+    'demo': {**COMMON_PACKAGES, **AGENT_PACKAGES},
+    'web': {**COMMON_PACKAGES, **AGENT_PACKAGES, 'streamlit': 'streamlit'},
+    'portfolio': {**COMMON_PACKAGES, **AGENT_PACKAGES},
+    'schedule': {**COMMON_PACKAGES, **AGENT_PACKAGES},
+    'screen': {**COMMON_PACKAGES, **AGENT_PACKAGES}
+}
 
 def print_banner():
     """打印系统横幅"""
@@ -36,9 +62,18 @@ def print_banner():
     """
     print(banner)
 
-async def cli_mode(stock_code: str):
-    """命令行模式"""
-    print(f"\n🚀 启动命令行分析模式 - 股票代码: {stock_code}")
+async def cli_mode(stock_code: str, incremental: bool = False, resume: str = None):
+    """命令行模式
+    
+    Args:
+        stock_code: 股票代码（从检查点恢复时可为空，取检查点中的股票）
+        incremental: 是否以结果库中上一次运行为基线做增量分析
+        resume: 要继续的运行ID，从该运行最后完成的步骤继续
+    """
+    print(f"\n🚀 启动命令行分析模式 - {f'继续运行: {resume}' if resume else f'股票代码: {stock_code}'}")
+    
+    # 按需导入，避免非CLI路径承担智能体框架的导入开销
+    from src.agents.team_manager import AgentTeamManager
     
     # 初始化团队管理器
     team_manager = AgentTeamManager("config.yaml")
@@ -48,9 +83,33 @@ async def cli_mode(stock_code: str):
         print("\n📋 正在初始化智能体团队...")
         await team_manager.initialize_team()
         
-        # 分析股票
-        print(f"\n📊 开始分析股票 {stock_code}...")
-        analysis_result = await team_manager.analyze_stock(stock_code)
+        # 每个阶段完成后写入检查点；恢复时跳过已完成的阶段
+        if resume:
+            state = team_manager.resume_run(resume)
+            stock_code = state['stock_code']
+            stage = state['stage']
+        else:
+            team_manager.start_run(stock_code)
+            state = {}
+            stage = "analysis"
+        
+        if stage in ("analysis", "pipeline"):
+            # 分析股票（增量模式下没有可用基线时回退到完整分析）
+            print(f"\n📊 开始分析股票 {stock_code}...")
+            analysis_result = await team_manager.analyze_stock_incremental(stock_code) if incremental and not resume else None
+            if analysis_result is None:
+                # 启用依赖调度时分析与辩论交叠进行，辩论结果随分析结果一起返回
+                if stage == "pipeline" or (not resume and (team_manager.config.get('scheduler') or {}).get('enabled', False)):
+                    analysis_result = await team_manager.run_pipeline(stock_code, resume=state.get('pipeline'))
+                else:
+                    analysis_result = await team_manager.analyze_stock(stock_code, resume=bool(resume))
+            incremental_info = analysis_result.get('incremental')
+            if incremental_info:
+                team_manager.checkpoint("debate", debate_progress=None, incremental=incremental_info)
+        else:
+            print(f"\n⏩ 分析阶段已完成，复用检查点中的 {len(team_manager.analysis_results)} 份分析")
+            analysis_result = {"analysis_results": team_manager.analysis_results}
+            incremental_info = state.get('incremental')
         
         # 显示分析结果
         print("\n" + "="*60)
@@ -72,12 +131,26 @@ async def cli_mode(stock_code: str):
             else:
                 print(f"\n❌ {result.get('agent_name', '未知')} 分析失败: {result.get('error', '未知错误')}")
         
-        # 进行团队辩论
+        # 进行团队辩论（增量分析无重大变化时跳过）
         print("\n" + "="*60)
         print("🗣️ 开始团队辩论")
         print("="*60)
         
-        debate_results = await team_manager.conduct_debate(stock_code, analysis_result.get('analysis_results', []))
+        if 'debate_history' in analysis_result:
+            debate_results = analysis_result['debate_history']
+        elif stage in ("decision", "done"):
+            debate_results = team_manager.debate_history
+        elif incremental_info and not incremental_info['material']:
+            print(f"⏭️ 相对上次运行 {incremental_info['previous_run_id']} 无重大变化，跳过辩论")
+            debate_results = []
+            team_manager.checkpoint("decision")
+        else:
+            if incremental_info:
+                print(f"🔔 重大变化: {'；'.join(incremental_info['reasons'])}")
+            debate_results = await team_manager.conduct_debate(
+                stock_code, analysis_result.get('analysis_results', []),
+                resume=state.get('debate_progress') if stage == "debate" else None
+            )
         
         # 显示辩论结果
         current_round = 0
@@ -96,7 +169,7 @@ async def cli_mode(stock_code: str):
         print("🎯 最终投资决策")
         print("="*60)
         
-        final_decisions = await team_manager.make_final_decisions(stock_code)
+        final_decisions = await team_manager.make_final_decisions(stock_code, resume=bool(resume))
         
         # 显示最终决策
         for decision in final_decisions:
@@ -107,21 +180,280 @@ async def cli_mode(stock_code: str):
             else:
                 print(f"\n❌ {decision.get('agent_name', '未知')} 决策失败: {decision.get('error', '未知错误')}")
         
-        # 导出结果
+        # 显示token用量（含服务商前缀缓存命中情况）
+        token_usage = team_manager.get_team_status().get('token_usage', {})
+        print(f"\n🧮 Token用量: 输入 {token_usage.get('input_tokens', 0)} "
+              f"(缓存命中 {token_usage.get('cached_tokens', 0)}, {token_usage.get('cache_hit_rate', 0):.1%}), "
+              f"输出 {token_usage.get('output_tokens', 0)}, 模型调用 {token_usage.get('llm_calls', 0)} 次")
+        
+        # 导出结果，并写入结果库作为下次增量分析的基线
         print("\n📄 正在导出分析结果...")
         filename = team_manager.export_results()
         if filename:
             print(f"✅ 结果已导出到: {filename}")
+        await team_manager.save_run(stock_code, {"incremental": incremental_info} if incremental_info else None)
         
         print("\n🎉 分析完成！")
-        
+    
     except Exception as e:
         print(f"\n❌ 分析过程中发生错误: {e}")
+        if team_manager.run_id and team_manager.checkpoints is not None:
+            print(f"💾 可使用 --resume {team_manager.run_id} 从最后完成的步骤继续")
+    
+    except asyncio.CancelledError:
+        if team_manager.run_id and team_manager.checkpoints is not None:
+            print(f"\n💾 运行已中断，可使用 --resume {team_manager.run_id} 从最后完成的步骤继续")
+        raise
     
     finally:
         # 清理资源
         await team_manager.close_team()
 
+async def replay_mode(source: str, config_file: str, start_stage: str = "debate", stock_code: str = None):
+    """离线重放模式：基于已保存的分析结果重新运行辩论和/或决策阶段，不连接MCP服务器
+    
+    Args:
+        source: 导出的analysis_results_*.json文件路径，或结果库中的运行ID
+        config_file: 配置文件路径
+        start_stage: 从哪个阶段开始重放，debate为辩论和决策，decision为沿用保存的辩论只重做决策
+        stock_code: 股票代码，保存的结果中没有记录时必须提供
+    """
+    print(f"\n🔁 启动离线重放模式 - 来源: {source}，从{'辩论' if start_stage == 'debate' else '决策'}阶段开始")
+    
+    from src.agents.team_manager import AgentTeamManager
+    
+    team_manager = AgentTeamManager(config_file)
+    
+    try:
+        run = team_manager.load_saved_run(source)
+        stock_code = stock_code or run.get("stock_code")
+        if not stock_code:
+            print("❌ 保存的结果中没有股票代码，请使用 --stock 参数指定")
+            return
+        team_manager.run_state["stock_code"] = stock_code
+        
+        start_time = datetime.now()
+        await team_manager.initialize_team(offline=True)
+        print(f"⏱️ 离线初始化耗时 {(datetime.now() - start_time).total_seconds():.1f} 秒")
+        
+        if start_stage == "debate":
+            print("\n" + "="*60)
+            print("🗣️ 重放团队辩论")
+            print("="*60)
+            debate_results = await team_manager.conduct_debate(stock_code, team_manager.analysis_results)
+            current_round = 0
+            for debate in debate_results:
+                if debate.get('round', 1) != current_round:
+                    current_round = debate.get('round', 1)
+                    print(f"\n🔄 第 {current_round} 轮辩论")
+                    print("-" * 40)
+                print(f"\n💬 {debate.get('agent_name', '未知')} ({debate.get('role', '未知')})")
+                print(debate.get('response', '无回应内容'))
+        
+        print("\n" + "="*60)
+        print("🎯 重放最终决策")
+        print("="*60)
+        for decision in await team_manager.make_final_decisions(stock_code):
+            if 'error' not in decision:
+                print(f"\n🎯 {decision.get('agent_name', '未知')} ({decision.get('role', '未知')})")
+                print("-" * 40)
+                print(decision.get('decision', '无决策内容'))
+            else:
+                print(f"\n❌ {decision.get('agent_name', '未知')} 决策失败: {decision.get('error', '未知错误')}")
+        
+        token_usage = team_manager.get_team_status().get('token_usage', {})
+        print(f"\n🧮 Token用量: 输入 {token_usage.get('input_tokens', 0)}, 输出 {token_usage.get('output_tokens', 0)}, "
+              f"模型调用 {token_usage.get('llm_calls', 0)} 次")
+        
+        # 重放结果只导出文件，不写入结果库，避免调参过程中的结果成为增量分析的基线
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        team_manager.export_results(f"replay_results_{timestamp}.json")
+    
+    except Exception as e:
+        print(f"\n❌ 重放过程中发生错误: {e}")
+    
+    finally:
+        await team_manager.close_team()
+
+def load_holdings(path: str):
+    """加载持仓文件
+    
+    支持两种格式：
+    - JSON: {"000001": 0.1, ...} 或 [{"code": "000001", "weight": 0.1, "sector": "银行"}, ...]
+    - CSV: 每行 code,weight[,sector]，可带表头
+    
+    Returns:
+        (持仓权重字典, 行业字典)
+    """
+    import csv
+    import json
+    
+    holdings = {}
+    sectors = {}
+    
+    if path.lower().endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            holdings = {str(code): float(weight) for code, weight in data.items()}
+        else:
+            for item in data:
+                holdings[str(item['code'])] = float(item['weight'])
+                if item.get('sector'):
+                    sectors[str(item['code'])] = item['sector']
+        return holdings, sectors
+    
+    with open(path, 'r', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            if len(row) < 2 or not row[0].strip():
+                continue
+            try:
+                weight = float(row[1])
+            except ValueError:
+                continue  # 表头
+            code = row[0].strip()
+            holdings[code] = weight
+            if len(row) > 2 and row[2].strip():
+                sectors[code] = row[2].strip()
+    return holdings, sectors
+
+async def portfolio_mode(portfolio_file: str, config_file: str):
+    """组合风险分析模式"""
+    import json
+    from src.agents.team_manager import AgentTeamManager
+    
+    holdings, sectors = load_holdings(portfolio_file)
+    print(f"\n🛡️ 启动组合风险分析模式 - 持仓数量: {len(holdings)}")
+    
+    team_manager = AgentTeamManager(config_file)
+    
+    try:
+        print("\n📋 正在初始化智能体团队...")
+        await team_manager.initialize_team()
+        
+        result = await team_manager.analyze_portfolio(holdings, sectors)
+        if 'error' in result:
+            print(f"\n❌ 组合分析失败: {result['error']}")
+            return
+        
+        print("\n" + "="*60)
+        print("📊 组合风险指标")
+        print("="*60)
+        print(json.dumps(result['portfolio_risk'], ensure_ascii=False, indent=2))
+        
+        commentary = result.get('commentary') or {}
+        if commentary.get('commentary'):
+            print("\n" + "="*60)
+            print(f"🛡️ {commentary.get('agent_name', '风险管理师')} 的评述")
+            print("="*60)
+            print(commentary['commentary'])
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"portfolio_results_{timestamp}.json"
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ 结果已导出到: {filename}")
+    
+    except Exception as e:
+        print(f"\n❌ 组合分析过程中发生错误: {e}")
+    
+    finally:
+        await team_manager.close_team()
+
+def build_screener(config: dict):
+    """按配置创建基于本地行情库的量化初筛器"""
+    from src.data.price_store import PriceStore
+    from src.tools.screener import UniverseScreener
+    
+    store_config = config.get('price_store') or {}
+    return UniverseScreener(PriceStore(store_config.get('root', 'data/prices')), config.get('screen'))
+
+async def screen_mode(config_file: str, top_n: int = None, analyze: bool = False):
+    """量化初筛模式：在本地行情库上筛选全市场，--analyze时把候选股票交给智能体团队完整运行"""
+    import json
+    import yaml
+    from src.monitoring.logs import flush_logs
+    
+    with open(config_file, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    
+    print("\n🔎 启动量化初筛模式...")
+    screener = build_screener(config)
+    result = screener.screen(top_n=top_n)
+    
+    print("\n" + "="*60)
+    print(f"📉 初筛过程（全市场 {result['universe']} 只，耗时 {result['elapsed_seconds']:.2f} 秒）")
+    print("="*60)
+    for step in result['steps']:
+        print(f"  {step['step']:<12} 剩余 {step['remaining']}")
+    
+    candidates = result['candidates']
+    if not candidates:
+        print("\n⚠️ 没有股票通过初筛，请检查本地行情库或放宽筛选条件")
+        await flush_logs()
+        return
+    
+    print("\n" + "="*60)
+    print(f"🏅 候选股票（前 {len(candidates)} 只）")
+    print("="*60)
+    factor_names = [name for name in candidates[0] if name not in ('ts_code', 'score')]
+    print(f"{'股票':<12}{'得分':>8}" + "".join(f"{name:>14}" for name in factor_names))
+    for item in candidates:
+        values = "".join(f"{'-' if item[name] is None else format(item[name], '.4g'):>14}" for name in factor_names)
+        print(f"{item['ts_code']:<12}{item['score']:>8.3f}{values}")
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"screen_results_{timestamp}.json"
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ 初筛结果已导出到: {filename}")
+    
+    if analyze:
+        # 候选股票按自选股批量运行的并发、预算和限速设置交给智能体团队
+        from src.agents.team_manager import AgentTeamManager
+        from src.agents.watchlist_scheduler import WatchlistScheduler
+        
+        print(f"\n🤖 将 {len(candidates)} 只候选股票交给智能体团队...")
+        scheduler = WatchlistScheduler(config.get('watchlist') or {}, lambda: AgentTeamManager(config_file))
+        report = await scheduler.run_once([item['ts_code'] for item in candidates])
+        print(f"\n✅ 批次完成: {report['counts']}，耗时 {report['elapsed_seconds']:.0f} 秒")
+    await flush_logs()
+
+async def schedule_mode(config_file: str, once: bool = False, stocks: list = None):
+    """自选股定时运行模式：按交易日历的cron表达式批量运行自选股，--once时立即运行一批后退出"""
+    import yaml
+    from src.agents.team_manager import AgentTeamManager
+    from src.agents.watchlist_scheduler import WatchlistScheduler
+    from src.monitoring.logs import flush_logs
+    
+    with open(config_file, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    
+    watchlist_config = config.get('watchlist') or {}
+    screener = build_screener(config) if watchlist_config.get('screen') else None
+    scheduler = WatchlistScheduler(watchlist_config, lambda: AgentTeamManager(config_file), screener)
+    stocks = stocks or scheduler.stocks
+    if not stocks and screener is None:
+        print("❌ 自选股列表为空，请在配置文件的 watchlist.stocks 中设置或使用 --watchlist 参数")
+        return
+    
+    print(f"\n⏰ 启动自选股定时运行模式 - {len(stocks)} 只股票: {', '.join(stocks)}"
+          + ("，另加量化初筛候选" if screener else ""))
+    try:
+        if once:
+            report = await scheduler.run_once(stocks)
+            print(f"\n✅ 批次完成: {report['counts']}，耗时 {report['elapsed_seconds']:.0f} 秒")
+            if report.get('report_file'):
+                print(f"📝 批次报告: {report['report_file']}")
+        else:
+            scheduler.stocks = stocks
+            print(f"📅 定时表达式: {scheduler.schedule.expression}，接下来的运行时间:")
+            for moment in scheduler.schedule.upcoming(datetime.now(), 3):
+                print(f"  - {moment:%Y-%m-%d %H:%M}")
+            await scheduler.serve()
+    finally:
+        await flush_logs()
+
 def web_mode():
     """Web界面模式"""
     print("\n🌐 启动Web界面模式...")
@@ -144,7 +476,7 @@ def web_mode():
         
         cmd = [sys.executable, "-m", "streamlit", "run", "src/ui/streamlit_app.py", f"--server.port={port}", f"--server.address={host}"]
         subprocess.run(cmd)
-        
+    
     except ImportError:
         print("❌ 未安装streamlit，请运行: pip install streamlit")
     except Exception as e:
@@ -177,30 +509,31 @@ async def demo_mode():
             await cli_mode(stock_code)
         else:
             print("❌ 无效选择")
-            
+    
     except (ValueError, KeyboardInterrupt):
         print("\n👋 演示已取消")
     except Exception as e:
         print(f"\n❌ 演示过程中发生错误: {e}")
 
-def check_dependencies():
-    """检查依赖项"""
-    # 包名映射：pip包名 -> 导入名
-    required_packages = {
-        'langchain-openai': 'langchain_openai',
-        'langchain-mcp-adapters': 'langchain_mcp_adapters', 
-        'langgraph': 'langgraph',
-        'python-dotenv': 'dotenv',
-        'pyyaml': 'yaml',
-        'streamlit': 'streamlit'
-    }
+def configure_logging(config_file: str):
+    """按配置文件中的logging设置初始化日志管道"""
+    import yaml
+    from src.monitoring.logs import setup_logging
+    
+    logging_config = None
+    if os.path.exists(config_file):
+        with open(config_file, 'r', encoding='utf-8') as f:
+            logging_config = (yaml.safe_load(f) or {}).get('logging')
+    setup_logging(logging_config)
+
+def check_dependencies(mode: str) -> bool:
+    """检查指定运行模式的依赖项（仅查找模块规格，不执行导入）"""
+    required_packages = MODE_PACKAGES.get(mode, COMMON_PACKAGES)
     
     missing_packages = []
     
     for pip_name, import_name in required_packages.items():
-        try:
-            __import__(import_name)
-        except ImportError:
+        if importlib.util.find_spec(import_name) is None:
             missing_packages.append(pip_name)
     
     if missing_packages:
@@ -217,10 +550,6 @@ def main():
     """主函数"""
     print_banner()
     
-    # 检查依赖
-    if not check_dependencies():
-        sys.exit(1)
-    
     # 解析命令行参数
     parser = argparse.ArgumentParser(
         description="A-Scope Research - 金融智能体团队分析系统",
@@ -228,14 +557,23 @@ def main():
         epilog="""
 使用示例:
   python main.py --mode cli --stock 000001     # 命令行分析平安银行
+  python main.py --mode cli --stock 000001 --incremental  # 基于上次结果增量分析
+  python main.py --mode cli --resume 000001.SZ_20250101_093000  # 从检查点继续中断的运行
+  python main.py --mode cli --replay analysis_results_20250101_093000.json  # 离线重放辩论和决策
+  python main.py --mode cli --replay 000001.SZ_20250101_093000 --replay-from decision  # 只重做决策
   python main.py --mode web                    # 启动Web界面
   python main.py --mode demo                   # 演示模式
+  python main.py --mode portfolio --portfolio holdings.csv  # 组合风险分析
+  python main.py --mode schedule               # 按配置的交易日cron定时运行自选股
+  python main.py --mode schedule --once --watchlist 000001,600036  # 立即运行一批
+  python main.py --mode screen --top 20        # 在本地行情库上做全市场量化初筛
+  python main.py --mode screen --analyze       # 初筛后把候选股票交给智能体团队
         """
     )
     
     parser.add_argument(
         "--mode",
-        choices=["cli", "web", "demo"],
+        choices=["cli", "web", "demo", "portfolio", "schedule", "screen"],
         default="demo",
         help="运行模式 (默认: demo)"
     )
@@ -246,6 +584,61 @@ def main():
         help="股票代码 (仅在cli模式下需要)"
     )
     
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="以上一次运行结果为基线做增量分析 (仅在cli模式下有效)"
+    )
+    
+    parser.add_argument(
+        "--resume",
+        type=str,
+        help="继续中断的运行，参数为运行ID (仅在cli模式下有效)"
+    )
+    
+    parser.add_argument(
+        "--replay",
+        type=str,
+        help="离线重放：已保存的analysis_results_*.json路径或结果库运行ID，不连接MCP (仅在cli模式下有效)"
+    )
+    
+    parser.add_argument(
+        "--replay-from",
+        choices=["debate", "decision"],
+        default="debate",
+        help="重放的起始阶段 (默认: debate)"
+    )
+    
+    parser.add_argument(
+        "--portfolio",
+        type=str,
+        help="持仓文件路径，JSON或CSV (仅在portfolio模式下需要)"
+    )
+    
+    parser.add_argument(
+        "--watchlist",
+        type=str,
+        help="逗号分隔的自选股列表，覆盖配置中的watchlist.stocks (仅在schedule模式下有效)"
+    )
+    
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="立即运行一批自选股后退出，不等待定时触发 (仅在schedule模式下有效)"
+    )
+    
+    parser.add_argument(
+        "--top",
+        type=int,
+        help="初筛保留的候选股票数，覆盖配置中的screen.top_n (仅在screen模式下有效)"
+    )
+    
+    parser.add_argument(
+        "--analyze",
+        action="store_true",
+        help="初筛后把候选股票交给智能体团队完整运行 (仅在screen模式下有效)"
+    )
+    
     parser.add_argument(
         "--config",
         type=str,
@@ -255,26 +648,58 @@ def main():
     
     args = parser.parse_args()
     
+    # 检查当前模式的依赖
+    if not check_dependencies(args.mode):
+        sys.exit(1)
+    
     # 检查配置文件
     if not os.path.exists(args.config):
         print(f"⚠️ 配置文件 {args.config} 不存在，将使用默认配置")
     
+    # 日志每个进程只配置一次；Web模式在Streamlit进程中自行配置
+    if args.mode != "web":
+        configure_logging(args.config)
+    
     # 根据模式执行
     try:
         if args.mode == "cli":
-            if not args.stock:
+            if args.replay:
+                asyncio.run(replay_mode(args.replay, args.config, args.replay_from, args.stock))
+                return
+            
+            if not args.stock and not args.resume:
                 print("❌ CLI模式需要指定股票代码，使用 --stock 参数")
                 parser.print_help()
                 sys.exit(1)
             
-            asyncio.run(cli_mode(args.stock))
+            if args.resume and args.incremental:
+                # 恢复的运行沿用检查点中记录的进度和增量信息，不能再切换分析方式
+                print("❌ --resume 不能与 --incremental 同时使用")
+                sys.exit(1)
             
+            asyncio.run(cli_mode(args.stock, args.incremental, args.resume))
+        
         elif args.mode == "web":
             web_mode()
-            
+        
         elif args.mode == "demo":
             asyncio.run(demo_mode())
+        
+        elif args.mode == "portfolio":
+            if not args.portfolio:
+                print("❌ portfolio模式需要指定持仓文件，使用 --portfolio 参数")
+                parser.print_help()
+                sys.exit(1)
             
+            asyncio.run(portfolio_mode(args.portfolio, args.config))
+        
+        elif args.mode == "schedule":
+            stocks = [code.strip() for code in args.watchlist.split(',') if code.strip()] if args.watchlist else None
+            asyncio.run(schedule_mode(args.config, args.once, stocks))
+        
+        elif args.mode == "screen":
+            asyncio.run(screen_mode(args.config, args.top, args.analyze))
+    
     except KeyboardInterrupt:
         print("\n👋 程序已被用户中断")
     except Exception as e:
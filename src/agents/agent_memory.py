@@ -0,0 +1,122 @@
+# 智能体工具观察记忆
+
+import json
+import re
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+class AgentMemory:
+    """单个智能体针对当前股票的工具观察记忆
+    
+    分析阶段获取的工具结果以压缩形式保留下来，辩论和决策阶段直接复用：
+    相同工具、相同参数的重复调用直接返回记忆中的结果，并计入节省次数。
+    同一阶段内的重复调用返回完整结果，跨阶段返回压缩结果（完整结果不写入检查点）。
+    每次开始新的分析时记忆清空，不会把上一次运行获取的旧数据带入新的运行。
+    """
+    
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        config = config or {}
+        self.enabled = config.get("enabled", True)
+        self.max_chars_per_observation = config.get("max_chars_per_observation", 1500)
+        self.max_context_chars = config.get("max_context_chars", 6000)
+        
+        self.stock_code = None
+        self.phase = "analysis"
+        self.observations = {}  # (工具名, 参数) -> 观察记录
+        self._full_results = {}  # (工具名, 参数) -> 未压缩的结果，仅在获取它的阶段内使用
+        self.stats = self._empty_stats()
+    
+    @staticmethod
+    def _empty_stats() -> Dict[str, Any]:
+        return {"executed_calls": 0, "redundant_calls_avoided": 0, "avoided_by_phase": {}}
+    
+    @staticmethod
+    def _key(tool_name: str, args: Dict[str, Any]) -> str:
+        return f"{tool_name}:{json.dumps(args, ensure_ascii=False, sort_keys=True, default=str)}"
+    
+    def begin(self, stock_code: str):
+        """开始一次新的分析：清空上一次运行的记忆和统计"""
+        self.stock_code = stock_code
+        self.observations = {}
+        self._full_results = {}
+        self.stats = self._empty_stats()
+        self.phase = "analysis"
+    
+    def compress(self, content: str) -> str:
+        """压缩工具结果：合并空白并截断到单条观察的字符上限"""
+        text = re.sub(r'[ \t]+', ' ', content)
+        text = re.sub(r'\n\s*\n+', '\n', text).strip()
+        if len(text) > self.max_chars_per_observation:
+            text = text[:self.max_chars_per_observation] + "\n...(已压缩截断)"
+        return text
+    
+    def lookup(self, tool_name: str, args: Dict[str, Any]) -> Optional[str]:
+        """查找相同调用的记忆结果，命中时计为一次避免的重复调用"""
+        if not self.enabled:
+            return None
+        key = self._key(tool_name, args)
+        observation = self.observations.get(key)
+        if observation is None:
+            return None
+        
+        self.stats["redundant_calls_avoided"] += 1
+        by_phase = self.stats["avoided_by_phase"]
+        by_phase[self.phase] = by_phase.get(self.phase, 0) + 1
+        if observation["phase"] == self.phase and key in self._full_results:
+            return self._full_results[key]
+        return observation["content"]
+    
+    def record(self, tool_name: str, args: Dict[str, Any], content: str):
+        """记录一次实际执行的工具调用结果"""
+        self.stats["executed_calls"] += 1
+        if not self.enabled:
+            return
+        key = self._key(tool_name, args)
+        self._full_results[key] = content
+        self.observations[key] = {
+            "tool": tool_name,
+            "args": args,
+            "content": self.compress(content),
+            "phase": self.phase,
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    def format_context(self) -> str:
+        """将记忆整理为后续阶段请求中的数据摘要，超出上限时优先保留最近的观察"""
+        if not self.enabled or not self.observations:
+            return ""
+        
+        sections = []
+        total = 0
+        for observation in reversed(list(self.observations.values())):
+            section = (f"### {observation['tool']}（参数 {json.dumps(observation['args'], ensure_ascii=False)}）\n"
+                       f"{observation['content']}")
+            if sections and total + len(section) > self.max_context_chars:
+                break
+            sections.append(section)
+            total += len(section)
+        
+        return ("你此前已经通过工具获取过以下数据（压缩摘要），可直接引用，无需用相同参数重复调用：\n\n"
+                + "\n\n".join(reversed(sections)))
+    
+    def export_state(self) -> Dict[str, Any]:
+        """导出记忆内容，用于写入检查点"""
+        stats = {**self.stats, "avoided_by_phase": dict(self.stats["avoided_by_phase"])}
+        return {"stock_code": self.stock_code, "observations": dict(self.observations), "stats": stats}
+    
+    def restore_state(self, state: Dict[str, Any]):
+        """从检查点恢复记忆内容"""
+        self.stock_code = state.get("stock_code")
+        self.observations = state.get("observations", {})
+        self._full_results = {}
+        self.stats = state.get("stats") or self._empty_stats()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """记忆统计"""
+        return {
+            "stock_code": self.stock_code,
+            "observations": len(self.observations),
+            "executed_calls": self.stats["executed_calls"],
+            "redundant_calls_avoided": self.stats["redundant_calls_avoided"],
+            "avoided_by_phase": dict(self.stats["avoided_by_phase"])
+        }
@@ -3,17 +3,91 @@
 import asyncio
 import json
 import os
-from typing import Dict, List, Any, Optional
+import time
+import httpx
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, messages_to_dict, messages_from_dict
 from langchain_mcp_adapters.client import MultiServerMCPClient
 from langchain_openai import ChatOpenAI
 from langgraph.prebuilt import create_react_agent
 from dotenv import load_dotenv
+from langchain_core.tools import StructuredTool
+from ..tools.tool_filter import filter_tools, tool_savings_report
+from ..tools.mcp_layer import content_to_text
+from ..tools.replica_pool import replica_connections
+from ..monitoring.metrics import LLM_LATENCY, LLM_TOKENS, BUDGET_HITS, MEMORY_LOOKUPS, AGENT_ERRORS
+from ..monitoring.logs import get_logger
+from .agent_memory import AgentMemory
+
+logger = get_logger("agent")
+conversation_logger = get_logger("conversation")
+
+# 增量分析中表示观点未变化的标记
+UNCHANGED_MARKER = "[观点不变]"
+
+# 流水线阶段，可在智能体配置的phases中分别指定模型；portfolio为投资组合风险评述
+PHASES = ("analysis", "debate", "decision", "portfolio")
+
+# 各阶段输出的默认有效性检查，级联模式下未通过检查时升级到下一档模型
+DEFAULT_VALIDATION = {
+    "analysis": {"min_chars": 200},
+    "debate": {"min_chars": 50},
+    "decision": {"min_chars": 50, "require_any": ["买入", "持有", "卖出"]},
+    # 组合评述给出的是加减仓和权重调整建议，不要求单只股票的买卖结论
+    "portfolio": {"min_chars": 100}
+}
+
+# 预算耗尽时追加给模型的指令，要求不再调用工具直接作答
+FORCE_FINAL_ANSWER_PROMPT = "本次任务的推理步数、工具调用次数或时间预算已用尽。请不要再调用任何工具，基于以上已获取的信息直接给出你的最终回答。"
+
+def is_valid_output(text: str, rules: Dict[str, Any]) -> bool:
+    """检查模型输出是否满足阶段的有效性规则"""
+    text = (text or "").strip()
+    if len(text) < rules.get("min_chars", 1):
+        return False
+    require_any = rules.get("require_any")
+    if require_any and not any(keyword in text for keyword in require_any):
+        return False
+    return True
+
+def extract_token_usage(messages: List[Any]) -> Dict[str, int]:
+    """从AI消息中汇总服务商返回的token用量（含缓存命中的token数）"""
+    usage = {"llm_calls": 0, "input_tokens": 0, "output_tokens": 0, "cached_tokens": 0}
+    
+    for msg in messages:
+        if getattr(msg, 'type', None) != 'ai':
+            continue
+        usage["llm_calls"] += 1
+        
+        # 优先使用LangChain标准化的usage_metadata
+        metadata = getattr(msg, 'usage_metadata', None) or {}
+        # 兼容直接透传的OpenAI风格token_usage
+        token_usage = (getattr(msg, 'response_metadata', None) or {}).get('token_usage') or {}
+        
+        if metadata:
+            usage["input_tokens"] += metadata.get('input_tokens', 0) or 0
+            usage["output_tokens"] += metadata.get('output_tokens', 0) or 0
+            cached = (metadata.get('input_token_details') or {}).get('cache_read', 0) or 0
+        else:
+            usage["input_tokens"] += token_usage.get('prompt_tokens', 0) or 0
+            usage["output_tokens"] += token_usage.get('completion_tokens', 0) or 0
+            cached = 0
+        
+        if not cached:
+            # OpenAI: prompt_tokens_details.cached_tokens；DeepSeek: prompt_cache_hit_tokens
+            cached = ((token_usage.get('prompt_tokens_details') or {}).get('cached_tokens', 0)
+                      or token_usage.get('prompt_cache_hit_tokens', 0) or 0)
+        usage["cached_tokens"] += cached
+    
+    return usage
 
 class BaseAgent:
     """基础智能体类，所有专业分析师智能体的父类"""
     
-    def __init__(self, name: str, role: str, prompt: str, model_config: Dict[str, Any]):
+    def __init__(self, name: str, role: str, prompt: str, model_config: Dict[str, Any],
+                 memory_config: Optional[Dict[str, Any]] = None, budget_config: Optional[Dict[str, Any]] = None,
+                 rate_limiter: Optional[Any] = None):
         self.name = name
         self.role = role
         self.prompt = prompt
@@ -21,54 +95,354 @@ class BaseAgent:
         self.conversation_history = []
         self.thoughts = []
         self.tool_calls = []
+        # 辩论线程：本智能体在一场辩论中收到的增量观点和自己的回应，跨轮次保留
+        self.debate_thread = []
+        # 当前股票的工具观察记忆，跨分析、辩论、决策阶段复用
+        self.memory = AgentMemory(memory_config)
+        self.token_usage = {"llm_calls": 0, "input_tokens": 0, "output_tokens": 0, "cached_tokens": 0}
+        # ReAct预算：团队默认值，可被智能体配置中的budget覆盖
+        self.budget_config = budget_config or {}
+        self.budget_hits = []
+        # 最近一次辩论发言的预算命中记录（debate_response只返回文本，由团队管理器写入辩论记录）
+        self.debate_budget_hit = None
+        
+        # 角色prompt作为稳定的系统消息前缀，便于服务商的前缀缓存命中
+        self.system_message = SystemMessage(content=prompt)
+        
+        # 各档模型共用一个HTTP连接池；配置了限速时每个请求发出前先取得许可
+        event_hooks = {"request": [rate_limiter.acquire]} if rate_limiter else None
+        self.http_client = httpx.AsyncClient(event_hooks=event_hooks)
         
         # 初始化大模型 - 必须从配置文件获取所有参数
-        self.llm = ChatOpenAI(
-            model=model_config["model"],
-            api_key=model_config["api_key"],
-            base_url=model_config["base_url"],
-            temperature=model_config["temperature"],
-            max_tokens=model_config["max_tokens"]
-        )
+        self.llm = self._build_llm(model_config)
+        
+        # 按阶段的模型档位：phase -> [(档位配置, 模型)]，未配置的阶段使用默认模型
+        self.phase_tiers = self._build_phase_tiers(model_config.get("phases") or {})
+        self.routing_stats = {phase: {"calls": {}, "escalations": 0} for phase in PHASES}
         
         self.client = None
+        self.tool_layer = None
         self.tools = []
+        self.local_tools = []
+        self.tool_stats = {}
         self.agent = None
+        self.phase_agents = {}
+    
+    def _build_llm(self, config: Dict[str, Any]) -> ChatOpenAI:
+        """根据模型配置创建ChatOpenAI实例，复用智能体共享的HTTP连接池"""
+        return ChatOpenAI(
+            model=config["model"],
+            api_key=config["api_key"],
+            base_url=config["base_url"],
+            temperature=config["temperature"],
+            max_tokens=config["max_tokens"],
+            http_async_client=self.http_client
+        )
+    
+    def _build_phase_tiers(self, phases_config: Dict[str, Any]) -> Dict[str, List[Tuple[Dict[str, Any], Any]]]:
+        """解析各阶段的模型配置
+        
+        phases中每个阶段可以覆盖默认模型参数，也可以给出cascade列表：
+        按顺序先尝试快速模型，输出未通过有效性检查时再升级到下一档
+        """
+        base_config = {key: value for key, value in self.model_config.items() if key not in ("phases", "tools")}
+        phase_tiers = {}
         
-    async def initialize_mcp(self, mcp_config: Dict[str, Any]):
-        """初始化MCP客户端和工具"""
+        for phase, phase_config in phases_config.items():
+            if phase not in PHASES:
+                logger.warning(f"⚠️ {self.name} 未知的阶段配置: {phase}")
+                continue
+            phase_config = phase_config or {}
+            phase_base = {**base_config,
+                          **{key: value for key, value in phase_config.items() if key not in ("cascade", "validate")}}
+            tier_overrides = phase_config.get("cascade") or [{}]
+            
+            tiers = []
+            for override in tier_overrides:
+                tier_config = {**phase_base, **override}
+                # 与默认模型参数一致的档位直接复用默认模型
+                llm = self.llm if tier_config == base_config else self._build_llm(tier_config)
+                tiers.append((tier_config, llm))
+            phase_tiers[phase] = tiers
+        
+        return phase_tiers
+    
+    def _validation_rules(self, phase: str) -> Dict[str, Any]:
+        phase_config = (self.model_config.get("phases") or {}).get(phase) or {}
+        return {**DEFAULT_VALIDATION.get(phase, {}), **(phase_config.get("validate") or {})}
+    
+    async def initialize_mcp(self, mcp_config: Dict[str, Any], tool_layer: Any = None,
+                             local_tools: Optional[List[Any]] = None):
+        """初始化MCP客户端和工具
+        
+        Args:
+            mcp_config: MCP服务器配置
+            tool_layer: 团队共享的MCP工具层，提供时直接复用其工具，不再单独建立连接
+            local_tools: 本地计算工具，与MCP工具一起注册给智能体
+        """
+        self.local_tools = local_tools or []
+        self.tool_layer = tool_layer
         try:
+            if tool_layer is not None:
+                self._setup_tools(tool_layer.tools)
+                return
+            
             # 提取servers配置
             servers_config = mcp_config.get("servers", {})
             if not servers_config:
-                print(f"⚠️ {self.name} 没有可用的MCP服务器配置，跳过MCP初始化")
-                self.tools = []
-                # 创建不带工具的智能体
-                self.agent = create_react_agent(self.llm, self.tools)
+                logger.warning(f"⚠️ {self.name} 没有可用的MCP服务器配置，跳过MCP初始化")
+                # 创建只带本地工具（可能为空）的智能体
+                self._setup_tools([])
                 return
-                
-            self.client = MultiServerMCPClient(servers_config)
-            self.tools = await self.client.get_tools()
-            
-            # 创建带有角色prompt的智能体
-            self.agent = create_react_agent(self.llm, self.tools)
-            
-            print(f"✅ {self.name} 初始化成功，可用工具: {len(self.tools)}个")
             
+            # 单独连接时不做副本均衡，每个服务器只连接第一个副本
+            servers_config = {
+                server_name: next(iter(replica_connections(server_name, server_config).values()))
+                for server_name, server_config in servers_config.items()
+            }
+            self.client = MultiServerMCPClient(servers_config)
+            # 按名称排序，保证每次请求携带的工具schema顺序稳定
+            self._setup_tools(sorted(await self.client.get_tools(), key=lambda tool: tool.name))
+        
         except Exception as e:
-            print(f"❌ {self.name} MCP初始化失败: {e}")
+            logger.error(f"❌ {self.name} MCP初始化失败: {e}")
             raise
     
+    def _setup_tools(self, mcp_tools: List[Any]):
+        """合并本地工具、按角色筛选工具并创建智能体"""
+        all_tools = sorted(list(mcp_tools) + list(self.local_tools), key=lambda tool: tool.name)
+        
+        # 按角色筛选工具，减少每次模型调用携带的工具schema
+        tools_config = self.model_config.get("tools") or {}
+        self.tools = filter_tools(all_tools, tools_config.get("allow"), tools_config.get("deny"))
+        self.tool_stats = tool_savings_report(all_tools, self.tools)
+        
+        # 工具调用经过记忆层，相同调用直接复用已有结果
+        self.tools = [self._wrap_with_memory(tool) for tool in self.tools]
+        
+        # 创建带有角色prompt的智能体，各阶段的模型档位共用同一组工具
+        self.agent = create_react_agent(self.llm, self.tools)
+        self.phase_agents = {
+            phase: [(config, llm, self.agent if llm is self.llm else create_react_agent(llm, self.tools))
+                    for config, llm in tiers]
+            for phase, tiers in self.phase_tiers.items()
+        }
+        
+        logger.info(f"✅ {self.name} 初始化成功，可用工具: {len(self.tools)}/{len(all_tools)}个，"
+                    f"每次调用节省约 {self.tool_stats['saved_tokens_per_call']} 个工具schema token")
+    
+    def _wrap_with_memory(self, tool: Any) -> StructuredTool:
+        """包装工具：先查记忆，未命中时执行工具并记录结果"""
+        async def _call(**kwargs):
+            cached = self.memory.lookup(tool.name, kwargs)
+            MEMORY_LOOKUPS.inc(agent=self.name, result="miss" if cached is None else "hit")
+            if cached is not None:
+                return f"（本次分析中已获取过相同数据，以下为记忆中的结果，未重复调用工具）\n{cached}"
+            
+            # 直接调用底层协程，使工具错误向上抛出而不被当作正常结果记入记忆
+            if getattr(tool, 'response_format', 'content') == 'content' and getattr(tool, 'coroutine', None):
+                content = await tool.coroutine(**kwargs)
+            else:
+                content = content_to_text(await tool.ainvoke(kwargs))
+            
+            self.memory.record(tool.name, kwargs, content)
+            return content
+        
+        return StructuredTool(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            coroutine=_call,
+            handle_tool_error=True
+        )
+    
+    def _unavailable_tools_notice(self) -> str:
+        """提前告知智能体哪些工具正处于熔断中，避免反复调用已知故障的工具"""
+        if self.tool_layer is None:
+            return ""
+        own_tools = {tool.name for tool in self.tools}
+        unavailable = [name for name in self.tool_layer.unavailable_tools() if name in own_tools]
+        if not unavailable:
+            return ""
+        return (f"\n\n注意：以下工具当前不可用（连续失败已熔断）：{'、'.join(unavailable)}。"
+                f"请不要调用这些工具，改用其他可用数据，并在结论中说明相关数据缺失。")
+    
+    def _budget(self, phase: str) -> Dict[str, Any]:
+        """合并阶段预算：团队默认 < 团队阶段默认 < 智能体 < 智能体阶段"""
+        agent_budget = self.model_config.get("budget") or {}
+        budget = {}
+        for layer in (self.budget_config, (self.budget_config.get("phases") or {}).get(phase),
+                      agent_budget, (agent_budget.get("phases") or {}).get(phase)):
+            budget.update({key: value for key, value in (layer or {}).items() if key != "phases"})
+        return budget
+    
+    async def _run_with_budget(self, agent: Any, llm: Any, input_messages: List[Any],
+                               phase: str) -> Tuple[List[Any], Optional[Dict[str, Any]]]:
+        """流式执行ReAct循环并在每一步检查预算
+        
+        超出步数、工具调用次数或时间预算时中止循环，保留已获得的消息，
+        再让模型在不带工具的情况下基于已有信息给出最终回答
+        
+        Returns:
+            (新产生的消息, 预算命中记录，未命中时为None)
+        """
+        budget = self._budget(phase)
+        max_steps = budget.get("max_steps")
+        max_tool_calls = budget.get("max_tool_calls")
+        max_seconds = budget.get("max_seconds")
+        
+        new_messages = []
+        reason = None
+        start_time = time.perf_counter()
+        config = {"recursion_limit": max_steps * 2 + 1} if max_steps else {}
+        
+        stream = agent.astream({"messages": input_messages}, config, stream_mode="values")
+        try:
+            while True:
+                step_start = time.perf_counter()
+                remaining = max_seconds - (step_start - start_time) if max_seconds else None
+                try:
+                    state = await asyncio.wait_for(stream.__anext__(), remaining)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    reason = "max_seconds"
+                    break
+                
+                new_messages = state.get("messages", [])[len(input_messages):]
+                if not new_messages:
+                    continue
+                tool_calls = sum(1 for msg in new_messages if msg.type == 'tool')
+                if new_messages[-1].type == 'ai':
+                    # 新状态以模型回复结尾，这一步的耗时就是一次模型调用
+                    LLM_LATENCY.observe(time.perf_counter() - step_start, agent=self.name, phase=phase)
+                    # 工具节点执行前检查：本次回复请求的工具调用会让总数超出预算时，一个也不执行
+                    pending = len(getattr(new_messages[-1], 'tool_calls', None) or [])
+                    if max_tool_calls and pending and tool_calls + pending > max_tool_calls:
+                        reason = "max_tool_calls"
+                        break
+                    continue
+                if new_messages[-1].type != 'tool':
+                    continue
+                # 工具结果返回后、下一次模型调用前检查预算，剩余一步时留给最终回答
+                steps = sum(1 for msg in new_messages if msg.type == 'ai')
+                if max_steps and steps >= max_steps - 1:
+                    reason = "max_steps"
+                elif max_tool_calls and tool_calls >= max_tool_calls:
+                    reason = "max_tool_calls"
+                if reason:
+                    break
+        finally:
+            await stream.aclose()
+        
+        if reason is None:
+            return new_messages, None
+        
+        # 丢弃还没有拿到工具结果的调用请求，保证消息序列完整
+        while new_messages and new_messages[-1].type == 'ai' and getattr(new_messages[-1], 'tool_calls', None):
+            new_messages = new_messages[:-1]
+        
+        hit = {
+            "phase": phase,
+            "reason": reason,
+            "react_steps": sum(1 for msg in new_messages if msg.type == 'ai'),
+            "tool_calls": sum(1 for msg in new_messages if msg.type == 'tool'),
+            "elapsed_seconds": round(time.perf_counter() - start_time, 2),
+            "timestamp": datetime.now().isoformat()
+        }
+        self.budget_hits.append(hit)
+        BUDGET_HITS.inc(agent=self.name, phase=phase, reason=reason)
+        logger.info(f"⏱️ {self.name} {phase} 阶段触发预算限制({reason})，强制给出最终回答")
+        
+        step_start = time.perf_counter()
+        final_message = await llm.ainvoke(
+            [*input_messages, *new_messages, HumanMessage(content=FORCE_FINAL_ANSWER_PROMPT)]
+        )
+        LLM_LATENCY.observe(time.perf_counter() - step_start, agent=self.name, phase=phase)
+        return [*new_messages, final_message], hit
+    
+    async def _invoke_agent(self, request: str, history: Optional[List[Any]] = None,
+                            phase: str = "analysis") -> Tuple[List[Any], Dict[str, int], Optional[Dict[str, Any]]]:
+        """调用智能体：稳定的系统消息在前，可变的请求内容在后
+        
+        配置了阶段模型时使用该阶段的模型；配置了级联时依次尝试各档模型，
+        输出未通过有效性检查才升级到下一档。每档模型的ReAct循环都受阶段预算约束
+        
+        Args:
+            request: 本次请求内容
+            history: 插在系统消息和本次请求之间的历史消息（如辩论线程），只追加不改写以保持前缀稳定
+            phase: 流水线阶段（analysis/debate/decision/portfolio）
+        
+        Returns:
+            (本次调用新产生的消息, 本次调用的token用量（含所有尝试过的档位）, 预算命中记录)
+        """
+        request += self._unavailable_tools_notice()
+        input_messages = [self.system_message, *(history or []), HumanMessage(content=request)]
+        tiers = self.phase_agents.get(phase) or [(self.model_config, self.llm, self.agent)]
+        rules = self._validation_rules(phase)
+        total_usage = {"llm_calls": 0, "input_tokens": 0, "output_tokens": 0, "cached_tokens": 0}
+        stats = self.routing_stats.setdefault(phase, {"calls": {}, "escalations": 0})
+        
+        for index, (tier_config, llm, agent) in enumerate(tiers):
+            new_messages, budget_hit = await self._run_with_budget(agent, llm, input_messages, phase)
+            
+            usage = extract_token_usage(new_messages)
+            for key, value in usage.items():
+                self.token_usage[key] += value
+                total_usage[key] += value
+            for kind in ("input", "output", "cached"):
+                LLM_TOKENS.inc(usage[f"{kind}_tokens"], agent=self.name, phase=phase, kind=kind)
+            
+            model = tier_config.get("model", "unknown")
+            stats["calls"][model] = stats["calls"].get(model, 0) + 1
+            
+            if index == len(tiers) - 1:
+                break
+            final_answer, _ = self._collect_result(new_messages)
+            if is_valid_output(final_answer, rules):
+                break
+            stats["escalations"] += 1
+            logger.info(f"⤴️ {self.name} {phase} 阶段 {model} 输出未通过检查，升级到 {tiers[index + 1][0].get('model')}")
+        
+        # 发言全文作为附加字段写入结构化日志，控制台只显示摘要
+        response, _ = self._collect_result(new_messages)
+        conversation_logger.info(f"💬 {self.name} {phase} 阶段回复 {len(response)} 字",
+                                 agent=self.name, phase=phase, request=request, response=response)
+        return new_messages, total_usage, budget_hit
+    
+    def _collect_result(self, messages: List[Any]) -> Tuple[str, List[Dict[str, Any]]]:
+        """从ReAct消息中提取最终回答和工具调用记录"""
+        final_answer = ""
+        tool_calls_made = []
+        
+        for msg in messages:
+            if hasattr(msg, 'type'):
+                if msg.type == 'ai':
+                    if hasattr(msg, 'tool_calls') and msg.tool_calls:
+                        for tool_call in msg.tool_calls:
+                            tool_calls_made.append({
+                                "tool": tool_call.get('name', 'unknown'),
+                                "args": tool_call.get('args', {}),
+                                "timestamp": datetime.now().isoformat()
+                            })
+                    else:
+                        final_answer = msg.content
+                elif msg.type == 'tool':
+                    # 记录工具返回结果
+                    pass
+        
+        return final_answer, tool_calls_made
+    
     async def analyze(self, stock_code: str, context: str = "") -> Dict[str, Any]:
         """分析股票，返回分析结果"""
         if not self.agent:
             return {"error": "智能体未初始化"}
         
         try:
+            self.memory.begin(stock_code)
+            
             # 构建分析请求
             analysis_request = f"""
-            {self.prompt}
-            
             当前时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             
             请分析股票代码: {stock_code}
@@ -87,30 +461,12 @@ class BaseAgent:
             })
             
             # 调用智能体进行分析
-            response = await self.agent.ainvoke({
-                "messages": [{"role": "user", "content": analysis_request}]
-            })
+            start_time = time.perf_counter()
+            messages, usage, budget_hit = await self._invoke_agent(analysis_request)
+            elapsed = time.perf_counter() - start_time
             
             # 处理响应
-            messages = response.get("messages", [])
-            analysis_result = ""
-            tool_calls_made = []
-            
-            for msg in messages:
-                if hasattr(msg, 'type'):
-                    if msg.type == 'ai':
-                        if hasattr(msg, 'tool_calls') and msg.tool_calls:
-                            for tool_call in msg.tool_calls:
-                                tool_calls_made.append({
-                                    "tool": tool_call.get('name', 'unknown'),
-                                    "args": tool_call.get('args', {}),
-                                    "timestamp": datetime.now().isoformat()
-                                })
-                        else:
-                            analysis_result = msg.content
-                    elif msg.type == 'tool':
-                        # 记录工具返回结果
-                        pass
+            analysis_result, tool_calls_made = self._collect_result(messages)
             
             # 更新历史记录
             self.conversation_history.append({
@@ -127,12 +483,80 @@ class BaseAgent:
                 "role": self.role,
                 "analysis": analysis_result,
                 "tool_calls": tool_calls_made,
+                "token_usage": usage,
+                "react_steps": usage["llm_calls"],
+                "budget_hit": budget_hit,
+                "elapsed_seconds": round(elapsed, 2),
                 "timestamp": datetime.now().isoformat()
             }
-            
+        
         except Exception as e:
+            AGENT_ERRORS.inc(agent=self.name, stage="analysis")
             error_msg = f"分析失败: {str(e)}"
-            print(f"❌ {self.name} {error_msg}")
+            logger.error(f"❌ {self.name} {error_msg}")
+            return {
+                "agent_name": self.name,
+                "role": self.role,
+                "error": error_msg,
+                "timestamp": datetime.now().isoformat()
+            }
+    
+    async def update_analysis(self, stock_code: str, prior_analysis: str, delta_context: str) -> Dict[str, Any]:
+        """增量分析：基于上一次的分析结论和之后的新数据更新观点"""
+        if not self.agent:
+            return {"error": "智能体未初始化"}
+        
+        try:
+            self.memory.begin(stock_code)
+            
+            update_request = f"""
+            当前时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+            
+            股票代码: {stock_code}
+            
+            你上一次对该股票的分析结论:
+            {prior_analysis}
+            
+            自上次分析以来的新数据:
+            {delta_context}
+            
+            请从你的专业角度({self.role})，结合新数据更新你的观点。
+            只在确有必要时调用MCP工具补充新数据，不要重复获取上次分析已经使用过的历史数据。
+            如果新数据没有改变你的核心判断，请在回复开头标注 {UNCHANGED_MARKER} 并简要说明原因；
+            否则请给出更新后的完整分析和投资建议，并说明相对上次的变化。
+            """
+            
+            start_time = time.perf_counter()
+            messages, usage, budget_hit = await self._invoke_agent(update_request)
+            elapsed = time.perf_counter() - start_time
+            
+            analysis_result, tool_calls_made = self._collect_result(messages)
+            
+            self.conversation_history.append({
+                "timestamp": datetime.now().isoformat(),
+                "request": update_request,
+                "response": analysis_result,
+                "tool_calls": tool_calls_made
+            })
+            self.tool_calls.extend(tool_calls_made)
+            
+            return {
+                "agent_name": self.name,
+                "role": self.role,
+                "analysis": analysis_result,
+                "view_changed": UNCHANGED_MARKER not in analysis_result,
+                "tool_calls": tool_calls_made,
+                "token_usage": usage,
+                "react_steps": usage["llm_calls"],
+                "budget_hit": budget_hit,
+                "elapsed_seconds": round(elapsed, 2),
+                "timestamp": datetime.now().isoformat()
+            }
+        
+        except Exception as e:
+            AGENT_ERRORS.inc(agent=self.name, stage="analysis")
+            error_msg = f"增量分析失败: {str(e)}"
+            logger.error(f"❌ {self.name} {error_msg}")
             return {
                 "agent_name": self.name,
                 "role": self.role,
@@ -140,27 +564,47 @@ class BaseAgent:
                 "timestamp": datetime.now().isoformat()
             }
     
+    def start_debate(self, topic: str, own_analysis: str = ""):
+        """开始新的辩论：清空辩论线程，并以自己的初始分析作为线程开头"""
+        self.debate_thread = []
+        self.memory.phase = "debate"
+        if own_analysis:
+            # 分析阶段的工具观察随初始分析一起放在线程开头，作为后续各轮稳定的前缀
+            memory_context = self.memory.format_context()
+            self.debate_thread = [
+                HumanMessage(content=f"辩论主题: {topic}\n\n{memory_context}\n\n请回顾你在辩论开始前给出的初始分析。"),
+                AIMessage(content=own_analysis)
+            ]
+    
     async def debate_response(self, topic: str, other_opinions: List[Dict[str, Any]]) -> str:
-        """参与团队辩论，回应其他智能体的观点"""
+        """参与团队辩论，回应其他智能体的观点
+        
+        Args:
+            topic: 辩论主题
+            other_opinions: 自本智能体上次发言以来的新观点（增量），更早的内容已在辩论线程中
+        """
+        self.debate_budget_hit = None
         if not self.agent:
             return "智能体未初始化，无法参与辩论"
         
         try:
-            # 构建辩论上下文
-            debate_context = f"辩论主题: {topic}\n\n其他分析师的观点:\n"
-            
-            for i, opinion in enumerate(other_opinions, 1):
-                debate_context += f"{i}. {opinion.get('agent_name', '未知')}({opinion.get('role', '未知')}):\n"
-                debate_context += f"   {opinion.get('analysis', opinion.get('content', ''))}\n\n"
+            # 构建辩论上下文，只包含上次发言之后的新观点
+            if other_opinions:
+                debate_context = f"辩论主题: {topic}\n\n自你上次发言以来其他分析师的新观点:\n"
+                for i, opinion in enumerate(other_opinions, 1):
+                    content = opinion.get('response') or opinion.get('analysis') or opinion.get('content', '')
+                    debate_context += f"{i}. {opinion.get('agent_name', '未知')}({opinion.get('role', '未知')}):\n"
+                    debate_context += f"   {content}\n\n"
+            else:
+                debate_context = f"辩论主题: {topic}\n\n自你上次发言以来没有新的观点。"
             
             debate_request = f"""
-            {self.prompt}
-            
             当前时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             
             {debate_context}
             
-            请从你的专业角度({self.role})对以上观点进行评价和回应。
+            请从你的专业角度({self.role})对以上新观点进行评价和回应。
+            你之前看过的观点和自己的发言都在对话历史中，不要重复已经表达过的论点。
             你可以：
             1. 支持某些观点并提供额外论据
             2. 质疑某些观点并提出反驳
@@ -177,13 +621,10 @@ class BaseAgent:
                 "content": thought
             })
             
-            # 调用智能体
-            response = await self.agent.ainvoke({
-                "messages": [{"role": "user", "content": debate_request}]
-            })
+            # 调用智能体，辩论线程作为历史消息
+            messages, _, self.debate_budget_hit = await self._invoke_agent(debate_request, self.debate_thread, phase="debate")
             
             # 提取回应内容
-            messages = response.get("messages", [])
             debate_response = ""
             
             for msg in messages:
@@ -192,9 +633,13 @@ class BaseAgent:
                         debate_response = msg.content
                         break
             
-            return debate_response
+            # 线程只保留请求和最终回应，工具调用的中间过程不再带入后续轮次
+            self.debate_thread.extend([HumanMessage(content=debate_request), AIMessage(content=debate_response)])
             
+            return debate_response
+        
         except Exception as e:
+            AGENT_ERRORS.inc(agent=self.name, stage="debate")
             return f"辩论回应失败: {str(e)}"
     
     async def make_decision(self, analysis_summary: str) -> Dict[str, Any]:
@@ -203,15 +648,17 @@ class BaseAgent:
             return {"error": "智能体未初始化"}
         
         try:
-            decision_request = f"""
-            {self.prompt}
+            self.memory.phase = "decision"
             
+            decision_request = f"""
             当前时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             
             基于以下分析总结，请做出明确的投资决策：
             
             {analysis_summary}
             
+            {self.memory.format_context()}
+            
             请从你的专业角度({self.role})给出：
             1. 投资建议：买入/持有/卖出
             2. 建议仓位：轻仓/标准仓位/重仓
@@ -222,12 +669,9 @@ class BaseAgent:
             请给出明确的结构化回答。
             """
             
-            response = await self.agent.ainvoke({
-                "messages": [{"role": "user", "content": decision_request}]
-            })
+            messages, usage, budget_hit = await self._invoke_agent(decision_request, phase="decision")
             
             # 提取决策内容
-            messages = response.get("messages", [])
             decision_content = ""
             
             for msg in messages:
@@ -240,10 +684,13 @@ class BaseAgent:
                 "agent_name": self.name,
                 "role": self.role,
                 "decision": decision_content,
+                "token_usage": usage,
+                "budget_hit": budget_hit,
                 "timestamp": datetime.now().isoformat()
             }
-            
+        
         except Exception as e:
+            AGENT_ERRORS.inc(agent=self.name, stage="decision")
             return {
                 "agent_name": self.name,
                 "role": self.role,
@@ -251,20 +698,95 @@ class BaseAgent:
                 "timestamp": datetime.now().isoformat()
             }
     
+    async def review_portfolio(self, portfolio_summary: str) -> Dict[str, Any]:
+        """基于本地计算的组合风险结果给出评述"""
+        if not self.agent:
+            return {"error": "智能体未初始化"}
+        
+        try:
+            review_request = f"""
+            当前时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+            
+            以下是团队在本地精确计算的投资组合风险结果（JSON，比例均为小数）：
+            
+            {portfolio_summary}
+            
+            请从你的专业角度({self.role})对该组合进行风险评述：
+            1. 整体风险水平：VaR/CVaR与波动率是否可接受
+            2. 集中度风险：个股与行业集中度
+            3. 主要风险来源：风险贡献最大的持仓及原因
+            4. 调整建议：减仓、分散或对冲的具体建议
+            
+            以上数值已经精确计算，无需再调用工具重复计算。
+            """
+            
+            messages, usage, budget_hit = await self._invoke_agent(review_request, phase="portfolio")
+            
+            commentary = ""
+            for msg in messages:
+                if hasattr(msg, 'type') and msg.type == 'ai':
+                    if not (hasattr(msg, 'tool_calls') and msg.tool_calls):
+                        commentary = msg.content
+            
+            return {
+                "agent_name": self.name,
+                "role": self.role,
+                "commentary": commentary,
+                "token_usage": usage,
+                "budget_hit": budget_hit,
+                "timestamp": datetime.now().isoformat()
+            }
+        
+        except Exception as e:
+            AGENT_ERRORS.inc(agent=self.name, stage="portfolio")
+            return {
+                "agent_name": self.name,
+                "role": self.role,
+                "error": f"组合评述失败: {str(e)}",
+                "timestamp": datetime.now().isoformat()
+            }
+    
     def get_status(self) -> Dict[str, Any]:
         """获取智能体状态信息"""
         return {
             "name": self.name,
             "role": self.role,
             "model": self.model_config["model"],
+            "phase_models": {phase: [config.get("model") for config, _ in tiers]
+                             for phase, tiers in self.phase_tiers.items()},
+            "routing": {phase: dict(stats) for phase, stats in self.routing_stats.items() if stats["calls"]},
             "initialized": self.agent is not None,
             "tools_count": len(self.tools),
+            "tool_stats": dict(self.tool_stats),
             "conversation_count": len(self.conversation_history),
             "thoughts_count": len(self.thoughts),
-            "tool_calls_count": len(self.tool_calls)
+            "tool_calls_count": len(self.tool_calls),
+            "memory": self.memory.get_stats(),
+            "budget_hits": list(self.budget_hits),
+            "token_usage": dict(self.token_usage)
         }
     
+    def export_state(self) -> Dict[str, Any]:
+        """导出跨阶段延续的状态（辩论线程、工具记忆、用量统计），用于写入检查点"""
+        return {
+            "debate_thread": messages_to_dict(self.debate_thread),
+            "memory": self.memory.export_state(),
+            "token_usage": dict(self.token_usage),
+            "budget_hits": list(self.budget_hits),
+            "routing_stats": {phase: {"calls": dict(stats["calls"]), "escalations": stats["escalations"]}
+                              for phase, stats in self.routing_stats.items()}
+        }
+    
+    def restore_state(self, state: Dict[str, Any]):
+        """从检查点恢复状态"""
+        self.debate_thread = messages_from_dict(state.get("debate_thread", []))
+        self.memory.restore_state(state.get("memory") or {})
+        self.token_usage.update(state.get("token_usage") or {})
+        self.budget_hits = list(state.get("budget_hits", []))
+        self.routing_stats.update(state.get("routing_stats") or {})
+    
     async def close(self):
         """关闭智能体连接"""
         if self.client:
-            await self.client.close()
\ No newline at end of file
+            await self.client.close()
+        await self.http_client.aclose()
\ No newline at end of file
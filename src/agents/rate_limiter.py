@@ -0,0 +1,66 @@
+# 模型请求限速
+
+import asyncio
+import threading
+import time
+from typing import Dict, Any, Optional
+from urllib.parse import urlparse
+from ..monitoring.metrics import LLM_RATE_LIMIT_WAIT
+
+class RequestRateLimiter:
+    """令牌桶限速器：按固定速率发放请求许可，允许burst个请求的突发
+    
+    许可在线程锁内预约（令牌数可以为负，表示已预约到未来的时刻），调用方在锁外等待，
+    因此同一个限速器可以被不同事件循环（如协调器线程和主线程）中的团队共享。
+    """
+    
+    def __init__(self, requests_per_minute: float, burst: int = 1):
+        self.rate = requests_per_minute / 60.0
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated_at = time.monotonic()
+        self.waited_seconds = 0.0
+        self.throttled = 0
+        self._lock = threading.Lock()
+    
+    def reserve(self) -> float:
+        """预约一个许可，返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            if wait:
+                self.waited_seconds += wait
+                self.throttled += 1
+        return wait
+    
+    async def acquire(self, *_):
+        """等待许可；签名兼容httpx的请求钩子"""
+        wait = self.reserve()
+        if wait:
+            LLM_RATE_LIMIT_WAIT.inc(wait)
+            await asyncio.sleep(wait)
+    
+    def get_status(self) -> Dict[str, Any]:
+        return {"requests_per_minute": self.rate * 60, "burst": self.burst,
+                "throttled": self.throttled, "waited_seconds": round(self.waited_seconds, 2)}
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def shared_rate_limiter(rate_config: Optional[Dict[str, Any]], base_url: Optional[str]) -> Optional[RequestRateLimiter]:
+    """按服务商地址获取进程内共享的限速器，同一进程中所有团队和智能体对同一服务商共用一个令牌桶
+    
+    未配置 requests_per_minute 时返回None（不限速）。
+    """
+    rate_config = rate_config or {}
+    requests_per_minute = rate_config.get("requests_per_minute") or 0
+    if requests_per_minute <= 0:
+        return None
+    key = urlparse(base_url or "").netloc or base_url or ""
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = RequestRateLimiter(requests_per_minute, rate_config.get("burst", 5))
+        return _limiters[key]
@@ -0,0 +1,215 @@
+# 同一股票并发运行请求的合并
+
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+from ..data.market_data import to_ts_code
+from ..monitoring.metrics import COALESCED_REQUESTS, QUEUE_DEPTH
+from ..monitoring.logs import get_logger
+
+logger = get_logger("service")
+
+class RunFlight:
+    """一次进行中（或刚完成）的运行，合并到该运行的所有请求共享它的进度事件和最终结果
+    
+    事件列表和结果都是线程安全的：同步调用方用 events_since/result 阻塞等待，
+    异步调用方在任意事件循环中用 stream/wait。
+    """
+    
+    def __init__(self, key: Tuple[str, str], stock_code: str, params: Dict[str, Any]):
+        self.key = key
+        self.stock_code = stock_code
+        self.params = params
+        self.events = []
+        self.subscribers = 1
+        self.created_at = time.time()
+        self.finished_at = None
+        self.future = Future()
+        self._condition = threading.Condition()
+    
+    def publish(self, event: Dict[str, Any]):
+        """追加一条进度事件并唤醒等待者"""
+        with self._condition:
+            self.events.append(event)
+            self._condition.notify_all()
+    
+    def finish(self, result: Optional[Dict[str, Any]] = None, error: Optional[BaseException] = None):
+        with self._condition:
+            self.finished_at = time.time()
+            if error is not None:
+                self.future.set_exception(error)
+            else:
+                self.future.set_result(result)
+            self._condition.notify_all()
+    
+    def done(self) -> bool:
+        return self.future.done()
+    
+    def failed(self) -> bool:
+        return self.future.done() and self.future.exception() is not None
+    
+    def events_since(self, cursor: int = 0, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """返回cursor之后的进度事件；没有新事件且运行未结束时最多等待timeout秒"""
+        with self._condition:
+            if cursor >= len(self.events) and not self.done():
+                self._condition.wait(timeout)
+            return self.events[cursor:]
+    
+    async def stream(self):
+        """异步迭代进度事件：先补发已有事件，再推送后续事件，运行结束后停止"""
+        cursor = 0
+        while True:
+            events = await asyncio.to_thread(self.events_since, cursor, 1.0)
+            for event in events:
+                yield event
+            cursor += len(events)
+            if self.done() and cursor >= len(self.events):
+                return
+    
+    def result(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """阻塞等待运行结果（同步调用方）"""
+        return self.future.result(timeout)
+    
+    async def wait(self) -> Dict[str, Any]:
+        """等待运行结果（异步调用方，可在任意事件循环中使用）"""
+        return await asyncio.wrap_future(self.future)
+
+class RunCoordinator:
+    """按股票和参数合并运行请求（single-flight）
+    
+    相同请求附加到进行中的运行，共享其进度和结果；刚完成的运行在保鲜窗口内直接复用。
+    团队管理器及其MCP连接运行在协调器专用的事件循环线程上，因此可以被多个线程
+    （如Streamlit的多个会话）共享。智能体持有运行中的辩论状态，不同股票的运行依次执行。
+    """
+    
+    def __init__(self, team_manager: Any, freshness_seconds: float = 300):
+        self.team_manager = team_manager
+        self.freshness_seconds = freshness_seconds
+        self.flights = {}  # 请求键 -> 进行中或最近完成的运行
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._run_lock = None
+        self._tasks = set()  # 尚未结束的运行任务，关闭时取消
+        self.stats = {"runs": 0, "coalesced": 0, "fresh_hits": 0, "failed": 0}
+    
+    def start(self, offline: bool = False):
+        """启动专用事件循环线程并在其上初始化团队"""
+        if self._loop is not None:
+            return
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="run-coordinator", daemon=True)
+        self._thread.start()
+        
+        async def setup():
+            self._run_lock = asyncio.Lock()
+            await self.team_manager.initialize_team(offline=offline)
+        
+        asyncio.run_coroutine_threadsafe(setup(), self._loop).result()
+    
+    @staticmethod
+    def request_key(stock_code: str, params: Dict[str, Any]) -> Tuple[str, str]:
+        """请求键：规范化的股票代码加上排序后的参数"""
+        return to_ts_code(stock_code), json.dumps(params, sort_keys=True, default=str)
+    
+    def submit(self, stock_code: str, **params) -> Tuple[RunFlight, bool]:
+        """提交运行请求，可在任意线程调用
+        
+        Returns:
+            (运行句柄, 是否合并到了已有运行)
+        """
+        if self._loop is None:
+            raise RuntimeError("协调器未启动，请先调用start()")
+        
+        key = self.request_key(stock_code, params)
+        with self._lock:
+            flight = self.flights.get(key)
+            if flight is not None and not flight.failed():
+                if not flight.done():
+                    flight.subscribers += 1
+                    self.stats["coalesced"] += 1
+                    COALESCED_REQUESTS.inc(kind="in_flight")
+                    logger.info(f"🔗 {key[0]} 已有进行中的运行，合并请求（共 {flight.subscribers} 个请求）")
+                    return flight, True
+                if time.time() - flight.finished_at <= self.freshness_seconds:
+                    flight.subscribers += 1
+                    self.stats["fresh_hits"] += 1
+                    COALESCED_REQUESTS.inc(kind="fresh")
+                    logger.info(f"♻️ {key[0]} 的运行于 {time.time() - flight.finished_at:.0f} 秒前完成，直接复用")
+                    return flight, True
+            
+            flight = RunFlight(key, stock_code, params)
+            self.flights[key] = flight
+            self._prune()
+        
+        task = asyncio.run_coroutine_threadsafe(self._execute(flight), self._loop)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return flight, False
+    
+    def _prune(self):
+        """移除已过保鲜期的运行（在持有锁时调用）"""
+        now = time.time()
+        expired = [key for key, flight in self.flights.items()
+                   if flight.done() and now - flight.finished_at > self.freshness_seconds]
+        for key in expired:
+            del self.flights[key]
+    
+    async def _execute(self, flight: RunFlight):
+        def event(stage: str, **data):
+            flight.publish({"stock_code": flight.stock_code, "stage": stage,
+                            "timestamp": datetime.now().isoformat(), **data})
+        
+        if self._run_lock.locked():
+            event("queued")
+        QUEUE_DEPTH.inc(queue="coordinator")
+        queued = True
+        try:
+            async with self._run_lock:
+                QUEUE_DEPTH.dec(queue="coordinator")
+                queued = False
+                self.stats["runs"] += 1
+                event("started")
+                self.team_manager.progress_listeners.append(flight.publish)
+                try:
+                    result = await self.team_manager.run_stock(flight.stock_code, **flight.params)
+                finally:
+                    self.team_manager.progress_listeners.remove(flight.publish)
+            event("finished", run_id=result.get("run_id"))
+            flight.finish(result)
+        except Exception as e:
+            self.stats["failed"] += 1
+            event("error", error=str(e))
+            flight.finish(error=e)
+        finally:
+            # 排队等锁或运行中被取消时同样结束该运行，唤醒合并到它的请求，并从进行中的运行里移除
+            if queued:
+                QUEUE_DEPTH.dec(queue="coordinator")
+            if not flight.done():
+                with self._lock:
+                    if self.flights.get(flight.key) is flight:
+                        del self.flights[flight.key]
+                event("error", error="运行已取消")
+                flight.finish(error=RuntimeError("运行已取消"))
+    
+    def get_status(self) -> Dict[str, Any]:
+        """协调器状态：运行次数、合并和复用次数，以及当前进行中的运行"""
+        with self._lock:
+            in_flight = {flight.key[0]: flight.subscribers for flight in self.flights.values() if not flight.done()}
+        return {**self.stats, "in_flight": in_flight, "freshness_seconds": self.freshness_seconds}
+    
+    def close(self):
+        """取消进行中的运行，关闭团队并停止事件循环线程"""
+        if self._loop is None:
+            return
+        for task in list(self._tasks):
+            task.cancel()
+        asyncio.run_coroutine_threadsafe(self.team_manager.close_team(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
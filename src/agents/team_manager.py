@@ -2,15 +2,42 @@
 
 import asyncio
 import json
+import os
+import time
 import yaml
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 from .base_agent import BaseAgent
+from .rate_limiter import shared_rate_limiter
+from ..tools.mcp_layer import MCPToolLayer
+from ..tools.local_tools import LocalToolkit
+from ..tools.portfolio_risk import align_returns, compute_portfolio_risk
+from ..tools.risk_metrics import round_metrics
+from ..tools.tool_filter import estimate_tokens
+from ..data.market_data import render_args, to_ts_code
+from ..data.price_store import PriceStore
+from ..data.trading_calendar import TradingCalendar
+from ..data.result_store import ResultStore
+from ..data.checkpoint_store import CheckpointStore
+from ..monitoring.metrics import REGISTRY, STAGE_LATENCY, DEBATE_ROUNDS, DEBATE_POSTS, RUNS, start_metrics_server
 from ..prompts.technical_analyst import TECHNICAL_ANALYST_PROMPT
 from ..prompts.fundamental_analyst import FUNDAMENTAL_ANALYST_PROMPT
 from ..prompts.quantitative_analyst import QUANTITATIVE_ANALYST_PROMPT
 from ..prompts.sentiment_analyst import SENTIMENT_ANALYST_PROMPT
 from ..prompts.risk_manager import RISK_MANAGER_PROMPT
+from ..monitoring.logs import get_logger, flush_logs
+
+logger = get_logger("team")
+
+def _snapshot(value: Any, depth: int = 3) -> Any:
+    """复制前几层列表和字典，后台写入检查点时不受事件循环上后续修改的影响"""
+    if depth == 0:
+        return value
+    if isinstance(value, dict):
+        return {key: _snapshot(item, depth - 1) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_snapshot(item, depth - 1) for item in value]
+    return value
 
 class AgentTeamManager:
     """智能体团队管理器，负责协调多个分析师智能体的协作"""
@@ -21,10 +48,26 @@ class AgentTeamManager:
         self.config = self._load_config()
         self.mcp_config = self._load_mcp_config()
         self.agents = {}
+        self.tool_layer = None
+        self.local_toolkit = None
+        self._price_cache = {}
         self.debate_history = []
         self.analysis_results = []
+        self.analysis_stats = {}
         self.final_decisions = []
-        
+        self.result_store = ResultStore((self.config.get("result_store") or {}).get("root", "results"))
+        checkpoint_config = self.config.get("checkpoint") or {}
+        self.checkpoints = CheckpointStore(checkpoint_config.get("root", "checkpoints")) \
+            if checkpoint_config.get("enabled", True) else None
+        # 当前运行的ID和检查点内容；未调用start_run/resume_run时不写检查点
+        self.run_id = None
+        self.run_state = {}
+        # 检查点在后台线程写入：各运行待写入的最新快照和正在运行的写入任务
+        self._pending_checkpoints = {}
+        self._checkpoint_writer = None
+        # 进度监听器：每完成一个步骤（写检查点时）收到一条进度事件
+        self.progress_listeners = []
+    
     def _load_config(self) -> Dict[str, Any]:
         """加载主配置文件（不包含MCP配置）"""
         try:
@@ -45,11 +88,43 @@ class AgentTeamManager:
         except Exception as e:
             raise Exception(f"加载MCP配置文件失败: {e}")
     
-
     
-    async def initialize_team(self):
-        """初始化智能体团队"""
-        print("🚀 开始初始化智能体团队...")
+    
+    async def initialize_team(self, offline: bool = False):
+        """初始化智能体团队
+        
+        Args:
+            offline: 离线模式，不连接MCP服务器、不注册任何工具，用于基于已保存的分析重放辩论和决策
+        """
+        logger.info("🚀 开始初始化智能体团队...")
+        start_metrics_server(self.config.get("metrics"))
+        
+        # 初始化团队共享的MCP工具层，所有智能体复用同一组连接和工具
+        if offline:
+            logger.info("📴 离线模式：不连接MCP服务器，智能体不使用工具")
+            self.tool_layer = None
+        else:
+            try:
+                self.tool_layer = MCPToolLayer(self.mcp_config, self.config.get("tools_config", {}))
+                await self.tool_layer.initialize()
+            except Exception as e:
+                logger.error(f"❌ MCP工具层初始化失败: {e}，各智能体将单独连接MCP服务器")
+                self.tool_layer = None
+        
+        # 本地计算工具（指标等），通过工具层获取行情后在本地计算
+        store_config = self.config.get("price_store") or {}
+        price_store = PriceStore(
+            store_config.get("root", "data/prices"),
+            calendar=TradingCalendar.from_config((self.config.get("watchlist") or {}).get("calendar")),
+            close_time=store_config.get("close_time", "15:30"),
+            max_open_codes=store_config.get("max_open_codes", 256)
+        ) if store_config.get("enabled") else None
+        self.local_toolkit = LocalToolkit(
+            self.tool_layer,
+            self.config.get("local_tools", {}),
+            price_store=price_store,
+            initial_lookback_days=store_config.get("initial_lookback_days", 730)
+        )
         
         # 定义智能体配置
         agent_configs = [
@@ -71,88 +146,664 @@ class AgentTeamManager:
                     name=agent_name,
                     role=role,
                     prompt=prompt,
-                    model_config=agent_config
+                    model_config=agent_config,
+                    memory_config=self.config.get("agent_memory"),
+                    budget_config=self.config.get("react_budget"),
+                    rate_limiter=shared_rate_limiter(self.config.get("llm_rate_limit"), agent_config.get("base_url"))
                 )
                 
                 # 初始化MCP连接
-                await agent.initialize_mcp(self.mcp_config)
+                if offline:
+                    await agent.initialize_mcp({}, None, [])
+                else:
+                    await agent.initialize_mcp(self.mcp_config, self.tool_layer, self.local_toolkit.tools_for(agent_key))
                 
                 self.agents[agent_key] = agent
-                print(f"✅ {agent_name} 初始化成功")
-                
+                logger.info(f"✅ {agent_name} 初始化成功")
+            
+            except Exception as e:
+                logger.error(f"❌ {agent_key} 初始化失败: {e}")
+        
+        logger.info(f"🎉 团队初始化完成，共有 {len(self.agents)} 个智能体")
+        self._print_tool_savings()
+    
+    def _print_tool_savings(self):
+        """打印各智能体按角色筛选工具后节省的prompt token"""
+        reports = {key: agent.tool_stats for key, agent in self.agents.items() if agent.tool_stats}
+        if not reports:
+            return
+        
+        logger.info("🧰 工具筛选报告（每次模型调用的工具schema token）:")
+        for agent_key, stats in reports.items():
+            agent = self.agents[agent_key]
+            logger.info(f"  - {agent.name}: 工具 {stats['selected_tools']}/{stats['total_tools']}，"
+                        f"schema {stats['selected_schema_tokens']}/{stats['full_schema_tokens']} token，"
+                        f"节省 {stats['saved_tokens_per_call']} ({stats['saved_ratio']:.0%})")
+    
+    def start_run(self, stock_code: str, run_id: Optional[str] = None) -> str:
+        """开始一次可恢复的运行，之后各阶段完成时写入检查点"""
+        self.run_id = run_id or self.result_store.new_run_id(stock_code)
+        self.run_state = {"stock_code": stock_code, "stage": "analysis"}
+        logger.info(f"🆔 运行ID: {self.run_id}")
+        return self.run_id
+    
+    def checkpoint(self, stage: Optional[str] = None, **progress):
+        """写入检查点：当前阶段、各阶段结果以及智能体的延续状态"""
+        if stage:
+            self.run_state["stage"] = stage
+        self._notify_progress()
+        if not self.run_id or self.checkpoints is None:
+            return
+        self.run_state.update(progress)
+        self.run_state.update({
+            "analysis_results": self.analysis_results,
+            "analysis_stats": self.analysis_stats,
+            "debate_history": self.debate_history,
+            "final_decisions": self.final_decisions,
+            "agents": {agent_key: agent.export_state() for agent_key, agent in self.agents.items()}
+        })
+        # 事件循环上只复制容器（各条记录追加后不再修改），序列化和fsync交给后台线程
+        self._pending_checkpoints[self.run_id] = _snapshot(self.run_state)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._save_pending_checkpoint()
+            return
+        if self._checkpoint_writer is None or self._checkpoint_writer.done():
+            self._checkpoint_writer = loop.create_task(self._write_checkpoints())
+    
+    def _save_pending_checkpoint(self):
+        run_id = next(iter(self._pending_checkpoints))
+        state = self._pending_checkpoints.pop(run_id)
+        try:
+            self.checkpoints.save(run_id, state)
+        except Exception as e:
+            logger.warning(f"⚠️ 写入检查点失败: {e}")
+    
+    async def _write_checkpoints(self):
+        """后台写入检查点：每个运行总是写最新的快照，写入期间产生的多个检查点合并为一次写入"""
+        while self._pending_checkpoints:
+            await asyncio.to_thread(self._save_pending_checkpoint)
+    
+    async def flush_checkpoints(self):
+        """等待后台检查点写入完成"""
+        if self._checkpoint_writer is not None:
+            await asyncio.shield(self._checkpoint_writer)
+    
+    def _notify_progress(self):
+        """向进度监听器发送当前阶段和各阶段已完成的数量"""
+        if not self.progress_listeners:
+            return
+        event = {
+            "stock_code": self.run_state.get("stock_code"),
+            "stage": self.run_state.get("stage"),
+            "analyses": sum(1 for result in self.analysis_results if "error" not in result),
+            "debate_posts": len(self.debate_history),
+            "decisions": len(self.final_decisions),
+            "timestamp": datetime.now().isoformat()
+        }
+        for listener in list(self.progress_listeners):
+            try:
+                listener(event)
+            except Exception as e:
+                logger.warning(f"⚠️ 进度监听器异常: {e}")
+    
+    async def run_stock(self, stock_code: str, incremental: bool = False) -> Dict[str, Any]:
+        """完整运行一只股票：分析、辩论、决策并写入结果库，返回各阶段结果
+        
+        Args:
+            stock_code: 股票代码
+            incremental: 是否以结果库中上一次运行为基线做增量分析
+        """
+        self.start_run(stock_code)
+        self.analysis_results, self.debate_history, self.final_decisions = [], [], []
+        
+        try:
+            result = await self.analyze_stock_incremental(stock_code) if incremental else None
+            if result is None:
+                if (self.config.get("scheduler") or {}).get("enabled", False):
+                    result = await self.run_pipeline(stock_code)
+                else:
+                    result = await self.analyze_stock(stock_code)
+            if "error" in result:
+                raise RuntimeError(result["error"])
+            
+            incremental_info = result.get("incremental")
+            if "debate_history" not in result and not (incremental_info and not incremental_info["material"]):
+                await self.conduct_debate(stock_code, self.analysis_results)
+            await self.make_final_decisions(stock_code)
+            run_id = await self.save_run(stock_code, {"incremental": incremental_info} if incremental_info else None)
+        except Exception:
+            RUNS.inc(status="error")
+            raise
+        RUNS.inc(status="ok")
+        
+        return {
+            "run_id": run_id,
+            "stock_code": stock_code,
+            "analysis_results": self.analysis_results,
+            "analysis_stats": self.analysis_stats,
+            "debate_history": self.debate_history,
+            "final_decisions": self.final_decisions,
+            "incremental": incremental_info,
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    def resume_run(self, run_id: str) -> Dict[str, Any]:
+        """从检查点恢复运行状态，返回检查点内容（含stock_code和stage）"""
+        if self.checkpoints is None:
+            raise RuntimeError("检查点未启用")
+        state = self.checkpoints.load(run_id)
+        self.run_id = run_id
+        self.run_state = state
+        self.analysis_results = state.get("analysis_results", [])
+        self.analysis_stats = state.get("analysis_stats", {})
+        self.debate_history = state.get("debate_history", [])
+        self.final_decisions = state.get("final_decisions", [])
+        for agent_key, agent_state in (state.get("agents") or {}).items():
+            if agent_key in self.agents:
+                self.agents[agent_key].restore_state(agent_state)
+        
+        logger.info(f"♻️ 从检查点恢复运行 {run_id}: 股票 {state['stock_code']}，阶段 {state['stage']}，"
+                    f"已有分析 {len(self.analysis_results)} 份、辩论发言 {len(self.debate_history)} 条、决策 {len(self.final_decisions)} 份")
+        return state
+    
+    def load_saved_run(self, source: str) -> Dict[str, Any]:
+        """加载已保存的运行结果，用于离线重放辩论和决策阶段
+        
+        Args:
+            source: export_results导出的analysis_results_*.json文件路径，或结果库中的运行ID
+        """
+        if os.path.exists(source):
+            with open(source, 'r', encoding='utf-8') as f:
+                run = json.load(f)
+        else:
+            run = self.result_store.load(source)
+        
+        if not any("error" not in result for result in run.get("analysis_results", [])):
+            raise ValueError(f"{source} 中没有可用的分析结果")
+        
+        self.analysis_results = run["analysis_results"]
+        self.analysis_stats = run.get("analysis_stats", {})
+        self.debate_history = run.get("debate_history", [])
+        self.final_decisions = []
+        self.run_state = {"stock_code": run.get("stock_code"), "replay_of": source}
+        logger.info(f"📂 已加载 {source}: 分析 {len(self.analysis_results)} 份，辩论发言 {len(self.debate_history)} 条")
+        return run
+    
+    async def prefetch_data(self, stock_code: str) -> Dict[str, Any]:
+        """预取阶段：并行获取各智能体共用的基础数据集"""
+        prefetch_config = self.config.get("prefetch") or {}
+        datasets = prefetch_config.get("datasets", [])
+        default_lookback = prefetch_config.get("lookback_days", 120)
+        
+        if not self.tool_layer or not datasets:
+            return {"datasets": [], "elapsed_seconds": 0.0}
+        
+        async def fetch(dataset: Dict[str, Any]) -> Dict[str, Any]:
+            args = render_args(dataset.get("args", {}), stock_code, dataset.get("lookback_days", default_lookback))
+            item = {"name": dataset.get("name", dataset["tool"]), "tool": dataset["tool"], "args": args}
+            try:
+                item["content"] = await self.tool_layer.call_tool(dataset["tool"], args)
             except Exception as e:
-                print(f"❌ {agent_key} 初始化失败: {e}")
+                item["error"] = str(e)
+            return item
+        
+        start_time = time.perf_counter()
+        results = await asyncio.gather(*[fetch(dataset) for dataset in datasets])
+        elapsed = time.perf_counter() - start_time
         
-        print(f"🎉 团队初始化完成，共有 {len(self.agents)} 个智能体")
+        succeeded = sum(1 for item in results if "error" not in item)
+        logger.info(f"📦 数据预取完成: {succeeded}/{len(results)} 个数据集，耗时 {elapsed:.2f} 秒")
+        for item in results:
+            if "error" in item:
+                logger.warning(f"⚠️ 预取 {item['name']} ({item['tool']}) 失败: {item['error']}")
+        
+        return {"datasets": results, "elapsed_seconds": round(elapsed, 2)}
+    
+    def _format_prefetch_context(self, bundle: Dict[str, Any]) -> str:
+        """将预取数据整理为注入智能体分析请求的上下文"""
+        max_chars = (self.config.get("prefetch") or {}).get("max_chars_per_dataset", 4000)
+        sections = []
+        for item in bundle.get("datasets", []):
+            if "error" in item:
+                continue
+            content = item["content"]
+            if self.tool_layer:
+                content = self.tool_layer.compactor.compact(item["tool"], content)
+            if len(content) > max_chars:
+                content = content[:max_chars] + "\n...(数据已截断)"
+            sections.append(
+                f"### {item['name']}（工具 {item['tool']}，参数 {json.dumps(item['args'], ensure_ascii=False)}）\n{content}"
+            )
+        
+        if not sections:
+            return ""
+        return ("以下基础数据已由团队统一预取，请直接使用，无需再用相同参数调用这些工具：\n\n"
+                + "\n\n".join(sections))
     
-    async def analyze_stock(self, stock_code: str) -> Dict[str, Any]:
-        """团队分析股票"""
-        print(f"\n📊 开始团队分析股票: {stock_code}")
+    async def analyze_stock(self, stock_code: str, prefetch: Optional[bool] = None,
+                            resume: bool = False) -> Dict[str, Any]:
+        """团队分析股票
+        
+        Args:
+            stock_code: 股票代码
+            prefetch: 是否先预取共用数据，为None时使用配置中的prefetch.enabled
+            resume: 是否从检查点继续，已成功完成的分析和预取数据直接复用
+        """
+        logger.info(f"📊 开始团队分析股票: {stock_code}")
         
         if not self.agents:
             return {"error": "团队未初始化"}
+        stage_start = time.perf_counter()
+        
+        # 从检查点恢复已完成的分析
+        completed = {}
+        if resume:
+            names = {agent.name: agent_key for agent_key, agent in self.agents.items()}
+            for result in self.analysis_results:
+                if "error" not in result and result.get("agent_name") in names:
+                    completed[names[result["agent_name"]]] = result
+            if completed:
+                logger.info(f"♻️ 复用检查点中 {len(completed)} 份已完成的分析")
+        
+        # 预取共用数据，注入各智能体的上下文
+        if prefetch is None:
+            prefetch = (self.config.get("prefetch") or {}).get("enabled", False)
+        if resume and "prefetch" in self.run_state:
+            bundle = self.run_state["prefetch"]
+        else:
+            bundle = await self.prefetch_data(stock_code) if prefetch else {"datasets": [], "elapsed_seconds": 0.0}
+            self.checkpoint("analysis", prefetch=bundle)
+        context = self._format_prefetch_context(bundle)
         
         analysis_results = []
+        agent_keys = list(self.agents.keys())
+        
+        async def run_analysis(agent_key: str) -> Dict[str, Any]:
+            if agent_key in completed:
+                return completed[agent_key]
+            result = await self.agents[agent_key].analyze(stock_code, context)
+            # 每完成一份分析写一次检查点
+            completed[agent_key] = result
+            if "error" not in result:
+                self.analysis_results = [completed[key] for key in agent_keys if key in completed]
+                self.checkpoint("analysis")
+            return result
         
         # 并行执行各智能体的分析
         tasks = []
-        for agent_key, agent in self.agents.items():
-            task = agent.analyze(stock_code)
+        for agent_key in agent_keys:
+            task = run_analysis(agent_key)
             tasks.append(task)
         
         # 等待所有分析完成
         results = await asyncio.gather(*tasks, return_exceptions=True)
         
         # 处理分析结果
-        for i, (agent_key, result) in enumerate(zip(self.agents.keys(), results)):
+        for i, (agent_key, result) in enumerate(zip(agent_keys, results)):
             if isinstance(result, Exception):
-                print(f"❌ {agent_key} 分析失败: {result}")
+                logger.error(f"❌ {agent_key} 分析失败: {result}")
                 analysis_results.append({
                     "agent_key": agent_key,
                     "error": str(result)
                 })
             else:
                 analysis_results.append(result)
-                print(f"✅ {result.get('agent_name', agent_key)} 分析完成")
+                logger.info(f"✅ {result.get('agent_name', agent_key)} 分析完成")
         
         # 保存分析结果
         self.analysis_results = analysis_results
+        self.analysis_stats = self._summarize_analysis(analysis_results, bundle)
+        logger.info(f"⏱️ 平均ReAct步数 {self.analysis_stats['avg_react_steps']}，"
+                    f"平均分析耗时 {self.analysis_stats['avg_elapsed_seconds']} 秒，"
+                    f"工具调用 {self.analysis_stats['total_tool_calls']} 次")
+        STAGE_LATENCY.observe(time.perf_counter() - stage_start, stage="analysis")
+        self.checkpoint("debate", debate_progress=None)
         
         return {
             "stock_code": stock_code,
             "analysis_results": analysis_results,
+            "analysis_stats": self.analysis_stats,
             "timestamp": datetime.now().isoformat()
         }
     
-    async def conduct_debate(self, stock_code: str, analysis_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """进行团队辩论"""
-        print(f"\n🗣️ 开始团队辩论: {stock_code}")
+    def _summarize_analysis(self, analysis_results: List[Dict[str, Any]], bundle: Dict[str, Any]) -> Dict[str, Any]:
+        """统计分析阶段的ReAct步数、耗时和工具调用，用于衡量预取带来的节省"""
+        succeeded = [result for result in analysis_results if "error" not in result]
+        count = len(succeeded) or 1
+        prefetched_tools = {item["tool"] for item in bundle.get("datasets", []) if "error" not in item}
+        
+        return {
+            "prefetch_enabled": bool(bundle.get("datasets")),
+            "prefetch_datasets": len(prefetched_tools),
+            "prefetch_elapsed_seconds": bundle.get("elapsed_seconds", 0.0),
+            "avg_react_steps": round(sum(r.get("react_steps", 0) for r in succeeded) / count, 2),
+            "avg_elapsed_seconds": round(sum(r.get("elapsed_seconds", 0) for r in succeeded) / count, 2),
+            "max_elapsed_seconds": max((r.get("elapsed_seconds", 0) for r in succeeded), default=0),
+            "total_tool_calls": sum(len(r.get("tool_calls", [])) for r in succeeded),
+            "budget_hits": sum(1 for r in succeeded if r.get("budget_hit")),
+            # 预取后仍调用同名工具的次数，理想情况下应接近0
+            "repeated_prefetched_calls": sum(
+                1 for r in succeeded for call in r.get("tool_calls", []) if call.get("tool") in prefetched_tools
+            )
+        }
+    
+    async def _market_snapshot(self, stock_code: str) -> Dict[str, Any]:
+        """记录最新一根K线的日期和收盘价，作为下次增量分析的基线"""
+        try:
+            bars = await self.local_toolkit.fetch_ohlcv(stock_code, lookback_days=30)
+            return {"date": int(bars["date"][-1]), "close": float(bars["close"][-1])}
+        except Exception as e:
+            logger.warning(f"⚠️ 获取 {stock_code} 行情快照失败: {e}")
+            return {}
+    
+    async def save_run(self, stock_code: str, extra: Optional[Dict[str, Any]] = None) -> str:
+        """将本次完整运行结果写入结果库，返回运行ID"""
+        run = {
+            "stock_code": stock_code,
+            "analysis_results": self.analysis_results,
+            "analysis_stats": self.analysis_stats,
+            "debate_history": self.debate_history,
+            "final_decisions": self.final_decisions,
+            "token_usage": self.get_team_status()["token_usage"],
+            "market_snapshot": await self._market_snapshot(stock_code),
+            "timestamp": datetime.now().isoformat()
+        }
+        if extra:
+            run.update(extra)
+        
+        run_id = self.result_store.save(run, self.run_id)
+        logger.info(f"🗂️ 运行结果已保存: {run_id}")
+        return run_id
+    
+    async def _collect_delta(self, stock_code: str, previous: Dict[str, Any]) -> Dict[str, Any]:
+        """获取上次运行之后的新增数据：新K线和各预取数据集的增量窗口"""
+        incremental_config = self.config.get("incremental") or {}
+        since = datetime.fromisoformat(previous["timestamp"])
+        # 多取一天，避免跨日边界漏掉上次运行当天收盘后的数据
+        lookback_days = max((datetime.now() - since).days + 1, 1)
+        
+        delta = {"lookback_days": lookback_days, "new_bars": 0, "price_change": 0.0, "datasets": []}
+        
+        # 无法确认价格变动时记录原因，调用方按重大变化处理
+        snapshot = previous.get("market_snapshot") or {}
+        if not snapshot:
+            delta["price_error"] = "上次运行没有行情快照"
+        else:
+            try:
+                bars = await self.local_toolkit.fetch_ohlcv(stock_code, lookback_days=lookback_days + 10)
+                newer = bars["date"] > snapshot["date"]
+                delta["new_bars"] = int(newer.sum())
+                if delta["new_bars"]:
+                    delta["latest_close"] = float(bars["close"][-1])
+                    delta["price_change"] = round(delta["latest_close"] / snapshot["close"] - 1, 4)
+            except Exception as e:
+                delta["price_error"] = f"获取新增行情失败: {e}"
+                logger.warning(f"⚠️ 获取 {stock_code} 新增行情失败: {e}")
+        
+        datasets = incremental_config.get("datasets") or (self.config.get("prefetch") or {}).get("datasets", [])
+        if self.tool_layer and datasets:
+            async def fetch(dataset: Dict[str, Any]) -> Dict[str, Any]:
+                args = render_args(dataset.get("args", {}), stock_code, lookback_days)
+                item = {"name": dataset.get("name", dataset["tool"]), "tool": dataset["tool"], "args": args}
+                try:
+                    item["content"] = await self.tool_layer.call_tool(dataset["tool"], args)
+                except Exception as e:
+                    item["error"] = str(e)
+                return item
+            
+            delta["datasets"] = await asyncio.gather(*[fetch(dataset) for dataset in datasets])
+        
+        return delta
+    
+    def _format_delta_context(self, previous: Dict[str, Any], delta: Dict[str, Any]) -> str:
+        """将增量数据整理为智能体更新观点的上下文"""
+        lines = [f"上次分析时间: {previous['timestamp']}"]
+        snapshot = previous.get("market_snapshot") or {}
+        if snapshot:
+            lines.append(f"上次分析时最新交易日 {snapshot['date']}，收盘价 {snapshot['close']}")
+        if delta.get("price_error"):
+            lines.append(f"无法确认此后的价格变动（{delta['price_error']}），请结合其他数据谨慎判断")
+        elif delta["new_bars"]:
+            lines.append(f"此后新增 {delta['new_bars']} 个交易日，最新收盘价 {delta['latest_close']}，"
+                         f"累计涨跌幅 {delta['price_change']:.2%}")
+        else:
+            lines.append("此后没有新的交易日数据")
+        
+        context = self._format_prefetch_context({"datasets": delta["datasets"]})
+        if context:
+            lines.append("")
+            lines.append(context)
+        return "\n".join(lines)
+    
+    async def analyze_stock_incremental(self, stock_code: str) -> Optional[Dict[str, Any]]:
+        """增量分析：以上一次运行为基线，只获取新增数据并让各智能体更新原有观点
+        
+        没有可用的历史运行（或距今过久）时返回None，由调用方回退到完整分析
+        """
+        logger.info(f"📊 开始增量分析股票: {stock_code}")
+        
+        if not self.agents:
+            return {"error": "团队未初始化"}
+        
+        incremental_config = self.config.get("incremental") or {}
+        previous = self.result_store.latest(stock_code)
+        if not previous:
+            logger.info(f"ℹ️ 结果库中没有 {stock_code} 的历史运行，执行完整分析")
+            return None
+        
+        age_days = (datetime.now() - datetime.fromisoformat(previous["timestamp"])).days
+        if age_days > incremental_config.get("max_age_days", 7):
+            logger.info(f"ℹ️ 上次运行 {previous['run_id']} 已过去 {age_days} 天，执行完整分析")
+            return None
+        
+        start_time = time.perf_counter()
+        delta = await self._collect_delta(stock_code, previous)
+        context = self._format_delta_context(previous, delta)
+        
+        prior_analyses = {
+            result.get("agent_name"): result.get("analysis", "")
+            for result in previous.get("analysis_results", []) if "error" not in result
+        }
+        
+        # 有上次结论的智能体做增量更新，其余的照常完整分析
+        tasks = []
+        for agent_key, agent in self.agents.items():
+            prior = prior_analyses.get(agent.name)
+            if prior:
+                tasks.append(agent.update_analysis(stock_code, prior, context))
+            else:
+                tasks.append(agent.analyze(stock_code, context))
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        
+        analysis_results = []
+        for agent_key, result in zip(self.agents.keys(), results):
+            if isinstance(result, Exception):
+                logger.error(f"❌ {agent_key} 增量分析失败: {result}")
+                analysis_results.append({"agent_key": agent_key, "error": str(result)})
+            else:
+                analysis_results.append(result)
+                status = "观点更新" if result.get("view_changed", True) else "观点不变"
+                logger.info(f"✅ {result.get('agent_name', agent_key)} 增量分析完成（{status}）")
+        
+        # 判断变化是否重大：价格波动超过阈值、任一智能体调整了观点或分析失败
+        # （分析失败时无法确认观点未变，不能沿用上次的辩论记录）
+        reasons = []
+        threshold = incremental_config.get("price_change_threshold", 0.03)
+        if delta.get("price_error"):
+            reasons.append(f"无法确认价格变动（{delta['price_error']}）")
+        elif abs(delta["price_change"]) >= threshold:
+            reasons.append(f"价格变动 {delta['price_change']:.2%} 超过阈值 {threshold:.0%}")
+        changed = [result.get("agent_name") for result in analysis_results
+                   if "error" not in result and result.get("view_changed", True)]
+        if changed:
+            reasons.append(f"观点发生变化: {', '.join(changed)}")
+        failed = [result.get("agent_name") or result.get("agent_key") for result in analysis_results if "error" in result]
+        if failed:
+            reasons.append(f"增量分析失败: {', '.join(failed)}")
+        
+        self.analysis_results = analysis_results
+        self.analysis_stats = self._summarize_analysis(analysis_results, {"datasets": delta["datasets"]})
+        # 观点未变化时沿用上次的辩论记录，供最终决策参考
+        self.debate_history = [] if reasons else previous.get("debate_history", [])
+        
+        elapsed = time.perf_counter() - start_time
+        logger.info(f"🔁 增量分析完成，基线 {previous['run_id']}，新增 {delta['new_bars']} 个交易日，"
+                    f"{'变化重大' if reasons else '无重大变化'}，耗时 {elapsed:.2f} 秒")
+        
+        return {
+            "stock_code": stock_code,
+            "analysis_results": analysis_results,
+            "analysis_stats": self.analysis_stats,
+            "incremental": {
+                "previous_run_id": previous["run_id"],
+                "new_bars": delta["new_bars"],
+                "price_change": delta["price_change"],
+                "price_error": delta.get("price_error"),
+                "material": bool(reasons),
+                "reasons": reasons,
+                "elapsed_seconds": round(elapsed, 2)
+            },
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    async def analyze_portfolio(self, holdings: Dict[str, float],
+                                sectors: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """组合风险分析：批量获取持仓行情，本地计算组合风险，再交由风险管理师评述
+        
+        Args:
+            holdings: 股票代码 -> 持仓权重（市值或比例均可，会自动归一化）
+            sectors: 股票代码 -> 行业，可选
+        """
+        logger.info(f"🛡️ 开始组合风险分析: {len(holdings)} 只持仓")
+        
+        if not self.local_toolkit:
+            return {"error": "团队未初始化"}
+        
+        portfolio_config = self.config.get("portfolio") or {}
+        lookback_days = portfolio_config.get("lookback_days", 365)
+        semaphore = asyncio.Semaphore(portfolio_config.get("max_concurrency", 8))
+        # 同一股票的不同写法（000001 / 000001.SZ）归一后权重累加
+        weights = {}
+        for code, weight in holdings.items():
+            ts_code = to_ts_code(code)
+            weights[ts_code] = weights.get(ts_code, 0.0) + float(weight)
+        if not sum(weights.values()):
+            return {"error": "持仓权重之和为0，无法归一化"}
+        
+        # 行情缓存在有效期内复用，过期条目在每次分析时清理，避免长期运行的进程无限增长
+        cache_seconds = portfolio_config.get("price_cache_seconds", 300)
+        now = time.monotonic()
+        self._price_cache = {key: entry for key, entry in self._price_cache.items() if now - entry[0] < cache_seconds}
+        
+        async def fetch(ts_code: str):
+            # 重复分析同一组合时不再重复调用工具
+            key = (ts_code, lookback_days)
+            if key not in self._price_cache:
+                async with semaphore:
+                    bars = await self.local_toolkit.fetch_ohlcv(ts_code, lookback_days)
+                self._price_cache[key] = (time.monotonic(), (bars["date"], bars["close"]))
+            return self._price_cache[key][1]
+        
+        start_time = time.perf_counter()
+        results = await asyncio.gather(*[fetch(code) for code in weights], return_exceptions=True)
+        fetch_elapsed = time.perf_counter() - start_time
+        
+        prices = {}
+        failed = []
+        for code, result in zip(weights, results):
+            if isinstance(result, Exception):
+                failed.append(code)
+            else:
+                prices[code] = result
+        logger.info(f"📦 行情获取完成: {len(prices)}/{len(weights)} 只，耗时 {fetch_elapsed:.2f} 秒")
+        
+        if len(prices) < 2:
+            return {"error": "可用行情不足，无法进行组合分析", "failed": failed}
+        
+        # 本地向量化计算组合风险
+        start_time = time.perf_counter()
+        returns, dropped = align_returns(prices, portfolio_config.get("min_coverage", 0.8))
+        if not sum(weights[code] for code in returns.columns):
+            return {"error": "有效持仓的权重之和为0，无法归一化", "failed": failed, "insufficient_data": dropped}
+        risk = compute_portfolio_risk(
+            returns,
+            weights,
+            sectors={to_ts_code(code): sector for code, sector in (sectors or {}).items()},
+            confidence_levels=portfolio_config.get("confidence_levels", [0.95, 0.99]),
+            top_n=portfolio_config.get("top_n", 10)
+        )
+        compute_elapsed = time.perf_counter() - start_time
+        risk["excluded"] = {"fetch_failed": failed, "insufficient_data": dropped}
+        risk = round_metrics(risk)
+        logger.info(f"🧮 组合风险计算完成，耗时 {compute_elapsed:.2f} 秒")
+        
+        # 只把紧凑结果交给风险管理师评述
+        commentary = None
+        risk_manager = self.agents.get("risk_manager")
+        if risk_manager:
+            commentary = await risk_manager.review_portfolio(json.dumps(risk, ensure_ascii=False))
+        
+        return {
+            "portfolio_risk": risk,
+            "commentary": commentary,
+            "timing": {"fetch_seconds": round(fetch_elapsed, 2), "compute_seconds": round(compute_elapsed, 3)},
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    async def conduct_debate(self, stock_code: str, analysis_results: List[Dict[str, Any]],
+                             resume: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """进行团队辩论
+        
+        Args:
+            stock_code: 股票代码
+            analysis_results: 初始分析结果
+            resume: 检查点中的辩论进度，提供时从最后完成的一轮之后继续（辩论线程已由resume_run恢复）
+        """
+        logger.info(f"🗣️ 开始团队辩论: {stock_code}")
+        stage_start = time.perf_counter()
         
         debate_topic = f"关于股票 {stock_code} 的投资策略讨论"
         debate_rounds = []
         
-        # 初始观点（基于分析结果）
-        current_opinions = analysis_results.copy()
+        # 辩论记录：初始分析在前，各轮发言按发言顺序追加
+        transcript = [result for result in analysis_results if "error" not in result]
+        # 每个智能体的游标：已经看过的记录条数，之后只发送新增部分
+        cursors = {agent_key: 0 for agent_key in self.agents}
         
         round_num = 1
         debate_ended = False
         
+        if resume:
+            debate_rounds = list(self.debate_history)
+            transcript.extend(debate_rounds)
+            cursors.update(resume.get("cursors", {}))
+            round_num = resume.get("completed_round", 0) + 1
+            debate_ended = resume.get("ended", False)
+            logger.info(f"♻️ 从第 {round_num} 轮继续辩论")
+        else:
+            for agent_key, agent in self.agents.items():
+                own_analysis = next((result.get('analysis', '') for result in transcript
+                                     if result.get('agent_name') == agent.name), "")
+                agent.start_debate(debate_topic, own_analysis)
+        
         while not debate_ended:
-            print(f"\n🔄 第 {round_num} 轮辩论")
+            logger.info(f"🔄 第 {round_num} 轮辩论")
             
             round_responses = []
             agents_completed = set()
             agents_ended = set()
             
-            # 每个智能体基于其他智能体的观点进行回应
+            # 每个智能体只接收自上次发言以来其他智能体的新观点
             for agent_key, agent in self.agents.items():
                 try:
-                    # 获取其他智能体的观点
-                    other_opinions = [op for op in current_opinions 
+                    new_opinions = [op for op in transcript[cursors[agent_key]:]
                                     if op.get('agent_name') != agent.name]
+                    cursors[agent_key] = len(transcript)
                     
                     # 生成辩论回应
-                    response = await agent.debate_response(debate_topic, other_opinions)
+                    response = await agent.debate_response(debate_topic, new_opinions)
                     
                     # 检查停止标记
                     if self._check_agent_completion(response, agent_key):
@@ -166,27 +817,39 @@ class AgentTeamManager:
                         "agent_name": agent.name,
                         "role": agent.role,
                         "response": response,
+                        "budget_hit": agent.debate_budget_hit,
+                        # 本次发言收到的增量观点条数和估算token数
+                        "new_opinions": len(new_opinions),
+                        "delta_tokens": sum(estimate_tokens(op.get('response') or op.get('analysis', ''))
+                                            for op in new_opinions),
                         "timestamp": datetime.now().isoformat()
                     }
                     
                     round_responses.append(round_response)
-                    print(f"💬 {agent.name} 发表观点")
-                    
+                    transcript.append(round_response)
+                    DEBATE_POSTS.inc(agent=agent.name)
+                    logger.info(f"💬 {agent.name} 发表观点（新增观点 {len(new_opinions)} 条）")
+                
                 except Exception as e:
-                    print(f"❌ {agent.name} 辩论回应失败: {e}")
+                    logger.error(f"❌ {agent.name} 辩论回应失败: {e}")
             
-            # 更新当前观点为本轮回应
-            current_opinions = round_responses
             debate_rounds.extend(round_responses)
+            DEBATE_ROUNDS.inc()
             
             # 检查是否应该结束辩论
             if len(agents_completed) >= len(self.agents) * 0.8 or len(agents_ended) >= 1:
-                print(f"✅ 第 {round_num} 轮辩论结束条件满足，结束辩论")
+                logger.info(f"✅ 第 {round_num} 轮辩论结束条件满足，结束辩论")
                 debate_ended = True
             elif round_num >= 10:  # 安全限制，防止无限循环
-                print(f"⚠️ 达到最大轮次限制，强制结束辩论")
+                logger.warning(f"⚠️ 达到最大轮次限制，强制结束辩论")
                 debate_ended = True
             
+            # 每轮结束写入检查点
+            self.debate_history = debate_rounds
+            self.checkpoint("debate", debate_progress={
+                "completed_round": round_num, "cursors": cursors, "ended": debate_ended
+            })
+            
             round_num += 1
             
             # 轮次间隔
@@ -195,10 +858,225 @@ class AgentTeamManager:
         
         # 保存辩论历史
         self.debate_history = debate_rounds
+        STAGE_LATENCY.observe(time.perf_counter() - stage_start, stage="debate")
+        self.checkpoint("decision")
         
-        print(f"🏁 辩论结束，共进行 {round_num-1} 轮")
+        logger.info(f"🏁 辩论结束，共进行 {round_num-1} 轮")
         return debate_rounds
     
+    async def run_pipeline(self, stock_code: str, prefetch: Optional[bool] = None,
+                           resume: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """按依赖关系调度分析和辩论，替代"全部分析完成后再辩论"的阶段屏障
+        
+        每个智能体完成自己的分析后，只要已有quorum份同伴分析就开始第1轮辩论；
+        第r轮只需quorum个同伴完成第r-1轮，且只读取第r轮之前的记录（第1轮只看初始分析）。
+        迟到的分析和发言写入辩论记录，由其他智能体在下一次发言时增量收到，
+        迟到的智能体直接加入当前进行中的轮次。
+        
+        Args:
+            stock_code: 股票代码
+            prefetch: 是否先预取共用数据，为None时使用配置中的prefetch.enabled
+            resume: 检查点中的调度进度，提供时已完成的分析和发言不再重复
+        """
+        logger.info(f"📊 开始团队分析与辩论（依赖调度）: {stock_code}")
+        
+        if not self.agents:
+            return {"error": "团队未初始化"}
+        
+        scheduler_config = self.config.get("scheduler") or {}
+        max_rounds = scheduler_config.get("max_rounds", 10)
+        
+        if prefetch is None:
+            prefetch = (self.config.get("prefetch") or {}).get("enabled", False)
+        if resume is not None and "prefetch" in self.run_state:
+            bundle = self.run_state["prefetch"]
+        else:
+            bundle = await self.prefetch_data(stock_code) if prefetch else {"datasets": [], "elapsed_seconds": 0.0}
+        context = self._format_prefetch_context(bundle)
+        
+        debate_topic = f"关于股票 {stock_code} 的投资策略讨论"
+        agent_keys = list(self.agents.keys())
+        quorum = min(scheduler_config.get("quorum", len(agent_keys) - 1), len(agent_keys) - 1)
+        
+        start_time = time.perf_counter()
+        condition = asyncio.Condition()
+        transcript = []  # 分析结果和辩论发言，按到达顺序追加
+        analysis_results = {}
+        failed = set()
+        posts_by_round = {}  # 轮次 -> 已发言的智能体
+        last_round = {}  # 已退出辩论的智能体 -> 最后发言的轮次
+        state = {"stop_round": None, "first_debate_at": None, "analyses_done_at": None, "late_joins": 0}
+        progress = {}  # 智能体 -> 下一轮次、已读记录序号和是否已退出辩论，写入检查点
+        resumed_rounds = 0
+        
+        if resume:
+            names = {agent.name: agent_key for agent_key, agent in self.agents.items()}
+            transcript = resume.get("transcript", [])
+            for entry in transcript:
+                if "round" in entry:
+                    posts_by_round.setdefault(entry["round"], set()).add(entry["agent_key"])
+                elif entry.get("agent_name") in names:
+                    analysis_results[names[entry["agent_name"]]] = entry
+            progress = resume.get("agents", {})
+            resumed_rounds = max(posts_by_round, default=0)
+            state["stop_round"] = resume.get("stop_round")
+            state["late_joins"] = resume.get("late_joins", 0)
+            logger.info(f"♻️ 复用检查点中 {len(analysis_results)} 份分析和 {sum(len(v) for v in posts_by_round.values())} 条辩论发言")
+        
+        def save_progress():
+            """写入调度检查点（在持有condition锁时调用）"""
+            self.analysis_results = [analysis_results[key] for key in agent_keys if key in analysis_results]
+            self.debate_history = [entry for entry in transcript if "round" in entry]
+            self.checkpoint("pipeline", prefetch=bundle, pipeline={
+                "transcript": transcript,
+                "agents": progress,
+                "stop_round": state["stop_round"],
+                "late_joins": state["late_joins"]
+            })
+        
+        def peers_ready(agent_key: str, round_num: int) -> bool:
+            """第round_num轮的依赖是否满足：足够多的同伴完成了上一步"""
+            if round_num == 1:
+                done = {key for key in analysis_results if key not in failed}
+            else:
+                done = posts_by_round.get(round_num - 1, set())
+            # 仍可能完成上一步的同伴数量，用于在同伴失败或退出时降低门槛
+            live = [key for key in agent_keys if key != agent_key and key not in failed
+                    and last_round.get(key, max_rounds) >= round_num - 1]
+            return len(done - {agent_key}) >= min(quorum, len(live))
+        
+        def check_round_end(round_num: int):
+            """与conduct_debate相同的结束条件，按轮次在每次发言后检查"""
+            responses = [entry for entry in transcript if entry.get("round") == round_num]
+            completed = sum(1 for entry in responses if self._check_agent_completion(entry["response"], entry["agent_key"]))
+            ended = any(self._check_agent_debate_end(entry["response"], entry["agent_key"]) for entry in responses)
+            if (completed >= len(agent_keys) * 0.8 or ended) and state["stop_round"] is None:
+                state["stop_round"] = round_num
+                logger.info(f"✅ 第 {round_num} 轮辩论结束条件满足，结束辩论")
+        
+        async def run_agent(agent_key: str):
+            agent = self.agents[agent_key]
+            if agent_key not in analysis_results:
+                try:
+                    result = await agent.analyze(stock_code, context)
+                except Exception as e:
+                    result = {"agent_key": agent_key, "error": str(e)}
+                
+                async with condition:
+                    analysis_results[agent_key] = result
+                    if "error" in result:
+                        failed.add(agent_key)
+                        logger.error(f"❌ {agent_key} 分析失败: {result['error']}")
+                    else:
+                        transcript.append(result)
+                        logger.info(f"✅ {result.get('agent_name', agent_key)} 分析完成")
+                        save_progress()
+                    if len(analysis_results) == len(agent_keys):
+                        state["analyses_done_at"] = time.perf_counter() - start_time
+                    condition.notify_all()
+            
+            if agent_key in failed:
+                return
+            
+            if agent_key in progress:
+                # 从检查点继续：辩论线程已恢复，沿用保存的轮次和已读记录
+                round_num = progress[agent_key]["next_round"]
+                seen = set(progress[agent_key].get("seen", range(progress[agent_key].get("cursor", 0))))
+                if progress[agent_key].get("finished"):
+                    async with condition:
+                        last_round[agent_key] = round_num - 1
+                        condition.notify_all()
+                    return
+            else:
+                agent.start_debate(debate_topic, analysis_results[agent_key].get("analysis", ""))
+                seen = set()
+                # 迟到的智能体直接加入当前进行中的轮次
+                round_num = max(posts_by_round, default=1)
+                if round_num > 1:
+                    state["late_joins"] += 1
+                    logger.info(f"⏩ {agent.name} 分析完成较晚，从第 {round_num} 轮加入辩论")
+            
+            while round_num <= max_rounds:
+                async with condition:
+                    await condition.wait_for(
+                        lambda: (state["stop_round"] is not None and round_num > state["stop_round"])
+                        or peers_ready(agent_key, round_num)
+                    )
+                    if state["stop_round"] is not None and round_num > state["stop_round"]:
+                        break
+                    # 第r轮只读取前几轮的记录（分析视为第0轮），同一轮中先发言者的观点留到下一轮，
+                    # 与顺序辩论一样第1轮只基于各方的初始分析，不受到达先后的影响
+                    unseen = [index for index in range(len(transcript)) if index not in seen
+                              and transcript[index].get("round", 0) < round_num]
+                    seen.update(unseen)
+                    new_opinions = [transcript[index] for index in unseen
+                                    if transcript[index].get("agent_name") != agent.name]
+                    if state["first_debate_at"] is None:
+                        state["first_debate_at"] = time.perf_counter() - start_time
+                
+                response = await agent.debate_response(debate_topic, new_opinions)
+                
+                async with condition:
+                    transcript.append({
+                        "round": round_num,
+                        "agent_key": agent_key,
+                        "agent_name": agent.name,
+                        "role": agent.role,
+                        "response": response,
+                        "budget_hit": agent.debate_budget_hit,
+                        "new_opinions": len(new_opinions),
+                        "delta_tokens": sum(estimate_tokens(op.get('response') or op.get('analysis', ''))
+                                            for op in new_opinions),
+                        "timestamp": datetime.now().isoformat()
+                    })
+                    posts_by_round.setdefault(round_num, set()).add(agent_key)
+                    DEBATE_POSTS.inc(agent=agent.name)
+                    logger.info(f"💬 {agent.name} 第 {round_num} 轮发表观点（新增观点 {len(new_opinions)} 条）")
+                    check_round_end(round_num)
+                    progress[agent_key] = {"next_round": round_num + 1, "seen": sorted(seen)}
+                    save_progress()
+                    condition.notify_all()
+                
+                round_num += 1
+            
+            async with condition:
+                last_round[agent_key] = round_num - 1
+                progress[agent_key] = {"next_round": round_num, "seen": sorted(seen), "finished": True}
+                save_progress()
+                condition.notify_all()
+        
+        await asyncio.gather(*[run_agent(agent_key) for agent_key in agent_keys])
+        elapsed = time.perf_counter() - start_time
+        STAGE_LATENCY.observe(elapsed, stage="pipeline")
+        DEBATE_ROUNDS.inc(max(posts_by_round, default=0) - resumed_rounds)
+        
+        self.analysis_results = [analysis_results[agent_key] for agent_key in agent_keys]
+        self.analysis_stats = self._summarize_analysis(self.analysis_results, bundle)
+        debate_history = [{key: value for key, value in entry.items() if key != "agent_key"}
+                          for entry in transcript if "round" in entry]
+        self.debate_history = sorted(debate_history, key=lambda entry: entry["round"])
+        self.checkpoint("decision", pipeline=None)
+        
+        schedule = {
+            "quorum": quorum,
+            "rounds": max(posts_by_round, default=0),
+            "late_joins": state["late_joins"],
+            "first_debate_seconds": round(state["first_debate_at"] or 0.0, 2),
+            "all_analyses_seconds": round(state["analyses_done_at"] or 0.0, 2),
+            "elapsed_seconds": round(elapsed, 2)
+        }
+        logger.info(f"🏁 辩论结束，共进行 {schedule['rounds']} 轮；首个辩论发言于 {schedule['first_debate_seconds']} 秒开始，"
+                    f"全部分析于 {schedule['all_analyses_seconds']} 秒完成")
+        
+        return {
+            "stock_code": stock_code,
+            "analysis_results": self.analysis_results,
+            "analysis_stats": self.analysis_stats,
+            "debate_history": self.debate_history,
+            "schedule": schedule,
+            "timestamp": datetime.now().isoformat()
+        }
+    
     def _check_agent_completion(self, response: str, agent_key: str) -> bool:
         """检查智能体是否完成分析"""
         completion_markers = {
@@ -225,24 +1103,37 @@ class AgentTeamManager:
         marker = end_markers.get(agent_key, "[辩论结束]")
         return marker in response
     
-    async def make_final_decisions(self, stock_code: str) -> List[Dict[str, Any]]:
-        """做出最终投资决策"""
-        print(f"\n🎯 开始最终决策: {stock_code}")
+    async def make_final_decisions(self, stock_code: str, resume: bool = False) -> List[Dict[str, Any]]:
+        """做出最终投资决策
+        
+        Args:
+            stock_code: 股票代码
+            resume: 是否从检查点继续，已完成决策的智能体不再重复调用
+        """
+        logger.info(f"🎯 开始最终决策: {stock_code}")
+        stage_start = time.perf_counter()
         
         # 构建分析和辩论总结
         analysis_summary = self._create_analysis_summary()
         
+        decided = {decision.get("agent_name"): decision for decision in self.final_decisions
+                   if "error" not in decision} if resume else {}
         final_decisions = []
         
         # 每个智能体基于完整信息做出最终决策
         for agent_key, agent in self.agents.items():
+            if agent.name in decided:
+                final_decisions.append(decided[agent.name])
+                continue
             try:
                 decision = await agent.make_decision(analysis_summary)
                 final_decisions.append(decision)
-                print(f"✅ {agent.name} 决策完成")
-                
+                logger.info(f"✅ {agent.name} 决策完成")
+                self.final_decisions = final_decisions
+                self.checkpoint("decision")
+            
             except Exception as e:
-                print(f"❌ {agent.name} 决策失败: {e}")
+                logger.error(f"❌ {agent.name} 决策失败: {e}")
                 final_decisions.append({
                     "agent_name": agent.name,
                     "role": agent.role,
@@ -252,6 +1143,8 @@ class AgentTeamManager:
         
         # 保存最终决策
         self.final_decisions = final_decisions
+        STAGE_LATENCY.observe(time.perf_counter() - stage_start, stage="decision")
+        self.checkpoint("done")
         
         return final_decisions
     
@@ -278,12 +1171,33 @@ class AgentTeamManager:
     def get_team_status(self) -> Dict[str, Any]:
         """获取团队状态"""
         agent_statuses = {}
+        token_usage = {"llm_calls": 0, "input_tokens": 0, "output_tokens": 0, "cached_tokens": 0}
         for agent_key, agent in self.agents.items():
             agent_statuses[agent_key] = agent.get_status()
+            for key in token_usage:
+                token_usage[key] += agent.token_usage.get(key, 0)
+        
+        # 前缀缓存命中率：缓存命中的输入token占全部输入token的比例
+        input_tokens = token_usage["input_tokens"]
+        token_usage["cache_hit_rate"] = round(token_usage["cached_tokens"] / input_tokens, 4) if input_tokens else 0.0
+        
+        # 各智能体工具记忆避免的重复调用
+        memory_stats = {"executed_calls": 0, "redundant_calls_avoided": 0, "avoided_by_phase": {}}
+        for agent in self.agents.values():
+            stats = agent.memory.get_stats()
+            memory_stats["executed_calls"] += stats["executed_calls"]
+            memory_stats["redundant_calls_avoided"] += stats["redundant_calls_avoided"]
+            for phase, count in stats["avoided_by_phase"].items():
+                memory_stats["avoided_by_phase"][phase] = memory_stats["avoided_by_phase"].get(phase, 0) + count
         
         return {
             "team_size": len(self.agents),
             "agents": agent_statuses,
+            # MCP工具层调用统计与熔断状态
+            "tool_layer": self.tool_layer.get_status() if self.tool_layer else None,
+            "token_usage": token_usage,
+            "memory": memory_stats,
+            "budget_hits": sum(len(agent.budget_hits) for agent in self.agents.values()),
             "analysis_count": len(self.analysis_results),
             "debate_rounds": len(set(d.get('round', 0) for d in self.debate_history)),
             "decisions_count": len(self.final_decisions),
@@ -292,16 +1206,33 @@ class AgentTeamManager:
     
     async def close_team(self):
         """关闭团队，清理资源"""
-        print("🔄 正在关闭智能体团队...")
+        logger.info("🔄 正在关闭智能体团队...")
+        await self.flush_checkpoints()
         
         for agent_key, agent in self.agents.items():
             try:
                 await agent.close()
-                print(f"✅ {agent.name} 已关闭")
+                logger.info(f"✅ {agent.name} 已关闭")
+            except Exception as e:
+                logger.error(f"❌ 关闭 {agent.name} 失败: {e}")
+        
+        if self.tool_layer:
+            try:
+                await self.tool_layer.close()
+            except Exception as e:
+                logger.error(f"❌ 关闭MCP工具层失败: {e}")
+        
+        # 批处理任务结束时写出指标文件，供textfile收集器采集
+        textfile = (self.config.get("metrics") or {}).get("textfile")
+        if textfile:
+            try:
+                REGISTRY.write_textfile(textfile)
+                logger.info(f"📈 指标已写入: {textfile}")
             except Exception as e:
-                print(f"❌ 关闭 {agent.name} 失败: {e}")
+                logger.warning(f"⚠️ 写入指标文件失败: {e}")
         
-        print("👋 团队已关闭")
+        logger.info("👋 团队已关闭")
+        await flush_logs()
     
     def export_results(self, filename: str = None) -> str:
         """导出分析结果"""
@@ -310,7 +1241,9 @@ class AgentTeamManager:
             filename = f"analysis_results_{timestamp}.json"
         
         results = {
+            "stock_code": self.run_state.get("stock_code"),
             "analysis_results": self.analysis_results,
+            "analysis_stats": self.analysis_stats,
             "debate_history": self.debate_history,
             "final_decisions": self.final_decisions,
             "team_status": self.get_team_status(),
@@ -320,8 +1253,8 @@ class AgentTeamManager:
         try:
             with open(filename, 'w', encoding='utf-8') as f:
                 json.dump(results, f, ensure_ascii=False, indent=2)
-            print(f"📄 结果已导出到: {filename}")
+            logger.info(f"📄 结果已导出到: {filename}")
             return filename
         except Exception as e:
-            print(f"❌ 导出失败: {e}")
+            logger.error(f"❌ 导出失败: {e}")
             return ""
\ No newline at end of file
@@ -0,0 +1,215 @@
+# 自选股定时批量运行
+
+import asyncio
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Callable
+from ..data.market_data import to_ts_code
+from ..data.trading_calendar import TradingCalendar, CronSchedule
+from ..monitoring.metrics import WATCHLIST_RUNS
+from ..monitoring.logs import get_logger
+
+logger = get_logger("service")
+
+def team_tokens(team_manager: Any) -> int:
+    """团队累计的输入和输出token数"""
+    return sum(agent.token_usage.get("input_tokens", 0) + agent.token_usage.get("output_tokens", 0)
+               for agent in team_manager.agents.values())
+
+class WatchlistScheduler:
+    """按交易日历定时运行自选股列表
+    
+    每个并发槽位持有一个独立初始化的团队（智能体持有运行中的辩论状态，不能跨股票共享），
+    各槽位从同一队列领取股票并完整运行（分析、辩论、决策），结果写入结果库。
+    相邻两次运行的启动至少间隔 start_interval_seconds（加随机抖动），把模型请求分散开，
+    避免同时启动的多个团队触发服务商限流；累计token达到预算后剩余股票不再启动。
+    每批结束时生成报告，记录各股票的耗时和token用量以及完成时间相对截止时间的余量。
+    """
+    
+    def __init__(self, watchlist_config: Dict[str, Any], team_factory: Callable[[], Any], screener: Optional[Any] = None):
+        self.config = watchlist_config or {}
+        self.team_factory = team_factory
+        # 可选的量化初筛：每批运行前先筛选全市场，候选股票追加到自选股之后
+        self.screener = screener
+        self.calendar = TradingCalendar.from_config(self.config.get("calendar"))
+        self.schedule = CronSchedule(self.config.get("cron", "30 16 * * T"), self.calendar)
+        self.stocks = [str(code) for code in self.config.get("stocks", [])]
+        self.max_concurrency = max(1, self.config.get("max_concurrency", 1))
+        self.token_budget = self.config.get("token_budget") or 0
+        self.estimated_tokens_per_run = self.config.get("estimated_tokens_per_run", 150000)
+        self.start_interval = self.config.get("start_interval_seconds", 20)
+        self.jitter = self.config.get("jitter_seconds", 5)
+        self.incremental = self.config.get("incremental", True)
+        self.report_dir = self.config.get("report_dir", "reports")
+        self._next_start = 0.0
+        self._start_lock = None
+    
+    def deadline_for(self, scheduled_at: datetime) -> Optional[datetime]:
+        """本批的截止时刻，scheduled_at为cron触发时刻（手动运行时为开始时间）
+        
+        deadline（HH:MM）默认在触发当天，批次开始晚了也不顺延，报告中记为超时；
+        只有deadline早于cron每天首个触发时刻（如cron 22:00、deadline 02:00）时表示次日凌晨，
+        此时当天首个触发时刻之后开始的批次截止在次日。
+        """
+        deadline = self.config.get("deadline")
+        if not deadline:
+            return None
+        hour, minute = (int(part) for part in str(deadline).split(':'))
+        first_fire = (min(self.schedule.hours), min(self.schedule.minutes))
+        moment = scheduled_at.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if (hour, minute) < first_fire <= (scheduled_at.hour, scheduled_at.minute):
+            moment += timedelta(days=1)
+        return moment
+    
+    async def _wait_start_slot(self):
+        """错开各次运行的启动时间"""
+        async with self._start_lock:
+            delay = self._next_start - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_start = time.monotonic() + self.start_interval + random.uniform(0, self.jitter)
+    
+    async def run_once(self, stocks: Optional[List[str]] = None, scheduled_at: Optional[datetime] = None) -> Dict[str, Any]:
+        """立即运行一批自选股，返回批次报告；scheduled_at为定时运行的触发时刻，用于确定截止时间"""
+        stocks = [str(code) for code in stocks] if stocks else list(self.stocks)
+        if self.screener is not None:
+            screened = await asyncio.to_thread(self.screener.screen)
+            listed = {to_ts_code(code) for code in stocks}
+            stocks += [item["ts_code"] for item in screened["candidates"] if item["ts_code"] not in listed]
+        started_at = datetime.now()
+        deadline = self.deadline_for(scheduled_at or started_at)
+        self._start_lock = asyncio.Lock()
+        self._next_start = 0.0
+        logger.info(f"⏰ 自选股批量运行开始: {len(stocks)} 只股票，并发 {self.max_concurrency}"
+                    + (f"，截止 {deadline:%Y-%m-%d %H:%M}" if deadline else ""))
+        
+        queue = asyncio.Queue()
+        for stock_code in stocks:
+            queue.put_nowait(stock_code)
+        results = []
+        # 已完成运行的token用量和进行中运行的预留额度（按已完成运行的平均值预估）；
+        # 预算尚未使用时总会启动第一次运行
+        budget = {"used": 0, "reserved": 0, "completed": 0}
+        
+        def estimate() -> float:
+            return budget["used"] / budget["completed"] if budget["completed"] else self.estimated_tokens_per_run
+        
+        async def worker(slot: int):
+            team = None
+            try:
+                while not queue.empty():
+                    stock_code = queue.get_nowait()
+                    committed = budget["used"] + budget["reserved"]
+                    if self.token_budget and committed and committed + estimate() > self.token_budget:
+                        results.append({"stock_code": stock_code, "status": "skipped_budget"})
+                        WATCHLIST_RUNS.inc(status="skipped_budget")
+                        logger.warning(f"⚠️ token预算不足，跳过 {stock_code}"
+                                       f"（已用 {budget['used']}/{self.token_budget}）")
+                        continue
+                    
+                    if team is None:
+                        try:
+                            team = self.team_factory()
+                            await team.initialize_team()
+                        except Exception as e:
+                            # 初始化失败的槽位退出，股票放回队列由其他槽位运行
+                            logger.error(f"❌ [槽位{slot}] 团队初始化失败: {e}")
+                            queue.put_nowait(stock_code)
+                            return
+                    
+                    reserved = estimate()
+                    budget["reserved"] += reserved
+                    try:
+                        await self._wait_start_slot()
+                        results.append(await self._run_stock(team, stock_code, slot, budget))
+                    finally:
+                        budget["reserved"] -= reserved
+            finally:
+                if team is not None:
+                    await team.close_team()
+        
+        await asyncio.gather(*[worker(slot) for slot in range(min(self.max_concurrency, len(stocks)) or 1)])
+        while not queue.empty():
+            results.append({"stock_code": queue.get_nowait(), "status": "error", "error": "没有可用的团队"})
+        
+        order = {stock_code: index for index, stock_code in enumerate(stocks)}
+        results.sort(key=lambda item: order.get(item["stock_code"], len(order)))
+        report = self._build_report(started_at, datetime.now(), deadline, results, budget["used"])
+        self._save_report(report)
+        return report
+    
+    async def _run_stock(self, team: Any, stock_code: str, slot: int, budget: Dict[str, Any]) -> Dict[str, Any]:
+        tokens_before = team_tokens(team)
+        start = time.perf_counter()
+        logger.info(f"▶️ [槽位{slot}] 开始运行 {stock_code}")
+        entry = {"stock_code": stock_code, "slot": slot, "started_at": datetime.now().isoformat()}
+        try:
+            result = await team.run_stock(stock_code, incremental=self.incremental)
+            entry.update({"status": "ok", "run_id": result.get("run_id"),
+                          "decisions": len(result.get("final_decisions") or [])})
+            logger.info(f"✅ [槽位{slot}] {stock_code} 完成，耗时 {time.perf_counter() - start:.1f}s")
+        except Exception as e:
+            entry.update({"status": "error", "error": str(e)})
+            logger.error(f"❌ [槽位{slot}] {stock_code} 运行失败: {e}")
+        entry["seconds"] = round(time.perf_counter() - start, 2)
+        entry["tokens"] = team_tokens(team) - tokens_before
+        budget["used"] += entry["tokens"]
+        budget["completed"] += 1
+        WATCHLIST_RUNS.inc(status=entry["status"])
+        return entry
+    
+    def _build_report(self, started_at: datetime, finished_at: datetime, deadline: Optional[datetime],
+                      results: List[Dict[str, Any]], tokens_used: int) -> Dict[str, Any]:
+        counts = {}
+        for item in results:
+            counts[item["status"]] = counts.get(item["status"], 0) + 1
+        report = {
+            "started_at": started_at.isoformat(),
+            "finished_at": finished_at.isoformat(),
+            "elapsed_seconds": round((finished_at - started_at).total_seconds(), 2),
+            "deadline": deadline.isoformat() if deadline else None,
+            "met_deadline": finished_at <= deadline if deadline else None,
+            # 正数为提前完成的秒数，负数为超时的秒数
+            "slack_seconds": round((deadline - finished_at).total_seconds(), 2) if deadline else None,
+            "counts": counts,
+            "tokens_used": tokens_used,
+            "token_budget": self.token_budget or None,
+            "max_concurrency": self.max_concurrency,
+            "results": results
+        }
+        
+        summary = f"📋 批量运行结束: 耗时 {report['elapsed_seconds']:.0f}s，{counts}，共 {tokens_used} token"
+        if deadline is None:
+            logger.info(summary)
+        elif report["met_deadline"]:
+            logger.info(f"{summary}，距截止还有 {report['slack_seconds'] / 60:.1f} 分钟")
+        else:
+            logger.warning(f"{summary}，超过截止时间 {-report['slack_seconds'] / 60:.1f} 分钟")
+        return report
+    
+    def _save_report(self, report: Dict[str, Any]):
+        if not self.report_dir:
+            return
+        os.makedirs(self.report_dir, exist_ok=True)
+        path = os.path.join(self.report_dir, f"watchlist_{datetime.fromisoformat(report['started_at']):%Y%m%d_%H%M%S}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        report["report_file"] = path
+        logger.info(f"📝 批次报告已写入: {path}")
+    
+    async def serve(self, max_batches: Optional[int] = None):
+        """按cron表达式循环等待并运行，max_batches为None时一直运行"""
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            next_run = self.schedule.next_after(datetime.now())
+            logger.info(f"⏳ 下一次自选股运行: {next_run:%Y-%m-%d %H:%M}（{self.schedule.expression}）")
+            # 分段等待，系统休眠或时钟调整后能及时校正
+            remaining = (next_run - datetime.now()).total_seconds()
+            while remaining > 0:
+                await asyncio.sleep(min(remaining, 60))
+                remaining = (next_run - datetime.now()).total_seconds()
+            await self.run_once(scheduled_at=next_run)
+            batches += 1
@@ -0,0 +1 @@
+# 市场数据模块
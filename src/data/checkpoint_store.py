@@ -0,0 +1,51 @@
+# 运行检查点
+
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Any
+
+class CheckpointStore:
+    """运行检查点：流水线每完成一个阶段或一轮辩论就覆盖写入一次，进程中断后可从最后完成的步骤继续"""
+    
+    def __init__(self, root: str = "checkpoints"):
+        # 目录在第一次写入检查点时创建
+        self.root = root
+    
+    def _path(self, run_id: str) -> str:
+        return os.path.join(self.root, f"{run_id}.json")
+    
+    def save(self, run_id: str, state: Dict[str, Any]):
+        """原子写入检查点，写入过程中断不会破坏上一次的检查点"""
+        state = {**state, "run_id": run_id, "updated_at": datetime.now().isoformat()}
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self._path(run_id) + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path(run_id))
+    
+    def load(self, run_id: str) -> Dict[str, Any]:
+        """加载检查点"""
+        path = self._path(run_id)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"检查点 {run_id} 不存在")
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def list_runs(self) -> List[Dict[str, Any]]:
+        """列出所有检查点的运行ID、股票和所处阶段"""
+        runs = []
+        if not os.path.isdir(self.root):
+            return runs
+        for name in sorted(os.listdir(self.root)):
+            if not name.endswith('.json'):
+                continue
+            try:
+                state = self.load(name[:-5])
+            except (OSError, ValueError):
+                continue
+            runs.append({"run_id": state["run_id"], "stock_code": state.get("stock_code"),
+                         "stage": state.get("stage"), "updated_at": state.get("updated_at")})
+        return runs
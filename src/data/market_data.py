@@ -0,0 +1,157 @@
+# 市场数据工具函数
+
+import json
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional
+import numpy as np
+
+def to_ts_code(stock_code: str) -> str:
+    """将6位A股代码转换为带交易所后缀的ts_code（如 000001 -> 000001.SZ）"""
+    code = stock_code.strip().upper()
+    if '.' in code:
+        return code
+    if code.startswith(('6', '9', '5')):
+        return f"{code}.SH"
+    if code.startswith(('4', '8')):
+        return f"{code}.BJ"
+    return f"{code}.SZ"
+
+def render_args(template: Any, stock_code: str, lookback_days: int = 120,
+                end_date: Optional[datetime] = None) -> Any:
+    """渲染工具参数模板
+    
+    支持的占位符: {stock_code}, {ts_code}, {start_date}, {end_date}（日期格式YYYYMMDD）
+    """
+    end = end_date or datetime.now()
+    values = {
+        "stock_code": stock_code,
+        "ts_code": to_ts_code(stock_code),
+        "start_date": (end - timedelta(days=lookback_days)).strftime('%Y%m%d'),
+        "end_date": end.strftime('%Y%m%d')
+    }
+    
+    if isinstance(template, dict):
+        return {key: render_args(value, stock_code, lookback_days, end) for key, value in template.items()}
+    if isinstance(template, list):
+        return [render_args(value, stock_code, lookback_days, end) for value in template]
+    if isinstance(template, str):
+        for key, value in values.items():
+            template = template.replace("{" + key + "}", value)
+    return template
+
+# 常见行情字段的别名（兼容tushare风格英文字段与中文字段）
+FIELD_ALIASES = {
+    "date": ["trade_date", "date", "cal_date", "日期", "交易日期"],
+    "open": ["open", "开盘", "开盘价"],
+    "high": ["high", "最高", "最高价"],
+    "low": ["low", "最低", "最低价"],
+    "close": ["close", "收盘", "收盘价"],
+    "volume": ["vol", "volume", "成交量"],
+    "amount": ["amount", "成交额"]
+}
+
+def _to_number(value: Any) -> Any:
+    """尽量将字符串转换为数值"""
+    if isinstance(value, str):
+        text = value.strip().replace(',', '')
+        try:
+            return float(text)
+        except ValueError:
+            return value
+    return value
+
+def _parse_markdown_table(text: str, coerce_numbers: bool = True) -> List[Dict[str, Any]]:
+    """解析Markdown表格，coerce_numbers为False时单元格保留原始字符串"""
+    rows = [line.strip() for line in text.splitlines() if line.strip().startswith('|')]
+    if len(rows) < 2:
+        return []
+    
+    header = [cell.strip() for cell in rows[0].strip('|').split('|')]
+    records = []
+    for row in rows[1:]:
+        cells = [cell.strip() for cell in row.strip('|').split('|')]
+        # 跳过分隔行 |---|---|
+        if all(set(cell) <= set('-: ') for cell in cells):
+            continue
+        if len(cells) == len(header):
+            records.append({key: _to_number(value) if coerce_numbers else value for key, value in zip(header, cells)})
+    return records
+
+def _records_from_json(data: Any) -> List[Dict[str, Any]]:
+    """从常见的JSON结构中提取记录列表"""
+    if isinstance(data, list):
+        return [item for item in data if isinstance(item, dict)]
+    if isinstance(data, dict):
+        # tushare风格: {"fields": [...], "items": [[...], ...]}
+        if isinstance(data.get("fields"), list) and isinstance(data.get("items"), list):
+            return [dict(zip(data["fields"], item)) for item in data["items"]]
+        for key in ("data", "items", "records", "result", "rows"):
+            if key in data:
+                records = _records_from_json(data[key])
+                if records:
+                    return records
+        # 列式结构: {"close": [...], "open": [...]}
+        columns = {key: value for key, value in data.items() if isinstance(value, list)}
+        lengths = {len(value) for value in columns.values()}
+        if columns and len(lengths) == 1:
+            length = lengths.pop()
+            return [{key: value[i] for key, value in columns.items()} for i in range(length)]
+    return []
+
+def parse_records(payload: Any, coerce_numbers: bool = True) -> List[Dict[str, Any]]:
+    """将MCP工具返回的表格数据（JSON或Markdown表格）解析为记录列表
+    
+    JSON中的值保持原类型；Markdown表格的单元格默认尽量转换为数值，coerce_numbers为False时保留字符串。
+    """
+    if isinstance(payload, (list, dict)):
+        return _records_from_json(payload)
+    
+    text = str(payload).strip()
+    try:
+        return _records_from_json(json.loads(text))
+    except (ValueError, TypeError):
+        pass
+    return _parse_markdown_table(text, coerce_numbers)
+
+def _find_field(record: Dict[str, Any], field: str) -> Optional[str]:
+    """在记录中查找标准字段对应的实际字段名"""
+    lowered = {str(key).lower(): key for key in record}
+    for alias in FIELD_ALIASES[field]:
+        if alias in lowered:
+            return lowered[alias]
+    return None
+
+def records_to_ohlcv(records: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """将行情记录转换为按日期升序排列的OHLCV数组
+    
+    Returns:
+        包含 date(int, YYYYMMDD)、open、high、low、close、volume、amount 的数组字典，缺失字段为NaN
+    """
+    if not records:
+        return {}
+    
+    sample = records[0]
+    date_key = _find_field(sample, "date")
+    close_key = _find_field(sample, "close")
+    if date_key is None or close_key is None:
+        return {}
+    
+    dates = np.array([int(str(record[date_key]).replace('-', '').split('.')[0][:8]) for record in records],
+                     dtype=np.int64)
+    order = np.argsort(dates, kind='stable')
+    
+    arrays = {"date": dates[order]}
+    for field in ("open", "high", "low", "close", "volume", "amount"):
+        key = _find_field(sample, field)
+        if key is None:
+            arrays[field] = np.full(len(records), np.nan)
+            continue
+        values = np.array([_to_number(record.get(key)) for record in records], dtype=object)
+        arrays[field] = np.array(
+            [value if isinstance(value, (int, float)) else np.nan for value in values], dtype=np.float64
+        )[order]
+    
+    # 去除重复日期（保留最后一条）
+    _, last_index = np.unique(arrays["date"][::-1], return_index=True)
+    keep = np.sort(len(arrays["date"]) - 1 - last_index)
+    return {field: values[keep] for field, values in arrays.items()}
@@ -0,0 +1,321 @@
+# 本地列式行情库
+
+import json
+import os
+import zlib
+from collections import OrderedDict
+from datetime import datetime, time
+from typing import Dict, List, Any, Optional, Callable, Awaitable, Tuple
+import numpy as np
+from .trading_calendar import TradingCalendar
+
+# 列名 -> 存储类型（小端定长，每列一个文件）
+COLUMNS = {
+    "date": np.dtype("<i4"),
+    "open": np.dtype("<f8"),
+    "high": np.dtype("<f8"),
+    "low": np.dtype("<f8"),
+    "close": np.dtype("<f8"),
+    "volume": np.dtype("<f8"),
+    "amount": np.dtype("<f8")
+}
+
+class PriceStore:
+    """本地列式行情库
+    
+    每个ts_code一个目录，每列一个定长二进制文件，通过内存映射零拷贝读取；
+    新交易日只追加缺失的K线，不重写历史。meta.json 记录已提交的行数和各列的CRC32校验值，
+    追加中途中断时未提交的尾部数据会被忽略，并可通过 repair/compact 修复。
+    内存映射按最近使用保留 max_open_codes 只股票，全市场遍历时不会耗尽文件句柄。
+    """
+    
+    def __init__(self, root: str = "data/prices", calendar: Optional[TradingCalendar] = None,
+                 close_time: str = "15:30", max_open_codes: int = 256):
+        self.root = root
+        self.calendar = calendar or TradingCalendar()
+        # 日K线在该时刻之后才视为当天已收盘、可以同步
+        hour, minute = (int(part) for part in close_time.split(':'))
+        self.close_time = time(hour, minute)
+        self.max_open_codes = max(1, max_open_codes)
+        self._maps = OrderedDict()  # ts_code -> (行数, 各列memmap)，按最近使用排序
+        os.makedirs(root, exist_ok=True)
+    
+    def _dir(self, ts_code: str) -> str:
+        return os.path.join(self.root, ts_code.upper())
+    
+    def _column_path(self, ts_code: str, column: str) -> str:
+        return os.path.join(self._dir(ts_code), f"{column}.bin")
+    
+    def _load_meta(self, ts_code: str) -> Dict[str, Any]:
+        path = os.path.join(self._dir(ts_code), "meta.json")
+        if not os.path.exists(path):
+            return {"count": 0, "last_date": None, "crc": {column: 0 for column in COLUMNS}, "synced_at": None}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def _save_meta(self, ts_code: str, meta: Dict[str, Any]):
+        """原子写入meta（先写临时文件再替换）"""
+        path = os.path.join(self._dir(ts_code), "meta.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self._maps.pop(ts_code.upper(), None)
+    
+    def codes(self) -> List[str]:
+        """库中已有的全部ts_code"""
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.exists(os.path.join(self.root, name, "meta.json"))
+        )
+    
+    def last_date(self, ts_code: str) -> Optional[int]:
+        """最后一根K线的日期（YYYYMMDD）"""
+        return self._load_meta(ts_code).get("last_date")
+    
+    def _columns(self, ts_code: str) -> Dict[str, np.ndarray]:
+        """获取各列的只读内存映射（按已提交行数截取）"""
+        key = ts_code.upper()
+        count = self._load_meta(ts_code)["count"]
+        cached = self._maps.get(key)
+        if cached and cached[0] == count:
+            self._maps.move_to_end(key)
+            return cached[1]
+        
+        if count == 0:
+            columns = {column: np.empty(0, dtype=dtype) for column, dtype in COLUMNS.items()}
+        else:
+            columns = {
+                column: np.memmap(self._column_path(ts_code, column), dtype=dtype, mode='r', shape=(count,))
+                for column, dtype in COLUMNS.items()
+            }
+        self._maps[key] = (count, columns)
+        self._maps.move_to_end(key)
+        while len(self._maps) > self.max_open_codes:
+            self._maps.popitem(last=False)
+        return columns
+    
+    def read(self, ts_code: str, start_date: Optional[int] = None, end_date: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """按日期区间读取K线，返回内存映射上的零拷贝切片"""
+        columns = self._columns(ts_code)
+        dates = columns["date"]
+        start = 0 if start_date is None else int(np.searchsorted(dates, start_date, side='left'))
+        end = len(dates) if end_date is None else int(np.searchsorted(dates, end_date, side='right'))
+        return {column: values[start:end] for column, values in columns.items()}
+    
+    def tail(self, ts_code: str, count: int, columns: Tuple[str, ...] = ("close",)) -> Dict[str, np.ndarray]:
+        """读取最近count根K线的指定列（只打开需要的列文件，不建立内存映射），并附带last_date
+        
+        用于全市场批量扫描：逐只读取时比 read() 少打开大部分列文件。
+        """
+        meta = self._load_meta(ts_code)
+        rows = min(count, meta["count"])
+        start = meta["count"] - rows
+        bars = {"last_date": meta.get("last_date")}
+        for column in columns:
+            dtype = COLUMNS[column]
+            bars[column] = np.fromfile(self._column_path(ts_code, column), dtype=dtype, count=rows,
+                                       offset=start * dtype.itemsize) if rows else np.empty(0, dtype=dtype)
+        return bars
+    
+    def append(self, ts_code: str, bars: Dict[str, np.ndarray]) -> int:
+        """追加新K线，只写入晚于已有最后日期的部分
+        
+        Returns:
+            实际追加的K线数量
+        """
+        meta = self._load_meta(ts_code)
+        dates = np.asarray(bars["date"], dtype=np.int64)
+        order = np.argsort(dates, kind='stable')
+        dates = dates[order]
+        
+        mask = dates > (meta["last_date"] or 0)
+        # 同一批数据中的重复日期只保留最后一条
+        mask[:-1] &= dates[:-1] != dates[1:]
+        if not mask.any():
+            return 0
+        
+        os.makedirs(self._dir(ts_code), exist_ok=True)
+        self._repair_tail(ts_code, meta)
+        
+        crc = dict(meta["crc"])
+        for column, dtype in COLUMNS.items():
+            source = bars.get(column)
+            if source is None:
+                values = np.full(len(dates), np.nan)
+            else:
+                values = np.asarray(source)[order]
+            data = np.ascontiguousarray(values[mask], dtype=dtype).tobytes()
+            with open(self._column_path(ts_code, column), 'ab') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            crc[column] = zlib.crc32(data, crc[column])
+        
+        added = int(mask.sum())
+        meta.update({"count": meta["count"] + added, "last_date": int(dates[mask][-1]), "crc": crc})
+        self._save_meta(ts_code, meta)
+        return added
+    
+    def _repair_tail(self, ts_code: str, meta: Dict[str, Any]):
+        """截掉上次追加中断后遗留的未提交数据"""
+        for column, dtype in COLUMNS.items():
+            path = self._column_path(ts_code, column)
+            committed = meta["count"] * dtype.itemsize
+            if os.path.exists(path) and os.path.getsize(path) > committed:
+                with open(path, 'r+b') as f:
+                    f.truncate(committed)
+    
+    def verify(self, ts_code: str) -> Dict[str, Any]:
+        """完整性检查：文件长度、CRC校验以及日期严格递增"""
+        meta = self._load_meta(ts_code)
+        problems = []
+        
+        for column, dtype in COLUMNS.items():
+            path = self._column_path(ts_code, column)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            committed = meta["count"] * dtype.itemsize
+            if size < committed:
+                problems.append(f"{column} 列数据缺失: {size} < {committed} 字节")
+                continue
+            if size > committed:
+                problems.append(f"{column} 列存在 {size - committed} 字节未提交数据")
+            data = b""
+            if committed:
+                with open(path, 'rb') as f:
+                    data = f.read(committed)
+            if zlib.crc32(data) != meta["crc"].get(column, 0):
+                problems.append(f"{column} 列CRC校验失败")
+        
+        if not problems and meta["count"]:
+            dates = self._columns(ts_code)["date"]
+            if np.any(np.diff(dates) <= 0):
+                problems.append("日期未严格递增")
+            if int(dates[-1]) != meta["last_date"]:
+                problems.append("last_date 与数据不一致")
+        
+        return {"ts_code": ts_code, "bars": meta["count"], "ok": not problems, "problems": problems}
+    
+    def compact(self, ts_code: str) -> Dict[str, Any]:
+        """压实：按日期排序去重、剔除无收盘价的K线，并原子重写全部列和meta"""
+        meta = self._load_meta(ts_code)
+        
+        # 以各列实际可用的最短长度为准，容忍中断造成的列长度不一致
+        lengths = []
+        for column, dtype in COLUMNS.items():
+            path = self._column_path(ts_code, column)
+            lengths.append(os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0)
+        count = min(lengths)
+        
+        columns = {}
+        for column, dtype in COLUMNS.items():
+            if count:
+                columns[column] = np.fromfile(self._column_path(ts_code, column), dtype=dtype, count=count)
+            else:
+                columns[column] = np.empty(0, dtype=dtype)
+        
+        dates = columns["date"]
+        order = np.argsort(dates, kind='stable')
+        sorted_dates = dates[order]
+        keep = np.ones(len(order), dtype=bool)
+        keep[:-1] = sorted_dates[:-1] != sorted_dates[1:]
+        keep &= ~np.isnan(columns["close"][order]) & (sorted_dates > 0)
+        index = order[keep]
+        
+        crc = {}
+        for column, dtype in COLUMNS.items():
+            data = np.ascontiguousarray(columns[column][index]).tobytes()
+            path = self._column_path(ts_code, column)
+            with open(path + ".tmp", 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            crc[column] = zlib.crc32(data)
+        
+        # 释放旧的内存映射后再替换文件
+        self._maps.pop(ts_code.upper(), None)
+        for column in COLUMNS:
+            path = self._column_path(ts_code, column)
+            os.replace(path + ".tmp", path)
+        
+        new_meta = dict(meta)
+        new_meta.update({
+            "count": int(len(index)),
+            "last_date": int(dates[index][-1]) if len(index) else None,
+            "crc": crc
+        })
+        self._save_meta(ts_code, new_meta)
+        return {"ts_code": ts_code, "before": count, "after": int(len(index))}
+    
+    def expected_last_date(self, now: Optional[datetime] = None) -> int:
+        """此刻应已收盘的最近一个交易日（YYYYMMDD）：交易日收盘前为上一个交易日"""
+        now = now or datetime.now()
+        if self.calendar.is_trading_day(now) and now.time() >= self.close_time:
+            day = now.date()
+        else:
+            day = self.calendar.previous_trading_day(now)
+        return int(day.strftime('%Y%m%d'))
+    
+    async def sync(self, ts_code: str,
+                   fetch: Callable[[str, int], Awaitable[Dict[str, np.ndarray]]],
+                   initial_lookback_days: int = 730) -> int:
+        """增量同步：只请求上次之后缺失的交易日
+        
+        已有最近一个已收盘交易日的K线时不再请求；在该交易日收盘后已同步过但仍没有新K线
+        （停牌等）时也不再请求。盘中同步不会阻止收盘后再同步当天的K线。
+        
+        Args:
+            ts_code: 股票代码
+            fetch: 异步获取函数 fetch(ts_code, lookback_days) -> OHLCV数组字典
+            initial_lookback_days: 首次同步回溯的自然日天数
+        
+        Returns:
+            新追加的K线数量
+        """
+        meta = self._load_meta(ts_code)
+        now = datetime.now()
+        expected = self.expected_last_date(now)
+        last_date = meta.get("last_date")
+        if last_date and last_date >= expected:
+            return 0
+        synced_at = meta.get("synced_at")
+        closed_at = datetime.combine(datetime.strptime(str(expected), '%Y%m%d').date(), self.close_time)
+        if synced_at and datetime.fromisoformat(synced_at) >= closed_at:
+            return 0
+        
+        if last_date:
+            gap = (now - datetime.strptime(str(last_date), '%Y%m%d')).days
+            lookback_days = max(gap + 1, 1)
+        else:
+            lookback_days = initial_lookback_days
+        
+        bars = await fetch(ts_code, lookback_days)
+        added = self.append(ts_code, bars) if bars else 0
+        
+        os.makedirs(self._dir(ts_code), exist_ok=True)
+        meta = self._load_meta(ts_code)
+        meta["synced_at"] = now.isoformat(timespec='seconds')
+        self._save_meta(ts_code, meta)
+        return added
+
+if __name__ == "__main__":
+    # 维护入口: python -m src.data.price_store verify|compact [--root data/prices] [ts_code ...]
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="本地行情库维护")
+    parser.add_argument("action", choices=["verify", "compact"])
+    parser.add_argument("codes", nargs="*", help="要处理的ts_code，默认全部")
+    parser.add_argument("--root", default="data/prices", help="行情库目录 (默认: data/prices)")
+    args = parser.parse_args()
+    
+    store = PriceStore(args.root)
+    for code in args.codes or store.codes():
+        if args.action == "verify":
+            report = store.verify(code)
+            status = "✅" if report["ok"] else "❌"
+            print(f"{status} {code}: {report['bars']} 根K线 {'; '.join(report['problems'])}")
+        else:
+            report = store.compact(code)
+            print(f"🗜️ {code}: {report['before']} -> {report['after']} 根K线")
@@ -0,0 +1,64 @@
+# 分析结果库
+
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+from .market_data import to_ts_code
+
+class ResultStore:
+    """分析结果库：按股票保存每次运行的完整结果，供增量分析、离线回放和定时任务复用"""
+    
+    def __init__(self, root: str = "results"):
+        # 目录在第一次保存时创建，只读取结果的进程不会在工作目录下留下空目录
+        self.root = root
+    
+    def new_run_id(self, stock_code: str) -> str:
+        """生成运行ID，形如 000001.SZ_20250724_170321"""
+        return f"{to_ts_code(stock_code)}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    
+    def _path(self, run_id: str) -> str:
+        ts_code = run_id.rsplit('_', 2)[0]
+        return os.path.join(self.root, ts_code, f"{run_id}.json")
+    
+    def save(self, run: Dict[str, Any], run_id: Optional[str] = None) -> str:
+        """保存一次运行结果（原子写入），返回运行ID"""
+        run_id = run_id or run.get("run_id") or self.new_run_id(run["stock_code"])
+        run["run_id"] = run_id
+        path = self._path(run_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(run, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        return run_id
+    
+    def load(self, run_id: str) -> Dict[str, Any]:
+        """按运行ID加载结果"""
+        path = self._path(run_id)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"运行记录 {run_id} 不存在")
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def list_runs(self, stock_code: Optional[str] = None) -> List[str]:
+        """列出运行ID（按时间升序）"""
+        if stock_code:
+            directories = [to_ts_code(stock_code)]
+        elif os.path.isdir(self.root):
+            directories = sorted(os.listdir(self.root))
+        else:
+            directories = []
+        
+        run_ids = []
+        for directory in directories:
+            path = os.path.join(self.root, directory)
+            if os.path.isdir(path):
+                run_ids.extend(name[:-5] for name in os.listdir(path) if name.endswith('.json'))
+        return sorted(run_ids, key=lambda run_id: run_id.rsplit('_', 2)[1:])
+    
+    def latest(self, stock_code: str) -> Optional[Dict[str, Any]]:
+        """某只股票最近一次运行的结果"""
+        run_ids = self.list_runs(stock_code)
+        return self.load(run_ids[-1]) if run_ids else None
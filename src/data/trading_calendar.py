@@ -0,0 +1,155 @@
+# 交易日历与定时表达式
+
+import os
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Any, Optional, Iterable, Set
+from ..monitoring.logs import get_logger
+
+logger = get_logger("service")
+
+# 随代码发布的沪深交易所休市日，每年公布次年安排后更新
+DEFAULT_HOLIDAYS_FILE = os.path.join(os.path.dirname(__file__), "holidays_cn.txt")
+
+class TradingCalendar:
+    """A股交易日历：周末和休市日不交易（调休的周末同样休市，无需额外配置）
+    
+    默认加载随代码发布的休市日文件，holidays和holidays_file中的日期在其基础上追加。
+    休市日文件没有收录的年份只能按周末判断，首次查询该年份时给出警告。
+    """
+    
+    def __init__(self, holidays: Optional[Iterable[Any]] = None, holidays_file: Optional[str] = None,
+                 builtin: bool = True):
+        self.holidays = {self._parse(day) for day in holidays or []}
+        for path in ([DEFAULT_HOLIDAYS_FILE] if builtin else []) + ([holidays_file] if holidays_file else []):
+            if not os.path.exists(path):
+                logger.warning(f"⚠️ 休市日文件不存在: {path}")
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                self.holidays.update(self._parse(line) for line in f if line.strip() and not line.startswith('#'))
+        self.covered_years = {day.year for day in self.holidays}
+        self._warned_years = set()
+    
+    @classmethod
+    def from_config(cls, calendar_config: Optional[Dict[str, Any]] = None) -> "TradingCalendar":
+        calendar_config = calendar_config or {}
+        return cls(calendar_config.get("holidays"), calendar_config.get("holidays_file"),
+                   calendar_config.get("builtin_holidays", True))
+    
+    @staticmethod
+    def _parse(day: Any) -> date:
+        """解析 YYYYMMDD 或 YYYY-MM-DD 格式的日期"""
+        if isinstance(day, datetime):
+            return day.date()
+        if isinstance(day, date):
+            return day
+        return datetime.strptime(str(day).strip().replace('-', '')[:8], '%Y%m%d').date()
+    
+    def is_trading_day(self, day: Any) -> bool:
+        day = self._parse(day)
+        if day.year not in self.covered_years and day.year not in self._warned_years:
+            self._warned_years.add(day.year)
+            logger.warning(f"⚠️ 交易日历未收录 {day.year} 年的休市日，该年份只按周末判断")
+        return day.weekday() < 5 and day not in self.holidays
+    
+    def next_trading_day(self, day: Any, include_self: bool = False) -> date:
+        """下一个交易日（include_self为True时当天是交易日则返回当天）"""
+        day = self._parse(day)
+        if not include_self:
+            day += timedelta(days=1)
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+        return day
+    
+    def previous_trading_day(self, day: Any, include_self: bool = False) -> date:
+        day = self._parse(day)
+        if not include_self:
+            day -= timedelta(days=1)
+        while not self.is_trading_day(day):
+            day -= timedelta(days=1)
+        return day
+
+# 常用的收盘后时点
+CRON_ALIASES = {
+    "@after_close": "30 15 * * T",
+    "@evening": "0 18 * * T",
+    "@daily": "0 0 * * *"
+}
+
+DAY_NAMES = {"sun": 0, "mon": 1, "tue": 2, "wed": 3, "thu": 4, "fri": 5, "sat": 6}
+
+class CronSchedule:
+    """识别交易日的cron表达式：分 时 日 月 周
+    
+    各字段支持 *、数字、范围(a-b)、步长(*/n, a-b/n)和逗号列表，周字段支持mon-sun（0和7都表示周日）。
+    周字段写 T 表示只在交易日触发，如 "30 16 * * T" 为每个交易日16:30；
+    日和周字段都有限制时按标准cron取并集。也可使用 CRON_ALIASES 中的别名。
+    """
+    
+    def __init__(self, expression: str, calendar: Optional[TradingCalendar] = None):
+        self.expression = CRON_ALIASES.get(expression.strip(), expression.strip())
+        self.calendar = calendar or TradingCalendar()
+        fields = self.expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron表达式应包含5个字段（分 时 日 月 周）: {expression}")
+        
+        minute, hour, day, month, weekday = fields
+        self.minutes = self._parse_field(minute, 0, 59)
+        self.hours = self._parse_field(hour, 0, 23)
+        self.days = self._parse_field(day, 1, 31)
+        self.months = self._parse_field(month, 1, 12)
+        self.trading_only = weekday.upper() == "T"
+        self.weekdays = self._parse_field("*" if self.trading_only else weekday.lower(), 0, 7, DAY_NAMES)
+        if 7 in self.weekdays:
+            self.weekdays = (self.weekdays - {7}) | {0}
+        self.day_restricted = day != "*"
+        self.weekday_restricted = weekday != "*" and not self.trading_only
+    
+    @staticmethod
+    def _parse_field(field: str, low: int, high: int, names: Optional[Dict[str, int]] = None) -> Set[int]:
+        values = set()
+        for part in field.split(','):
+            base, _, step = part.partition('/')
+            if base == "*":
+                start, end = low, high
+            elif '-' in base:
+                start, end = (names.get(value, value) if names else value for value in base.split('-', 1))
+                start, end = int(start), int(end)
+            else:
+                start = int(names.get(base, base) if names else base)
+                end = high if step else start
+            if not (low <= start <= end <= high):
+                raise ValueError(f"cron字段 {field} 超出范围 {low}-{high}")
+            values.update(range(start, end + 1, int(step) if step else 1))
+        return values
+    
+    def matches_day(self, day: date) -> bool:
+        if day.month not in self.months:
+            return False
+        if self.trading_only and not self.calendar.is_trading_day(day):
+            return False
+        cron_weekday = (day.weekday() + 1) % 7  # cron中周日为0
+        if self.day_restricted and self.weekday_restricted:
+            return day.day in self.days or cron_weekday in self.weekdays
+        return day.day in self.days and cron_weekday in self.weekdays
+    
+    def next_after(self, moment: datetime, max_days: int = 800) -> datetime:
+        """严格晚于moment的下一个触发时刻"""
+        moment = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = moment.date()
+        for _ in range(max_days):
+            if self.matches_day(day):
+                for hour in sorted(self.hours):
+                    for minute in sorted(self.minutes):
+                        candidate = datetime.combine(day, datetime.min.time()).replace(hour=hour, minute=minute)
+                        if candidate >= moment:
+                            return candidate
+            day += timedelta(days=1)
+        raise ValueError(f"cron表达式 {self.expression} 在 {max_days} 天内没有触发时刻")
+    
+    def upcoming(self, moment: datetime, count: int = 5) -> List[datetime]:
+        """moment之后的若干个触发时刻"""
+        times = []
+        for _ in range(count):
+            moment = self.next_after(moment)
+            times.append(moment)
+        return times
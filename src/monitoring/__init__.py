@@ -0,0 +1 @@
+# 运行监控模块
@@ -0,0 +1,74 @@
+# 结构化日志
+
+import random
+import sys
+from typing import Dict, Any, Optional
+from loguru import logger
+
+# 日志类别：team 团队流程，agent 智能体，tool 工具调用，conversation 智能体发言内容，service 服务与监控
+CATEGORIES = ("team", "agent", "tool", "conversation", "service")
+
+CONSOLE_FORMAT = "<green>{time:HH:mm:ss}</green> | <level>{level: <7}</level> | {extra[category]: <12} | {message}"
+
+_enabled = {category: True for category in CATEGORIES}
+_sampling = {}
+_configured = False
+
+def _sample(record: Dict[str, Any]):
+    """每条记录只做一次类别开关和采样判断，保证各sink保留的记录一致；WARNING及以上级别始终保留"""
+    if record["level"].no >= 30:
+        return
+    category = record["extra"].get("category", "team")
+    rate = _sampling.get(category, 1.0) if _enabled.get(category, True) else 0.0
+    if rate < 1.0 and random.random() >= rate:
+        record["extra"]["dropped"] = True
+
+logger.configure(extra={"category": "team"}, patcher=_sample)
+
+def get_logger(category: str):
+    """获取绑定了类别的日志器"""
+    return logger.bind(category=category)
+
+def _filter(record: Dict[str, Any]) -> bool:
+    return not record["extra"].get("dropped", False)
+
+def setup_logging(logging_config: Optional[Dict[str, Any]] = None):
+    """按配置初始化日志管道
+    
+    控制台和文件sink都使用enqueue=True：调用方只把记录放入队列，由后台线程负责写入，
+    并发的智能体任务不会因控制台或文件I/O阻塞事件循环。文件中每行一条JSON记录，
+    包含类别和附加字段（如发言全文）。每个进程只配置一次，由入口（命令行、Web界面、基准脚本）调用，
+    之后的调用直接返回，不会重建sink而丢弃队列中尚未写出的记录。
+    """
+    global _configured
+    if _configured:
+        return
+    logging_config = logging_config or {}
+    level = logging_config.get("level", "INFO")
+    
+    _enabled["tool"] = logging_config.get("enable_tool_logging", True)
+    _enabled["conversation"] = logging_config.get("enable_conversation_logging", True)
+    _sampling.clear()
+    _sampling.update(logging_config.get("sampling") or {})
+    
+    logger.remove()
+    logger.add(sys.stderr, level=level, format=CONSOLE_FORMAT, filter=_filter, enqueue=True)
+    
+    log_file = logging_config.get("log_file")
+    if log_file:
+        logger.add(
+            log_file,
+            level=logging_config.get("file_level", level),
+            filter=_filter,
+            serialize=True,
+            enqueue=True,
+            rotation=logging_config.get("rotation", "20 MB"),
+            retention=logging_config.get("retention", 5),
+            encoding="utf-8"
+        )
+    _configured = True
+
+async def flush_logs():
+    """等待队列中的日志全部写出"""
+    if _configured:
+        await logger.complete()
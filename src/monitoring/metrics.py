@@ -0,0 +1,224 @@
+# Prometheus格式的运行指标
+
+import os
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Any, Optional, Tuple
+from .logs import get_logger
+
+logger = get_logger("service")
+
+# 默认的耗时分桶（秒）
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class _Metric:
+    """指标基类：按标签值元组保存各条时间序列，更新只在一把锁内做一次字典操作"""
+    
+    kind = ""
+    
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+    
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+    
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+    
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+    
+    kind = "counter"
+    
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+    
+    def value(self, **labels) -> float:
+        return self._series.get(self._key(labels), 0)
+    
+    def _samples(self) -> List[str]:
+        with self._lock:
+            series = list(self._series.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in series]
+
+class Gauge(Counter):
+    """可增可减的瞬时值，如队列深度"""
+    
+    kind = "gauge"
+    
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+    
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+class Histogram(_Metric):
+    """直方图：按分桶统计观测值的分布，同时记录总和与次数"""
+    
+    kind = "histogram"
+    
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+    
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [各分桶（含+Inf）的非累计次数, 总和, 次数]
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+    
+    def _samples(self) -> List[str]:
+        with self._lock:
+            series = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        lines = []
+        for key, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip([*self.buckets, "+Inf"], counts):
+                cumulative += bucket_count
+                le = f'le="{bound if bound == "+Inf" else _format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(round(total, 6))}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+class MetricsRegistry:
+    """指标注册表：同名指标只创建一次，按注册顺序输出文本格式"""
+    
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+    
+    def _register(self, metric_class: type, name: str, *args, **kwargs) -> Any:
+        with self._lock:
+            if name not in self.metrics:
+                self.metrics[name] = metric_class(name, *args, **kwargs)
+            return self.metrics[name]
+    
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter, name, help_text, labelnames)
+    
+    def gauge(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge, name, help_text, labelnames)
+    
+    def histogram(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, help_text, labelnames, buckets)
+    
+    def render(self) -> str:
+        """Prometheus文本格式（0.0.4）"""
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+    
+    def write_textfile(self, path: str):
+        """原子写入指标文件，供node_exporter的textfile收集器采集批处理任务的指标"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+REGISTRY = MetricsRegistry()
+
+# 模型调用
+LLM_LATENCY = REGISTRY.histogram(
+    "ascope_llm_request_seconds", "单次模型调用耗时（秒）", ("agent", "phase"),
+    buckets=(0.5, 1, 2, 5, 10, 20, 40, 80, 160)
+)
+LLM_TOKENS = REGISTRY.counter("ascope_llm_tokens_total", "模型token用量，kind为input/output/cached", ("agent", "phase", "kind"))
+LLM_RATE_LIMIT_WAIT = REGISTRY.counter("ascope_llm_rate_limit_wait_seconds_total", "模型请求因限速等待的总秒数")
+BUDGET_HITS = REGISTRY.counter("ascope_react_budget_hits_total", "ReAct预算触发次数", ("agent", "phase", "reason"))
+
+# 工具调用
+TOOL_LATENCY = REGISTRY.histogram("ascope_tool_call_seconds", "MCP工具调用耗时（秒）", ("tool",))
+TOOL_CALLS = REGISTRY.counter("ascope_tool_calls_total", "MCP工具调用次数，status为ok/error/timeout/rejected", ("tool", "status"))
+TOOL_OUTPUT_TOKENS = REGISTRY.counter("ascope_tool_output_tokens_total", "交给模型的工具输出估算token数，kind为raw/compact", ("tool", "kind"))
+MEMORY_LOOKUPS = REGISTRY.counter("ascope_memory_lookups_total", "智能体记忆查询次数，result为hit/miss", ("agent", "result"))
+
+# 流水线
+STAGE_LATENCY = REGISTRY.histogram(
+    "ascope_stage_seconds", "流水线各阶段耗时（秒）", ("stage",),
+    buckets=(5, 10, 30, 60, 120, 300, 600, 1200)
+)
+DEBATE_ROUNDS = REGISTRY.counter("ascope_debate_rounds_total", "完成的辩论轮数")
+DEBATE_POSTS = REGISTRY.counter("ascope_debate_posts_total", "辩论发言次数", ("agent",))
+AGENT_ERRORS = REGISTRY.counter("ascope_agent_errors_total", "智能体各阶段失败次数", ("agent", "stage"))
+RUNS = REGISTRY.counter("ascope_runs_total", "完整运行次数，status为ok/error", ("status",))
+COALESCED_REQUESTS = REGISTRY.counter("ascope_coalesced_requests_total", "合并到已有运行的请求数，kind为in_flight/fresh", ("kind",))
+WATCHLIST_RUNS = REGISTRY.counter("ascope_watchlist_runs_total", "自选股定时运行的股票数，status为ok/error/skipped_budget", ("status",))
+QUEUE_DEPTH = REGISTRY.gauge("ascope_queue_depth", "队列深度：coordinator为等待执行的运行，tool_calls为进行中的工具调用", ("queue",))
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+    
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+_server = None
+
+def start_metrics_server(metrics_config: Optional[Dict[str, Any]] = None) -> Optional[ThreadingHTTPServer]:
+    """按配置在后台线程启动 /metrics 端点；未启用时返回None，重复调用复用已启动的服务"""
+    global _server
+    metrics_config = metrics_config or {}
+    if not metrics_config.get("enabled", False):
+        return None
+    if _server is not None:
+        return _server
+    
+    host = metrics_config.get("host", "127.0.0.1")
+    port = metrics_config.get("port", 9464)
+    try:
+        _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logger.warning(f"⚠️ 指标端点启动失败 {host}:{port}: {e}")
+        return None
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"📈 指标端点已启动: http://{host}:{port}/metrics")
+    return _server
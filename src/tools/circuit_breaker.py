@@ -0,0 +1,80 @@
+# MCP工具熔断器
+
+import time
+from typing import Dict, Any, Optional
+
+class CircuitBreaker:
+    """熔断器：连续失败达到阈值后断开，冷却期内直接拒绝调用
+    
+    状态：closed（正常）-> open（熔断）-> half_open（冷却结束，放行一次试探调用）。
+    试探成功恢复为closed，失败则重新熔断。
+    """
+    
+    def __init__(self, name: str, failure_threshold: int = 3, cooldown_seconds: float = 60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.trip_count = 0
+        self.opened_at = None
+        self.last_error = None
+        self._probing = False
+    
+    def allow(self) -> bool:
+        """当前是否允许调用；冷却结束后只放行一次试探调用"""
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown_seconds:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+    
+    def is_open(self) -> bool:
+        """是否处于熔断状态（冷却已结束、可以试探的不算）"""
+        if self.state == "closed":
+            return False
+        if self.state == "open":
+            return time.monotonic() - self.opened_at < self.cooldown_seconds
+        return self._probing
+    
+    def retry_after(self) -> float:
+        """距离冷却结束的秒数"""
+        if self.state != "open":
+            return 0.0
+        return max(self.cooldown_seconds - (time.monotonic() - self.opened_at), 0.0)
+    
+    def release(self):
+        """放弃已获得的试探机会（调用未真正执行或被取消），以便之后重新试探"""
+        self._probing = False
+    
+    def record_success(self):
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self._probing = False
+    
+    def record_failure(self, error: Optional[str] = None):
+        self.consecutive_failures += 1
+        self.last_error = error
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            self._trip()
+    
+    def _trip(self):
+        if self.state != "open":
+            self.trip_count += 1
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        self._probing = False
+    
+    def get_status(self) -> Dict[str, Any]:
+        """熔断器状态"""
+        return {
+            "state": "open" if self.is_open() else ("half_open" if self.state != "closed" else "closed"),
+            "consecutive_failures": self.consecutive_failures,
+            "trip_count": self.trip_count,
+            "retry_after_seconds": round(self.retry_after(), 1),
+            "last_error": self.last_error
+        }
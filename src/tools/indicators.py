@@ -0,0 +1,162 @@
+# 本地技术指标计算引擎
+
+from typing import Dict, Any, Optional
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+MA_WINDOWS = (5, 10, 20, 60)
+
+def sma(values: np.ndarray, window: int) -> np.ndarray:
+    """简单移动平均（前 window-1 个值为NaN）"""
+    result = np.full(len(values), np.nan)
+    if len(values) < window:
+        return result
+    cumsum = np.cumsum(np.insert(values, 0, 0.0))
+    result[window - 1:] = (cumsum[window:] - cumsum[:-window]) / window
+    return result
+
+def ema(values: np.ndarray, span: Optional[int] = None, alpha: Optional[float] = None) -> np.ndarray:
+    """指数移动平均（递推形式，与通达信/同花顺口径一致）"""
+    series = pd.Series(values)
+    if alpha is not None:
+        return series.ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    return series.ewm(span=span, adjust=False).mean().to_numpy()
+
+def rolling_max(values: np.ndarray, window: int) -> np.ndarray:
+    """滚动最大值"""
+    result = np.full(len(values), np.nan)
+    if len(values) >= window:
+        result[window - 1:] = sliding_window_view(values, window).max(axis=1)
+    return result
+
+def rolling_min(values: np.ndarray, window: int) -> np.ndarray:
+    """滚动最小值"""
+    result = np.full(len(values), np.nan)
+    if len(values) >= window:
+        result[window - 1:] = sliding_window_view(values, window).min(axis=1)
+    return result
+
+def rsi(close: np.ndarray, window: int) -> np.ndarray:
+    """RSI相对强弱指标（SMA(x, N, 1)平滑）"""
+    delta = np.diff(close, prepend=np.nan)
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    avg_gain = ema(gain[1:], alpha=1.0 / window)
+    avg_loss = ema(loss[1:], alpha=1.0 / window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = 100.0 * avg_gain / (avg_gain + avg_loss)
+    result = np.full(len(close), np.nan)
+    result[1:] = values
+    result[:window] = np.nan
+    return result
+
+def compute_indicators(close: np.ndarray, high: Optional[np.ndarray] = None, low: Optional[np.ndarray] = None,
+                       volume: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """一次性计算全部常用技术指标
+    
+    Args:
+        close: 收盘价序列（按日期升序）
+        high: 最高价序列，缺失时用收盘价代替
+        low: 最低价序列，缺失时用收盘价代替
+        volume: 成交量序列
+    
+    Returns:
+        指标名 -> 与输入等长的数组
+    """
+    close = np.asarray(close, dtype=np.float64)
+    high = close if high is None or np.isnan(high).all() else np.asarray(high, dtype=np.float64)
+    low = close if low is None or np.isnan(low).all() else np.asarray(low, dtype=np.float64)
+    
+    result = {}
+    
+    # 均线
+    for window in MA_WINDOWS:
+        result[f"MA{window}"] = sma(close, window)
+    
+    # MACD(12, 26, 9)：DIF、DEA，以及A股习惯的2倍柱状值
+    dif = ema(close, span=12) - ema(close, span=26)
+    dea = ema(dif, span=9)
+    result["DIF"] = dif
+    result["DEA"] = dea
+    result["MACD"] = 2.0 * (dif - dea)
+    
+    # RSI(6, 12, 24)
+    for window in (6, 12, 24):
+        result[f"RSI{window}"] = rsi(close, window)
+    
+    # KDJ(9, 3, 3)
+    highest = rolling_max(high, 9)
+    lowest = rolling_min(low, 9)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsv = np.where(highest > lowest, (close - lowest) / (highest - lowest) * 100.0, 50.0)
+    valid = ~np.isnan(highest)
+    k = np.full(len(close), np.nan)
+    d = np.full(len(close), np.nan)
+    if valid.any():
+        k[valid] = ema(rsv[valid], alpha=1.0 / 3)
+        d[valid] = ema(k[valid], alpha=1.0 / 3)
+    result["K"] = k
+    result["D"] = d
+    result["J"] = 3.0 * k - 2.0 * d
+    
+    # 成交量
+    if volume is not None and not np.isnan(volume).all():
+        volume = np.asarray(volume, dtype=np.float64)
+        result["VOL_MA5"] = sma(volume, 5)
+        result["VOL_MA10"] = sma(volume, 10)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result["VOL_RATIO"] = volume / result["VOL_MA5"]
+    
+    return result
+
+def _crossed(fast: np.ndarray, slow: np.ndarray, lookback: int) -> Optional[str]:
+    """判断最近 lookback 根K线内是否出现金叉/死叉"""
+    diff = fast[-(lookback + 1):] - slow[-(lookback + 1):]
+    diff = diff[~np.isnan(diff)]
+    if len(diff) < 2:
+        return None
+    signs = np.sign(diff)
+    changes = np.nonzero(signs[1:] != signs[:-1])[0]
+    if len(changes) == 0:
+        return None
+    return "金叉" if signs[changes[-1] + 1] > 0 else "死叉"
+
+def _latest(values: np.ndarray) -> Optional[float]:
+    """取最新值（NaN返回None）"""
+    if len(values) == 0 or np.isnan(values[-1]):
+        return None
+    return round(float(values[-1]), 4)
+
+def summarize_indicators(indicators: Dict[str, np.ndarray], close: np.ndarray, lookback: int = 5) -> Dict[str, Any]:
+    """提取最新指标值和信号，供智能体直接引用"""
+    latest = {name: _latest(values) for name, values in indicators.items()}
+    signals = {}
+    
+    ma_values = [latest.get(f"MA{window}") for window in MA_WINDOWS]
+    if all(value is not None for value in ma_values):
+        if all(a > b for a, b in zip(ma_values, ma_values[1:])):
+            signals["均线排列"] = "多头排列"
+        elif all(a < b for a, b in zip(ma_values, ma_values[1:])):
+            signals["均线排列"] = "空头排列"
+        else:
+            signals["均线排列"] = "交织"
+    
+    macd_cross = _crossed(indicators["DIF"], indicators["DEA"], lookback)
+    if macd_cross:
+        signals["MACD"] = f"近{lookback}日{macd_cross}"
+    
+    rsi6 = latest.get("RSI6")
+    if rsi6 is not None:
+        signals["RSI"] = "超买" if rsi6 >= 80 else "超卖" if rsi6 <= 20 else "中性"
+    
+    kdj_cross = _crossed(indicators["K"], indicators["D"], lookback)
+    if kdj_cross:
+        signals["KDJ"] = f"近{lookback}日{kdj_cross}"
+    
+    close_price = round(float(close[-1]), 4) if len(close) else None
+    ma20 = latest.get("MA20")
+    if close_price is not None and ma20:
+        signals["价格相对MA20"] = f"{(close_price / ma20 - 1) * 100:+.2f}%"
+    
+    return {"close": close_price, "latest": latest, "signals": signals}
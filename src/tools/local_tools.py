@@ -0,0 +1,169 @@
+# 本地计算工具集
+
+import asyncio
+import json
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional
+import numpy as np
+from langchain_core.tools import StructuredTool, ToolException
+from ..data.market_data import parse_records, records_to_ohlcv, render_args, to_ts_code
+from .indicators import compute_indicators, summarize_indicators
+from .risk_metrics import compute_risk_metrics, round_metrics
+from ..monitoring.logs import get_logger
+
+logger = get_logger("tool")
+
+class LocalToolkit:
+    """本地计算工具集：通过MCP获取行情数据后在本地完成计算，与MCP工具一起提供给智能体"""
+    
+    def __init__(self, tool_layer: Any, config: Optional[Dict[str, Any]] = None,
+                 price_store: Any = None, initial_lookback_days: int = 730):
+        self.tool_layer = tool_layer
+        self.config = config or {}
+        self.price_source = self.config.get("price_source", {})
+        self.price_store = price_store
+        self.initial_lookback_days = initial_lookback_days
+        self._sync_locks = {}
+    
+    async def fetch_ohlcv(self, stock_code: str, lookback_days: int = 365,
+                          source: Optional[Dict[str, Any]] = None) -> Dict[str, np.ndarray]:
+        """获取OHLCV数组；启用本地行情库时先增量同步，再从库中零拷贝读取"""
+        if self.price_store is None:
+            return await self._fetch_remote(stock_code, lookback_days, source)
+        
+        ts_code = to_ts_code(stock_code)
+        lock = self._sync_locks.setdefault(ts_code, asyncio.Lock())
+        async with lock:
+            try:
+                await self.price_store.sync(
+                    ts_code,
+                    lambda code, days: self._fetch_remote(code, days, source),
+                    self.initial_lookback_days
+                )
+            except Exception as e:
+                # 同步失败时若库中已有数据则降级使用本地数据
+                if not self.price_store.last_date(ts_code):
+                    raise
+                logger.warning(f"⚠️ {ts_code} 行情同步失败，使用本地已有数据: {e}")
+        
+        start_date = int((datetime.now() - timedelta(days=lookback_days)).strftime('%Y%m%d'))
+        bars = self.price_store.read(ts_code, start_date)
+        if len(bars["close"]) == 0:
+            raise ToolException(f"本地行情库中没有 {ts_code} 最近 {lookback_days} 天的数据")
+        return bars
+    
+    async def _fetch_remote(self, stock_code: str, lookback_days: int,
+                            source: Optional[Dict[str, Any]] = None) -> Dict[str, np.ndarray]:
+        """通过MCP行情工具获取OHLCV数组"""
+        source = source or self.price_source
+        if not self.tool_layer or not source.get("tool"):
+            raise ToolException("未配置行情数据来源，无法进行本地计算")
+        
+        args = render_args(source.get("args", {}), stock_code, lookback_days)
+        payload = await self.tool_layer.call_tool(source["tool"], args)
+        bars = records_to_ohlcv(parse_records(payload))
+        if not bars or len(bars["close"]) == 0:
+            raise ToolException(f"未能从 {source['tool']} 的返回结果中解析出 {stock_code} 的行情数据")
+        return bars
+    
+    async def technical_indicators(self, stock_code: str, lookback_days: int = 365) -> str:
+        """计算 MA5/10/20/60、MACD、RSI、KDJ 和成交量指标"""
+        bars = await self.fetch_ohlcv(stock_code, lookback_days)
+        indicators = compute_indicators(bars["close"], bars["high"], bars["low"], bars["volume"])
+        summary = summarize_indicators(indicators, bars["close"])
+        summary.update({
+            "ts_code": to_ts_code(stock_code),
+            "bars": int(len(bars["close"])),
+            "start_date": int(bars["date"][0]),
+            "end_date": int(bars["date"][-1])
+        })
+        return json.dumps(summary, ensure_ascii=False)
+    
+    async def risk_metrics(self, stock_code: str, lookback_days: int = 365, benchmark_code: str = "") -> str:
+        """计算VaR/CVaR、最大回撤及持续时间、夏普/索提诺、Beta与信息比率"""
+        risk_config = self.config.get("risk_metrics") or {}
+        benchmark_code = benchmark_code or risk_config.get("benchmark_code", "")
+        benchmark_source = risk_config.get("benchmark_source") or self.price_source
+        
+        # 个股与基准并行获取
+        fetches = [self.fetch_ohlcv(stock_code, lookback_days)]
+        if benchmark_code:
+            fetches.append(self.fetch_ohlcv(benchmark_code, lookback_days, benchmark_source))
+        results = await asyncio.gather(*fetches, return_exceptions=True)
+        if isinstance(results[0], Exception):
+            raise results[0]
+        
+        bars = results[0]
+        dates, prices = bars["date"], bars["close"]
+        benchmark_prices = None
+        notes = []
+        if benchmark_code:
+            if isinstance(results[1], Exception):
+                notes.append(f"基准 {benchmark_code} 数据获取失败，未计算Beta和信息比率: {results[1]}")
+            else:
+                # 按交易日对齐个股与基准；共同交易日过少时只计算个股指标
+                common, stock_index, bench_index = np.intersect1d(dates, results[1]["date"], return_indices=True)
+                if len(common) < 3:
+                    notes.append(f"基准 {benchmark_code} 与个股的共同交易日不足3个，未计算Beta和信息比率")
+                else:
+                    dates, prices = common, prices[stock_index]
+                    benchmark_prices = results[1]["close"][bench_index]
+        
+        metrics = compute_risk_metrics(
+            prices,
+            benchmark_prices,
+            risk_free_rate=risk_config.get("risk_free_rate", 0.0),
+            confidence_levels=risk_config.get("confidence_levels", [0.95, 0.99])
+        )
+        
+        notes += metrics.pop("notes")
+        # 用日期替换回撤区间的序号，便于智能体引用
+        metrics["max_drawdown_peak_date"] = int(dates[metrics.pop("max_drawdown_peak_index")])
+        metrics["max_drawdown_trough_date"] = int(dates[metrics.pop("max_drawdown_trough_index")])
+        metrics.update({
+            "ts_code": to_ts_code(stock_code),
+            "benchmark": to_ts_code(benchmark_code) if "beta" in metrics else None,
+            "start_date": int(dates[0]),
+            "end_date": int(dates[-1]),
+            "notes": notes
+        })
+        return json.dumps(round_metrics(metrics), ensure_ascii=False)
+    
+    def _build_tools(self) -> Dict[str, StructuredTool]:
+        """构建全部本地工具"""
+        return {
+            "technical_indicators": StructuredTool.from_function(
+                coroutine=self.technical_indicators,
+                name="technical_indicators",
+                description=(
+                    "在本地一次性精确计算股票的技术指标：MA5/MA10/MA20/MA60、MACD(DIF/DEA/柱)、"
+                    "RSI6/12/24、KDJ(9,3,3)、成交量均线与量比，并给出均线排列、金叉死叉、超买超卖等信号。"
+                    "参数 stock_code 为6位A股代码或ts_code，lookback_days 为回溯自然日天数。"
+                ),
+                handle_tool_error=True
+            ),
+            "risk_metrics": StructuredTool.from_function(
+                coroutine=self.risk_metrics,
+                name="risk_metrics",
+                description=(
+                    "在本地一次性精确计算个股风险指标：历史法与参数法的单日VaR/CVaR(95%/99%)、"
+                    "年化收益与波动率、最大回撤及其起止日期、回撤持续时间、夏普比率、索提诺比率，"
+                    "以及相对基准指数的Beta、相关系数、跟踪误差和信息比率。"
+                    "参数 stock_code 为6位A股代码或ts_code，lookback_days 为回溯自然日天数，"
+                    "benchmark_code 为基准指数代码（留空使用默认基准）。"
+                ),
+                handle_tool_error=True
+            )
+        }
+    
+    def tools_for(self, agent_key: str) -> List[StructuredTool]:
+        """返回某个智能体可用的本地工具"""
+        if not self.config.get("enabled", False):
+            return []
+        
+        tools = []
+        for name, tool in self._build_tools().items():
+            agents = (self.config.get(name) or {}).get("agents")
+            if agents is None or agent_key in agents:
+                tools.append(tool)
+        return tools
@@ -0,0 +1,301 @@
+# 团队共享的MCP工具层
+
+import asyncio
+import json
+import time
+from typing import Dict, List, Any, Optional
+from langchain_core.tools import StructuredTool, ToolException
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from .circuit_breaker import CircuitBreaker
+from .replica_pool import ReplicaPool, replica_connections, is_transport_error
+from .output_compactor import ToolOutputCompactor
+from ..monitoring.metrics import TOOL_LATENCY, TOOL_CALLS, QUEUE_DEPTH
+from ..monitoring.logs import get_logger
+
+logger = get_logger("tool")
+
+def content_to_text(content: Any) -> str:
+    """将MCP工具返回的内容统一转换为文本"""
+    if hasattr(content, 'content'):
+        content = content.content
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        parts = []
+        for item in content:
+            if isinstance(item, str):
+                parts.append(item)
+            elif isinstance(item, dict) and 'text' in item:
+                parts.append(item['text'])
+            else:
+                parts.append(json.dumps(item, ensure_ascii=False, default=str))
+        return "\n".join(parts)
+    return json.dumps(content, ensure_ascii=False, default=str)
+
+class MCPToolLayer:
+    """团队共享的MCP工具层：只建立一次连接，为各智能体和预取阶段统一代理工具调用"""
+    
+    def __init__(self, mcp_config: Dict[str, Any], tools_config: Optional[Dict[str, Any]] = None):
+        self.servers_config = mcp_config.get("servers", {})
+        self.tools_config = tools_config or {}
+        # 单次工具调用的超时：取mcp.json中各服务器的timeout，未配置时使用tools_config.timeout
+        self.timeout = self.tools_config.get("timeout", 30)
+        
+        self.client = None
+        self.raw_tools = {}  # 工具名 -> MCP原始工具（取自第一个可用副本，用于工具schema）
+        self.tool_servers = {}  # 工具名 -> 所属服务器
+        self.replica_tools = {}  # (副本名, 工具名) -> 绑定到该副本连接的MCP工具
+        self.pools = {}  # 服务器名 -> 副本池
+        self._health_task = None
+        self.tools = []  # 供智能体使用的包装工具
+        self.call_count = 0
+        self.error_count = 0
+        
+        # 按工具和按服务器的熔断器：单个工具反复失败只熔断该工具，服务器整体故障时熔断其全部工具
+        breaker_config = self.tools_config.get("circuit_breaker") or {}
+        self.breaker_enabled = breaker_config.get("enabled", True)
+        self.tool_failure_threshold = breaker_config.get("failure_threshold", 3)
+        self.server_failure_threshold = breaker_config.get("server_failure_threshold", 5)
+        self.cooldown_seconds = breaker_config.get("cooldown_seconds", 60)
+        self.tool_breakers = {}
+        self.server_breakers = {}
+        self.rejected_count = 0
+        
+        # 表格型工具输出在交给模型前压缩，预取和本地数据工具直接使用call_tool的原始结果
+        self.compactor = ToolOutputCompactor(self.tools_config.get("output_compaction"))
+    
+    async def initialize(self):
+        """连接MCP服务器并获取工具列表"""
+        if not self.servers_config:
+            logger.warning("⚠️ 没有可用的MCP服务器配置，工具层为空")
+            return
+        
+        # 每个逻辑服务器可配置多个副本，全部副本共用一个MCP客户端
+        connections = {}
+        for server_name, server_config in self.servers_config.items():
+            replicas = replica_connections(server_name, server_config)
+            self.pools[server_name] = ReplicaPool(
+                server_name, list(replicas), server_config.get("health_check_interval", 30)
+            )
+            connections.update(replicas)
+        self.client = MultiServerMCPClient(connections)
+        
+        for server_name, pool in self.pools.items():
+            for replica in pool.replicas:
+                try:
+                    await self._load_replica_tools(server_name, replica.name)
+                except Exception as e:
+                    pool.mark_failure(replica, str(e))
+            if not pool.healthy_count():
+                raise RuntimeError(f"MCP服务器 {server_name} 的所有副本均不可用: {pool.replicas[0].last_error}")
+        
+        # 按名称排序，保证每次请求携带的工具schema顺序稳定
+        self.tools = [self._wrap_tool(self.raw_tools[name]) for name in sorted(self.raw_tools)]
+        
+        for name, server_name in self.tool_servers.items():
+            self.tool_breakers[name] = CircuitBreaker(name, self.tool_failure_threshold, self.cooldown_seconds)
+            if server_name not in self.server_breakers:
+                self.server_breakers[server_name] = CircuitBreaker(
+                    server_name, self.server_failure_threshold, self.cooldown_seconds
+                )
+        logger.info(f"✅ MCP工具层初始化成功，共 {len(self.tools)} 个工具，来自 {len(self.servers_config)} 个服务器"
+                    f"（{sum(len(pool.replicas) for pool in self.pools.values())} 个副本）")
+        
+        # 有多副本的服务器定期做健康检查，恢复被摘除的副本
+        if any(len(pool.replicas) > 1 and pool.health_check_interval for pool in self.pools.values()):
+            self._health_task = asyncio.create_task(self._health_loop())
+    
+    async def _load_replica_tools(self, server_name: str, replica_name: str):
+        """获取副本的工具列表；同时作为健康检查探针"""
+        tools = await asyncio.wait_for(self.client.get_tools(server_name=replica_name),
+                                       timeout=self.server_timeout(server_name))
+        for tool in tools:
+            # 工具报错时抛出异常而不是转成普通文本结果，由工具层统一计数和熔断
+            tool.handle_tool_error = False
+            self.replica_tools[(replica_name, tool.name)] = tool
+            if tool.name not in self.raw_tools:
+                self.raw_tools[tool.name] = tool
+                self.tool_servers[tool.name] = server_name
+    
+    async def check_health(self):
+        """探测所有多副本服务器的副本，更新健康状态"""
+        for server_name, pool in self.pools.items():
+            if len(pool.replicas) < 2:
+                continue
+            for replica in pool.replicas:
+                try:
+                    await self._load_replica_tools(server_name, replica.name)
+                    pool.mark_success(replica)
+                except Exception as e:
+                    pool.mark_failure(replica, f"健康检查失败: {e}")
+    
+    async def _health_loop(self):
+        interval = min(pool.health_check_interval for pool in self.pools.values()
+                       if len(pool.replicas) > 1 and pool.health_check_interval)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.check_health()
+            except Exception as e:
+                logger.warning(f"⚠️ MCP副本健康检查异常: {e}")
+    
+    def server_timeout(self, server_name: str) -> float:
+        """服务器的工具调用超时（秒）"""
+        return (self.servers_config.get(server_name) or {}).get("timeout") or self.timeout
+    
+    def _wrap_tool(self, tool: Any) -> StructuredTool:
+        """包装MCP工具，使智能体的调用经过工具层"""
+        async def _call(**kwargs):
+            return self.compactor.compact(tool.name, await self.call_tool(tool.name, kwargs))
+        
+        return StructuredTool(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            coroutine=_call,
+            handle_tool_error=True
+        )
+    
+    async def call_tool(self, name: str, args: Dict[str, Any]) -> str:
+        """调用MCP工具并返回文本结果，熔断中的工具直接拒绝"""
+        tool = self.raw_tools.get(name)
+        if tool is None:
+            raise ToolException(f"未知工具: {name}")
+        
+        breakers = [self.tool_breakers[name], self.server_breakers[self.tool_servers[name]]] if self.breaker_enabled else []
+        for index, breaker in enumerate(breakers):
+            if not breaker.allow():
+                for acquired in breakers[:index]:
+                    acquired.release()
+                self.rejected_count += 1
+                TOOL_CALLS.inc(tool=name, status="rejected")
+                raise ToolException(
+                    f"工具 {name} 暂不可用（{breaker.name} 连续失败已熔断，约 {breaker.retry_after():.0f} 秒后重试），"
+                    f"请改用其他数据来源或在分析中说明该数据缺失"
+                )
+        
+        self.call_count += 1
+        start_time = time.perf_counter()
+        status = "error"
+        QUEUE_DEPTH.inc(queue="tool_calls")
+        try:
+            result = await self._call_replicas(name, args)
+            status = "ok"
+        except asyncio.TimeoutError:
+            status = "timeout"
+            self.error_count += 1
+            timeout = self.server_timeout(self.tool_servers[name])
+            self._record_failure(name, breakers, f"调用超时（{timeout}秒）", server_fault=True)
+            raise ToolException(f"工具 {name} 调用超时（{timeout}秒）")
+        except asyncio.CancelledError:
+            status = "cancelled"
+            for breaker in breakers:
+                breaker.release()
+            raise
+        except Exception as e:
+            self.error_count += 1
+            # 连接、传输错误同时计入服务器；工具自身返回的错误和参数错误等只计入该工具
+            self._record_failure(name, breakers, str(e), server_fault=is_transport_error(e))
+            # 转为ToolException，由包装工具作为错误结果返回给智能体，而不是中断整个ReAct运行
+            raise ToolException(f"工具 {name} 调用失败: {e}") from e
+        finally:
+            elapsed = time.perf_counter() - start_time
+            QUEUE_DEPTH.dec(queue="tool_calls")
+            TOOL_LATENCY.observe(elapsed, tool=name)
+            TOOL_CALLS.inc(tool=name, status=status)
+            logger.info(f"🔧 {name} {status}，耗时 {elapsed:.2f} 秒", tool=name, args=args, status=status)
+        
+        for breaker in breakers:
+            breaker.record_success()
+        return content_to_text(result)
+    
+    async def _call_replicas(self, name: str, args: Dict[str, Any]) -> Any:
+        """在服务器的副本间调用工具：选择未完成请求最少的副本，连接失败或超时时切换到下一个副本
+        
+        其他错误（工具报错、参数错误等）直接抛出，不计为副本故障，也不在其他副本上重试。
+        """
+        pool = self.pools[self.tool_servers[name]]
+        timeout = self.server_timeout(pool.server_name)
+        tried = []
+        last_error = ToolException(f"没有可用的副本提供工具 {name}")
+        
+        while True:
+            replica = pool.choose(exclude=tried)
+            tool = self.replica_tools.get((replica.name, name)) if replica else None
+            if replica and tool is None:
+                tried.append(replica.name)
+                continue
+            if replica is None:
+                raise last_error
+            
+            replica.outstanding += 1
+            replica.total_calls += 1
+            try:
+                result = await asyncio.wait_for(tool.ainvoke(args), timeout=timeout)
+            except ToolException:
+                # 工具本身报错，说明副本可以正常响应，不做故障切换
+                pool.mark_success(replica)
+                raise
+            except Exception as e:
+                if not is_transport_error(e):
+                    raise
+                pool.mark_failure(replica, str(e) or type(e).__name__)
+                tried.append(replica.name)
+                last_error = e
+                if len(tried) < len(pool.replicas):
+                    pool.failover_count += 1
+                    logger.warning(f"🔀 {name} 在副本 {replica.name} 调用失败，切换到其他副本")
+                continue
+            finally:
+                replica.outstanding -= 1
+            
+            pool.mark_success(replica)
+            return result
+    
+    def _record_failure(self, name: str, breakers: List[CircuitBreaker], error: str, server_fault: bool):
+        if not server_fault:
+            # 服务器正常返回了工具错误，说明服务器本身可用
+            for breaker in breakers[1:]:
+                breaker.record_success()
+            breakers = breakers[:1]
+        for breaker in breakers:
+            was_open = breaker.state == "open"
+            breaker.record_failure(error)
+            if breaker.state == "open" and not was_open:
+                logger.warning(f"🔌 {breaker.name} 连续失败 {breaker.consecutive_failures} 次，熔断 {self.cooldown_seconds} 秒（触发工具: {name}）")
+    
+    def unavailable_tools(self) -> List[str]:
+        """当前处于熔断中的工具（含所属服务器被熔断的工具）"""
+        if not self.breaker_enabled:
+            return []
+        return sorted(
+            name for name, server_name in self.tool_servers.items()
+            if self.tool_breakers[name].is_open() or self.server_breakers[server_name].is_open()
+        )
+    
+    def get_status(self) -> Dict[str, Any]:
+        """获取工具层状态"""
+        return {
+            "servers": list(self.servers_config.keys()),
+            "replicas": {name: pool.get_status() for name, pool in self.pools.items()},
+            "tools_count": len(self.tools),
+            "call_count": self.call_count,
+            "error_count": self.error_count,
+            "rejected_count": self.rejected_count,
+            "unavailable_tools": self.unavailable_tools(),
+            "breakers": {
+                "servers": {name: breaker.get_status() for name, breaker in self.server_breakers.items()},
+                # 只列出发生过失败的工具，避免状态输出过长
+                "tools": {name: breaker.get_status() for name, breaker in self.tool_breakers.items()
+                          if breaker.trip_count or breaker.consecutive_failures}
+            },
+            "compaction": self.compactor.get_stats()
+        }
+    
+    async def close(self):
+        """关闭MCP客户端"""
+        if self._health_task:
+            self._health_task.cancel()
+            self._health_task = None
+        if self.client and hasattr(self.client, 'close'):
+            await self.client.close()
@@ -0,0 +1,161 @@
+# 工具输出压缩
+
+import re
+from typing import Dict, List, Any, Optional
+from ..data.market_data import FIELD_ALIASES, parse_records, _to_number
+from .tool_filter import estimate_tokens
+from ..monitoring.metrics import TOOL_OUTPUT_TOKENS
+
+DEFAULT_COMPACTION = {
+    "enabled": True,
+    "min_chars": 800,  # 短于该长度的输出不处理
+    "max_rows": 60,  # 最多保留的行数（有日期列时保留最近的行）
+    "decimals": 2,  # 数值保留的小数位；绝对值小于1的数保留同样多的有效数字
+    "drop_constant_columns": True,  # 所有行取值相同的列（如ts_code）移到表头
+    "summary": True  # 附加数值列在全部行上的统计
+}
+
+DATE_FIELDS = {alias.lower() for alias in FIELD_ALIASES["date"]}
+# 标识列（证券代码等）：取值保持字符串，如"000001"不能变成1
+IDENTIFIER_SUFFIXES = ("code", "symbol", "代码")
+LEADING_ZERO = re.compile(r'^[+-]?0\d')
+
+def is_identifier(column: Any) -> bool:
+    return str(column).lower().endswith(IDENTIFIER_SUFFIXES)
+
+def format_number(value: Any, decimals: int = 2) -> str:
+    """数值格式化：整数不带小数点，小数去掉末尾的0"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return "" if value is None else str(value).replace("|", "/").replace("\n", " ")
+    if isinstance(value, int) or value.is_integer():
+        return str(int(value))
+    text = f"{value:.{decimals}f}" if abs(value) >= 1 else f"{value:.{decimals}g}"
+    return text.rstrip("0").rstrip(".") if "." in text and "e" not in text else text
+
+class ToolOutputCompactor:
+    """将工具返回的表格型数据（JSON记录、tushare风格fields/items、Markdown表格）压缩为列式文本
+    
+    重复的键名只在表头出现一次，常量列移到表头，数值统一舍入，超出行数上限时保留最近的行
+    并附上全部行的统计。JSON中的值保持原类型；Markdown表格只转换整列都是数值、且不是标识列
+    也没有前导0的列。非表格输出原样返回。按工具统计压缩前后的估算token数。
+    """
+    
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        config = config or {}
+        self.per_tool = config.get("tools") or {}
+        self.defaults = {**DEFAULT_COMPACTION, **{key: value for key, value in config.items() if key != "tools"}}
+        self.stats = {}
+    
+    def _options(self, tool_name: str) -> Dict[str, Any]:
+        return {**self.defaults, **(self.per_tool.get(tool_name) or {})}
+    
+    def compact(self, tool_name: str, text: str) -> str:
+        """压缩单次工具输出，失败或不适用时返回原文"""
+        options = self._options(tool_name)
+        if not options["enabled"] or len(text) < options["min_chars"]:
+            return text
+        
+        try:
+            compacted = self._compact_table(text, options)
+        except Exception:
+            compacted = None
+        
+        stats = self.stats.setdefault(tool_name, {"calls": 0, "compacted": 0, "raw_tokens": 0, "compact_tokens": 0})
+        raw_tokens = estimate_tokens(text)
+        result = compacted if compacted is not None and len(compacted) < len(text) else text
+        compact_tokens = estimate_tokens(result) if result is not text else raw_tokens
+        stats["calls"] += 1
+        stats["compacted"] += result is not text
+        stats["raw_tokens"] += raw_tokens
+        stats["compact_tokens"] += compact_tokens
+        TOOL_OUTPUT_TOKENS.inc(raw_tokens, tool=tool_name, kind="raw")
+        TOOL_OUTPUT_TOKENS.inc(compact_tokens, tool=tool_name, kind="compact")
+        return result
+    
+    def _compact_table(self, text: str, options: Dict[str, Any]) -> Optional[str]:
+        records = parse_records(text, coerce_numbers=False)
+        if len(records) < 2:
+            return None
+        
+        columns = []
+        for record in records:
+            for key in record:
+                if key not in columns:
+                    columns.append(key)
+        rows = [[record.get(column) for column in columns] for record in records]
+        date_index = next((index for index, column in enumerate(columns) if str(column).lower() in DATE_FIELDS), None)
+        
+        # Markdown表格的单元格都是字符串，只转换整列可解析为数值的列
+        for index, column in enumerate(columns):
+            if index == date_index or is_identifier(column):
+                continue
+            cells = [row[index] for row in rows if isinstance(row[index], str) and row[index].strip()]
+            if not cells or any(LEADING_ZERO.match(cell.strip()) for cell in cells):
+                continue
+            numbers = [_to_number(cell) for cell in cells]
+            if all(isinstance(number, float) for number in numbers):
+                for row in rows:
+                    if isinstance(row[index], str):
+                        row[index] = _to_number(row[index]) if row[index].strip() else None
+        
+        # 有日期列时按日期升序，截断时保留最近的行
+        if date_index is not None:
+            rows.sort(key=lambda row: str(format_number(row[date_index])))
+        # 含多只证券的表格（如多只股票的行情）首末值和变化没有意义
+        securities = max((len({repr(row[index]) for row in rows}) for index, column in enumerate(columns)
+                          if is_identifier(column)), default=1)
+        
+        decimals = options["decimals"]
+        header_notes = []
+        keep = list(range(len(columns)))
+        if options["drop_constant_columns"]:
+            constant = [index for index in keep if len({repr(row[index]) for row in rows}) == 1]
+            if len(constant) < len(columns):
+                header_notes = [f"{columns[index]}={format_number(rows[0][index], decimals)}" for index in constant]
+                keep = [index for index in keep if index not in constant]
+        
+        max_rows = options["max_rows"]
+        shown = rows[-max_rows:] if date_index is not None else rows[:max_rows]
+        
+        lines = [
+            f"[表格已压缩: 共 {len(rows)} 行 × {len(columns)} 列"
+            + (f"，显示{'最近' if date_index is not None else '前'} {len(shown)} 行" if len(shown) < len(rows) else "")
+            + (f"，含 {securities} 只证券" if securities > 1 else "")
+            + (f"；各行相同: {', '.join(header_notes)}" if header_notes else "") + "]",
+            "|".join(str(columns[index]) for index in keep)
+        ]
+        lines.extend("|".join(format_number(row[index], decimals) for index in keep) for row in shown)
+        
+        if options["summary"]:
+            summary = self._summarize(columns, rows, keep, date_index, decimals, series=securities == 1)
+            if summary:
+                lines.append(f"[全部 {len(rows)} 行统计] " + "; ".join(summary))
+        return "\n".join(lines)
+    
+    def _summarize(self, columns: List[Any], rows: List[List[Any]], keep: List[int],
+                   date_index: Optional[int], decimals: int, series: bool = True) -> List[str]:
+        """数值列的最小、最大、均值，以及首末值和变化（单只证券按日期排序时）"""
+        summary = []
+        for index in keep:
+            if index == date_index or is_identifier(columns[index]):
+                continue
+            values = [row[index] for row in rows
+                      if isinstance(row[index], (int, float)) and not isinstance(row[index], bool)]
+            if len(values) < len(rows) * 0.8 or not values:
+                continue
+            parts = [f"min {format_number(min(values), decimals)}", f"max {format_number(max(values), decimals)}",
+                     f"mean {format_number(sum(values) / len(values), decimals)}"]
+            if date_index is not None and series:
+                parts.append(f"首 {format_number(values[0], decimals)} 末 {format_number(values[-1], decimals)}")
+                if values[0] > 0:
+                    parts.append(f"变化 {values[-1] / values[0] - 1:+.1%}")
+            summary.append(f"{columns[index]}: {' '.join(parts)}")
+        return summary
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """按工具统计的压缩效果"""
+        return {
+            tool: {**stats, "saved_ratio": round(1 - stats["compact_tokens"] / stats["raw_tokens"], 4)
+                   if stats["raw_tokens"] else 0.0}
+            for tool, stats in self.stats.items()
+        }
@@ -0,0 +1,152 @@
+# 组合层面的风险分析
+
+from statistics import NormalDist
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from .risk_metrics import TRADING_DAYS_PER_YEAR
+
+def ledoit_wolf_covariance(returns: np.ndarray) -> Tuple[np.ndarray, float]:
+    """Ledoit-Wolf收缩协方差矩阵（收缩目标为等方差对角阵）
+    
+    Args:
+        returns: T×N 收益率矩阵
+    
+    Returns:
+        (收缩后的协方差矩阵, 收缩强度)
+    """
+    t, n = returns.shape
+    centered = returns - returns.mean(axis=0)
+    sample_cov = centered.T @ centered / t
+    mu = np.trace(sample_cov) / n
+    
+    target_distance = sample_cov.copy()
+    target_distance[np.diag_indices(n)] -= mu
+    delta = np.sum(target_distance ** 2) / n
+    
+    squared = centered ** 2
+    beta = np.sum(squared.T @ squared / t - sample_cov ** 2) / (n * t)
+    shrinkage = float(min(beta, delta) / delta) if delta > 0 else 0.0
+    
+    covariance = (1.0 - shrinkage) * sample_cov
+    covariance[np.diag_indices(n)] += shrinkage * mu
+    return covariance, shrinkage
+
+def align_returns(prices: Dict[str, Tuple[np.ndarray, np.ndarray]],
+                  min_coverage: float = 0.8) -> Tuple[pd.DataFrame, List[str]]:
+    """按交易日对齐各持仓的收益率
+    
+    Args:
+        prices: ts_code -> (交易日数组, 收盘价数组)
+        min_coverage: 有效数据占比低于该值的持仓会被剔除
+    
+    Returns:
+        (对齐后的收益率矩阵, 被剔除的代码列表)
+    """
+    frame = pd.concat(
+        {code: pd.Series(closes, index=dates) for code, (dates, closes) in prices.items()}, axis=1
+    ).sort_index()
+    returns = frame.pct_change(fill_method=None).iloc[1:]
+    coverage = returns.notna().mean()
+    dropped = coverage.index[coverage < min_coverage].tolist()
+    # 停牌等缺失日视为当日收益为0
+    return returns.drop(columns=dropped).fillna(0.0), dropped
+
+def compute_portfolio_risk(returns: pd.DataFrame, weights: Dict[str, float],
+                           sectors: Optional[Dict[str, str]] = None,
+                           confidence_levels: Sequence[float] = (0.95, 0.99),
+                           top_n: int = 10,
+                           periods_per_year: int = TRADING_DAYS_PER_YEAR) -> Dict[str, Any]:
+    """计算组合的VaR/CVaR、集中度和边际风险贡献
+    
+    Args:
+        returns: T×N 收益率矩阵（列为ts_code）
+        weights: ts_code -> 持仓权重（会按returns中的列重新归一化）
+        sectors: ts_code -> 行业，用于行业集中度
+        confidence_levels: VaR/CVaR置信水平
+        top_n: 结果中列出的风险贡献最大的持仓数量
+    
+    Returns:
+        紧凑的组合风险结果，可直接提供给风险管理师
+    """
+    codes = list(returns.columns)
+    w = np.array([weights.get(code, 0.0) for code in codes], dtype=np.float64)
+    if not w.sum():
+        raise ValueError("持仓权重之和为0，无法归一化")
+    w = w / w.sum()
+    matrix = returns.to_numpy(dtype=np.float64)
+    
+    covariance, shrinkage = ledoit_wolf_covariance(matrix)
+    mean = matrix.mean(axis=0)
+    
+    # 组合波动率及风险贡献：MRC = Σw/σp，成分贡献 = w·MRC，其和等于σp
+    sigma_w = covariance @ w
+    portfolio_std = float(np.sqrt(w @ sigma_w))
+    marginal = sigma_w / portfolio_std
+    component = w * marginal
+    contribution_pct = component / portfolio_std
+    
+    asset_std = np.sqrt(np.diag(covariance))
+    portfolio_mean = float(w @ mean)
+    portfolio_returns = matrix @ w
+    
+    normal = NormalDist()
+    var = {}
+    for level in confidence_levels:
+        quantile = float(np.quantile(portfolio_returns, 1.0 - level))
+        tail = portfolio_returns[portfolio_returns <= quantile]
+        z = normal.inv_cdf(1.0 - level)
+        var[f"{level:.0%}"] = {
+            "historical_var": -quantile,
+            "historical_cvar": float(-tail.mean()) if len(tail) else -quantile,
+            "parametric_var": -(portfolio_mean + z * portfolio_std),
+            "parametric_cvar": -(portfolio_mean - portfolio_std * normal.pdf(z) / (1.0 - level))
+        }
+    
+    # 集中度：HHI、有效持仓数、前N大权重
+    hhi = float(np.sum(w ** 2))
+    order_by_weight = np.argsort(-w)
+    order_by_risk = np.argsort(-component)
+    
+    result = {
+        "holdings": len(codes),
+        "observations": int(matrix.shape[0]),
+        "start_date": str(returns.index[0]),
+        "end_date": str(returns.index[-1]),
+        "shrinkage": shrinkage,
+        "daily_volatility": portfolio_std,
+        "annual_volatility": portfolio_std * np.sqrt(periods_per_year),
+        "annual_return": portfolio_mean * periods_per_year,
+        "var": var,
+        "diversification_ratio": float(w @ asset_std / portfolio_std),
+        "concentration": {
+            "hhi": hhi,
+            "effective_holdings": 1.0 / hhi,
+            "max_weight": float(w[order_by_weight[0]]),
+            f"top{top_n}_weight": float(w[order_by_weight[:top_n]].sum())
+        },
+        "top_risk_contributors": [
+            {
+                "ts_code": codes[i],
+                "weight": float(w[i]),
+                "annual_volatility": float(asset_std[i] * np.sqrt(periods_per_year)),
+                "marginal_risk": float(marginal[i]),
+                "risk_contribution_pct": float(contribution_pct[i])
+            }
+            for i in order_by_risk[:top_n]
+        ]
+    }
+    
+    if sectors:
+        sector_weights = {}
+        sector_risk = {}
+        for i, code in enumerate(codes):
+            sector = sectors.get(code, "未知")
+            sector_weights[sector] = sector_weights.get(sector, 0.0) + float(w[i])
+            sector_risk[sector] = sector_risk.get(sector, 0.0) + float(contribution_pct[i])
+        result["sectors"] = [
+            {"sector": sector, "weight": sector_weights[sector], "risk_contribution_pct": sector_risk[sector]}
+            for sector in sorted(sector_risk, key=sector_risk.get, reverse=True)
+        ]
+    
+    return result
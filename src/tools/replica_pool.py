@@ -0,0 +1,106 @@
+# MCP服务器多副本负载均衡
+
+import asyncio
+from typing import Dict, List, Any, Optional
+import anyio
+import httpx
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED
+from ..monitoring.logs import get_logger
+
+logger = get_logger("tool")
+
+# 服务器配置中只用于副本管理、不传给MCP客户端的字段
+REPLICA_KEYS = ("replicas", "health_check_interval")
+
+# 说明副本本身不可用的错误：超时、连接和传输层错误（OSError 含连接被拒绝、重置）
+TRANSPORT_ERRORS = (asyncio.TimeoutError, OSError, httpx.TransportError,
+                    anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream)
+
+def is_transport_error(error: BaseException) -> bool:
+    """是否为应当切换副本的超时或连接/传输错误
+    
+    MCP客户端在任务组中运行连接，错误可能被包装为异常组，只要其中包含传输错误即视为传输错误；
+    服务器返回5xx或关闭连接同样视为副本故障。参数校验等其他错误换一个副本也不会成功，不在此列。
+    """
+    if getattr(error, "exceptions", None):
+        return any(is_transport_error(inner) for inner in error.exceptions)
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    if isinstance(error, McpError):
+        return error.error.code == CONNECTION_CLOSED
+    return isinstance(error, TRANSPORT_ERRORS)
+
+def replica_connections(server_name: str, server_config: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """将一个逻辑服务器的配置展开为各副本的连接配置
+    
+    配置了replicas时，每个副本继承服务器级的公共字段（如transport、timeout），
+    副本名为 服务器名#序号；否则服务器本身就是唯一的副本。
+    """
+    shared = {key: value for key, value in server_config.items() if key not in REPLICA_KEYS}
+    replicas = server_config.get("replicas") or []
+    if not replicas:
+        return {server_name: shared}
+    return {f"{server_name}#{index}": {**shared, **replica} for index, replica in enumerate(replicas, 1)}
+
+class Replica:
+    """单个服务器副本的运行状态"""
+    
+    def __init__(self, name: str):
+        self.name = name
+        self.healthy = True
+        self.outstanding = 0
+        self.total_calls = 0
+        self.failures = 0
+        self.last_error = None
+    
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "total_calls": self.total_calls,
+            "failures": self.failures,
+            "last_error": self.last_error
+        }
+
+class ReplicaPool:
+    """逻辑服务器的副本池：按最少未完成请求选择副本，失败的副本摘除直到健康检查恢复"""
+    
+    def __init__(self, server_name: str, replica_names: List[str], health_check_interval: float = 30.0):
+        self.server_name = server_name
+        self.replicas = [Replica(name) for name in replica_names]
+        self.health_check_interval = health_check_interval
+        self.failover_count = 0
+    
+    def choose(self, exclude: Optional[List[str]] = None) -> Optional[Replica]:
+        """选择未完成请求最少的健康副本；全部不健康时仍尝试失败次数最少的副本"""
+        candidates = [replica for replica in self.replicas if replica.name not in (exclude or [])]
+        if not candidates:
+            return None
+        healthy = [replica for replica in candidates if replica.healthy]
+        if healthy:
+            return min(healthy, key=lambda replica: (replica.outstanding, replica.total_calls))
+        return min(candidates, key=lambda replica: (replica.failures, replica.outstanding))
+    
+    def mark_success(self, replica: Replica):
+        if not replica.healthy:
+            logger.info(f"✅ MCP副本 {replica.name} 已恢复")
+        replica.healthy = True
+    
+    def mark_failure(self, replica: Replica, error: str):
+        replica.failures += 1
+        replica.last_error = error
+        if replica.healthy and len(self.replicas) > 1:
+            logger.warning(f"⚠️ MCP副本 {replica.name} 不可用，暂时摘除: {error}")
+        replica.healthy = False
+    
+    def healthy_count(self) -> int:
+        return sum(1 for replica in self.replicas if replica.healthy)
+    
+    def get_status(self) -> Dict[str, Any]:
+        """副本池状态"""
+        return {
+            "replicas": {replica.name: replica.get_status() for replica in self.replicas},
+            "healthy": self.healthy_count(),
+            "failover_count": self.failover_count
+        }
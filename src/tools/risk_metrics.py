@@ -0,0 +1,147 @@
+# 本地风险指标计算引擎
+
+from statistics import NormalDist
+from typing import Dict, Any, Optional, Sequence
+import numpy as np
+
+TRADING_DAYS_PER_YEAR = 242
+
+def simple_returns(prices: np.ndarray) -> np.ndarray:
+    """由价格序列计算简单收益率"""
+    prices = np.asarray(prices, dtype=np.float64)
+    return prices[1:] / prices[:-1] - 1.0
+
+def drawdown_stats(prices: np.ndarray) -> Dict[str, Any]:
+    """最大回撤及回撤持续时间（以交易日计）"""
+    prices = np.asarray(prices, dtype=np.float64)
+    running_max = np.maximum.accumulate(prices)
+    drawdown = prices / running_max - 1.0
+    
+    trough = int(np.argmin(drawdown))
+    peak = int(np.argmax(prices[:trough + 1])) if trough > 0 else 0
+    
+    # 回撤持续时间：每个交易日距离上一次创新高的天数
+    is_peak = drawdown >= 0
+    index = np.arange(len(prices))
+    last_peak = np.maximum.accumulate(np.where(is_peak, index, 0))
+    underwater = index - last_peak
+    
+    return {
+        "max_drawdown": float(drawdown[trough]),
+        "max_drawdown_peak_index": peak,
+        "max_drawdown_trough_index": trough,
+        "max_drawdown_duration": int(underwater.max()) if len(underwater) else 0,
+        "current_drawdown": float(drawdown[-1]),
+        "current_drawdown_duration": int(underwater[-1]) if len(underwater) else 0
+    }
+
+def value_at_risk(returns: np.ndarray, confidence_levels: Sequence[float] = (0.95, 0.99)) -> Dict[str, Dict[str, float]]:
+    """单日VaR与CVaR（历史模拟法与参数法），以正数表示损失比例"""
+    returns = np.asarray(returns, dtype=np.float64)
+    mean = returns.mean()
+    std = returns.std(ddof=1)
+    normal = NormalDist()
+    
+    levels = np.asarray(confidence_levels, dtype=np.float64)
+    quantiles = np.quantile(returns, 1.0 - levels)
+    
+    result = {}
+    for level, quantile in zip(levels, quantiles):
+        tail = returns[returns <= quantile]
+        z = normal.inv_cdf(1.0 - level)
+        key = f"{level:.0%}"
+        result[key] = {
+            "historical_var": float(-quantile),
+            "historical_cvar": float(-tail.mean()) if len(tail) else float(-quantile),
+            "parametric_var": float(-(mean + z * std)),
+            # 正态分布下的期望损失: -(μ - σ·φ(z)/(1-c))
+            "parametric_cvar": float(-(mean - std * normal.pdf(z) / (1.0 - level)))
+        }
+    return result
+
+def compute_risk_metrics(prices: np.ndarray, benchmark_prices: Optional[np.ndarray] = None,
+                         risk_free_rate: float = 0.0, confidence_levels: Sequence[float] = (0.95, 0.99),
+                         periods_per_year: int = TRADING_DAYS_PER_YEAR) -> Dict[str, Any]:
+    """一次性计算个股的全部风险指标
+    
+    个股与基准共用一个有效数据掩码：任一方为NaN的交易日同时剔除，两者的收益率始终按同一组交易日计算。
+    
+    Args:
+        prices: 收盘价序列（按日期升序）
+        benchmark_prices: 与prices日期对齐的基准指数收盘价，用于计算Beta和信息比率
+        risk_free_rate: 年化无风险利率
+        confidence_levels: VaR/CVaR置信水平
+        periods_per_year: 年化周期数
+    
+    Returns:
+        风险指标字典（收益率、波动率、VaR、CVaR、回撤、夏普、索提诺，以及可选的Beta/信息比率）。
+        回撤的峰值、谷值序号指向传入的原始序列；notes 说明未计算Beta等基准指标的原因。
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    mask = ~np.isnan(prices)
+    notes = []
+    if benchmark_prices is not None:
+        benchmark_prices = np.asarray(benchmark_prices, dtype=np.float64)
+        if len(benchmark_prices) != len(prices):
+            notes.append(f"基准价格序列长度 {len(benchmark_prices)} 与个股 {len(prices)} 不一致，未计算Beta和信息比率")
+            benchmark_prices = None
+        elif np.count_nonzero(mask & ~np.isnan(benchmark_prices)) < 3:
+            notes.append("基准与个股的共同有效交易日不足3个，未计算Beta和信息比率")
+            benchmark_prices = None
+        else:
+            mask &= ~np.isnan(benchmark_prices)
+    
+    valid_index = np.flatnonzero(mask)
+    if len(valid_index) < 3:
+        raise ValueError("价格序列过短，至少需要3个有效数据点")
+    prices = prices[mask]
+    
+    returns = simple_returns(prices)
+    mean = returns.mean()
+    std = returns.std(ddof=1)
+    downside = returns[returns < 0]
+    downside_std = np.sqrt(np.mean(np.square(downside))) if len(downside) else 0.0
+    daily_rf = risk_free_rate / periods_per_year
+    sqrt_periods = np.sqrt(periods_per_year)
+    
+    metrics = {
+        "observations": int(len(returns)),
+        "total_return": float(prices[-1] / prices[0] - 1.0),
+        "annual_return": float((prices[-1] / prices[0]) ** (periods_per_year / len(returns)) - 1.0),
+        "annual_volatility": float(std * sqrt_periods),
+        "sharpe_ratio": float((mean - daily_rf) / std * sqrt_periods) if std > 0 else None,
+        "sortino_ratio": float((mean - daily_rf) / downside_std * sqrt_periods) if downside_std > 0 else None,
+        "skewness": float(np.mean(((returns - mean) / std) ** 3)) if std > 0 else None,
+        "var": value_at_risk(returns, confidence_levels)
+    }
+    metrics.update(drawdown_stats(prices))
+    # 回撤序号换算回原始序列的位置，调用方可直接用原始日期序列取日期
+    metrics["max_drawdown_peak_index"] = int(valid_index[metrics["max_drawdown_peak_index"]])
+    metrics["max_drawdown_trough_index"] = int(valid_index[metrics["max_drawdown_trough_index"]])
+    
+    if benchmark_prices is not None:
+        benchmark_returns = simple_returns(benchmark_prices[mask])
+        covariance = np.cov(returns, benchmark_returns, ddof=1)
+        active = returns - benchmark_returns
+        tracking_error = active.std(ddof=1)
+        if covariance[1, 1] <= 0:
+            notes.append("基准价格在区间内没有波动，未计算Beta和相关系数")
+        metrics.update({
+            "beta": float(covariance[0, 1] / covariance[1, 1]) if covariance[1, 1] > 0 else None,
+            "correlation": float(np.corrcoef(returns, benchmark_returns)[0, 1]) if covariance[1, 1] > 0 and std > 0 else None,
+            "tracking_error": float(tracking_error * sqrt_periods),
+            "information_ratio": float(active.mean() / tracking_error * sqrt_periods) if tracking_error > 0 else None
+        })
+    
+    metrics["notes"] = notes
+    return metrics
+
+def round_metrics(value: Any, digits: int = 4) -> Any:
+    """递归保留小数位，便于以紧凑形式提供给智能体"""
+    if isinstance(value, float):
+        return round(value, digits)
+    if isinstance(value, dict):
+        return {key: round_metrics(item, digits) for key, item in value.items()}
+    if isinstance(value, list):
+        return [round_metrics(item, digits) for item in value]
+    return value
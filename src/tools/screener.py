@@ -0,0 +1,173 @@
+# 全市场量化初筛
+
+import time
+import warnings
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional
+import numpy as np
+import pandas as pd
+from .risk_metrics import TRADING_DAYS_PER_YEAR
+from ..monitoring.logs import get_logger
+
+logger = get_logger("team")
+
+# 行情因子：由本地行情库计算，window为使用的K线根数
+PRICE_FACTORS = ("momentum", "volatility", "liquidity")
+
+DEFAULT_SCREEN = {
+    "lookback_bars": 61,  # 每只股票读取的K线根数，需覆盖各因子的最大窗口+1
+    "max_stale_days": 7,  # 最后一根K线比全市场最新日期早超过该自然日天数的股票（停牌、未同步）不参与
+    "top_n": 10,
+    "valuation_file": "",  # 可选：估值CSV，需含ts_code列，其余数值列（如pe、pb、total_mv）可用于筛选和打分
+    "filters": {},
+    "weights": {"momentum": 1.0, "volatility": -0.5, "liquidity": 0.5}
+}
+
+def load_panel(price_store: Any, codes: List[str], bars: int) -> Dict[str, Any]:
+    """读取各股票最近bars根K线，按日期对齐为 股票数×bars 的收盘价和成交额矩阵
+    
+    列为全市场最近bars个有K线的日期（右对齐），停牌、未同步等缺失的日期为NaN，
+    保证同一列在所有股票上是同一个交易日。
+    """
+    tails = [price_store.tail(ts_code, bars, ("date", "close", "amount")) for ts_code in codes]
+    known = [tail["date"] for tail in tails if len(tail["date"])]
+    dates = np.unique(np.concatenate(known))[-bars:] if known else np.empty(0, dtype=np.int64)
+    offset = bars - len(dates)
+    
+    close = np.full((len(codes), bars), np.nan)
+    amount = np.full((len(codes), bars), np.nan)
+    last_dates = np.zeros(len(codes), dtype=np.int64)
+    for index, tail in enumerate(tails):
+        if not len(tail["date"]):
+            continue
+        keep = tail["date"] >= dates[0]
+        positions = offset + np.searchsorted(dates, tail["date"][keep])
+        close[index, positions] = tail["close"][keep]
+        amount[index, positions] = tail["amount"][keep]
+        last_dates[index] = tail["last_date"] or 0
+    return {"codes": codes, "dates": dates, "close": close, "amount": amount, "last_dates": last_dates}
+
+def price_factors(close: np.ndarray, amount: np.ndarray, windows: Dict[str, int]) -> Dict[str, np.ndarray]:
+    """向量化计算行情因子
+    
+    momentum: 窗口收益率，窗口首尾任一天缺失时为NaN；volatility: 日对数收益率的年化标准差；
+    liquidity: 日均成交额。后两项跳过窗口内停牌的日期，整个窗口都缺失时为NaN。
+    """
+    factors = {}
+    with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+        # 全部缺失的行由nanstd/nanmean返回NaN，不需要逐行告警
+        warnings.simplefilter('ignore', RuntimeWarning)
+        window = windows["momentum"]
+        factors["momentum"] = close[:, -1] / close[:, -1 - window] - 1.0
+        
+        window = windows["volatility"]
+        returns = np.diff(np.log(close[:, -1 - window:]), axis=1)
+        factors["volatility"] = np.nanstd(returns, axis=1, ddof=1) * np.sqrt(TRADING_DAYS_PER_YEAR)
+        
+        window = windows["liquidity"]
+        factors["liquidity"] = np.nanmean(amount[:, -window:], axis=1)
+    return factors
+
+def percentile_rank(values: np.ndarray) -> np.ndarray:
+    """截面百分位排名（0~1），用于合成不同量纲的因子"""
+    if len(values) < 2:
+        return np.full(len(values), 0.5)
+    return np.argsort(np.argsort(values, kind='stable'), kind='stable') / (len(values) - 1)
+
+class UniverseScreener:
+    """全市场量化初筛
+    
+    在本地列式行情库上一次性读取全部股票的最近K线，向量化计算动量、波动率、流动性因子，
+    结合可选的估值数据按配置的区间过滤，再按因子百分位排名加权打分，只把得分最高的top_n
+    只股票交给智能体团队。全程不调用模型和MCP工具，数千只股票在数秒内完成。
+    filters中每项为 {min, max}，行情因子另可指定window；weights为各因子的打分权重（负数表示越小越好）。
+    """
+    
+    def __init__(self, price_store: Any, screen_config: Optional[Dict[str, Any]] = None):
+        self.price_store = price_store
+        screen_config = screen_config or {}
+        self.config = {**DEFAULT_SCREEN, **screen_config}
+        self.filters = self.config["filters"] or {}
+        self.weights = self.config["weights"] or {}
+    
+    def _load_valuation(self, codes: List[str]) -> Dict[str, np.ndarray]:
+        """按股票顺序对齐估值数据的数值列，缺失为NaN"""
+        path = self.config.get("valuation_file")
+        if not path:
+            return {}
+        frame = pd.read_csv(path, dtype={"ts_code": str})
+        frame["ts_code"] = frame["ts_code"].str.upper()
+        frame = frame.drop_duplicates("ts_code", keep="last").set_index("ts_code").reindex(codes)
+        return {column: frame[column].to_numpy(dtype=np.float64)
+                for column in frame.columns if pd.api.types.is_numeric_dtype(frame[column])}
+    
+    def screen(self, codes: Optional[List[str]] = None, top_n: Optional[int] = None) -> Dict[str, Any]:
+        """运行初筛
+        
+        Returns:
+            candidates（按得分降序，含各因子取值）、各步骤剩余股票数和耗时
+        """
+        start = time.perf_counter()
+        codes = self.price_store.codes() if codes is None else codes
+        top_n = top_n or self.config["top_n"]
+        windows = {name: (self.filters.get(name) or {}).get("window", 20) for name in PRICE_FACTORS}
+        bars = max(self.config["lookback_bars"], max(windows.values()) + 1)
+        
+        panel = load_panel(self.price_store, codes, bars)
+        load_seconds = time.perf_counter() - start
+        factors = price_factors(panel["close"], panel["amount"], windows)
+        factors.update(self._load_valuation(codes))
+        
+        # 逐项过滤，记录每一步后剩余的股票数
+        mask = panel["last_dates"] > 0
+        steps = [("行情数据", int(mask.sum()))]
+        if mask.any():
+            newest = datetime.strptime(str(panel["last_dates"][mask].max()), '%Y%m%d')
+            cutoff = int((newest - timedelta(days=self.config["max_stale_days"])).strftime('%Y%m%d'))
+            mask &= panel["last_dates"] >= cutoff
+            steps.append(("最新交易", int(mask.sum())))
+        
+        with np.errstate(invalid='ignore'):
+            for name, bounds in self.filters.items():
+                values = factors.get(name)
+                if values is None:
+                    logger.warning(f"⚠️ 初筛条件 {name} 没有对应的数据，已忽略")
+                    continue
+                bounds = bounds or {}
+                mask &= ~np.isnan(values)
+                if bounds.get("min") is not None:
+                    mask &= values >= bounds["min"]
+                if bounds.get("max") is not None:
+                    mask &= values <= bounds["max"]
+                steps.append((name, int(mask.sum())))
+        
+        # 在通过过滤的股票中按因子百分位加权打分，打分因子缺失的股票不参与排名
+        selected = np.flatnonzero(mask)
+        weights = {name: weight for name, weight in self.weights.items() if weight and name in factors}
+        for name in weights:
+            selected = selected[~np.isnan(factors[name][selected])]
+        scores = np.zeros(len(selected))
+        for name, weight in weights.items():
+            scores += weight * percentile_rank(factors[name][selected])
+        order = selected[np.argsort(-scores, kind='stable')][:top_n]
+        score_of = dict(zip(selected.tolist(), scores.tolist()))
+        
+        candidates = []
+        for index in order:
+            candidate = {"ts_code": codes[index], "score": round(score_of[index], 4)}
+            for name, values in factors.items():
+                value = values[index]
+                candidate[name] = None if np.isnan(value) else round(float(value), 4)
+            candidates.append(candidate)
+        
+        elapsed = time.perf_counter() - start
+        logger.info(f"🔎 初筛完成: {len(codes)} 只股票 -> {len(candidates)} 只候选，"
+                    f"耗时 {elapsed:.2f}s（读取行情 {load_seconds:.2f}s）")
+        return {
+            "universe": len(codes),
+            "steps": [{"step": name, "remaining": remaining} for name, remaining in steps],
+            "candidates": candidates,
+            "elapsed_seconds": round(elapsed, 3),
+            "load_seconds": round(load_seconds, 3),
+            "timestamp": datetime.now().isoformat()
+        }
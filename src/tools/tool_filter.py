@@ -0,0 +1,60 @@
+# 智能体工具筛选
+
+import json
+from fnmatch import fnmatchcase
+from typing import Dict, List, Any, Optional
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的token数（ASCII约4字符1个token，中文等非ASCII字符约1字符1个token）"""
+    if not text:
+        return 0
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    ascii_count = len(text) - non_ascii
+    return ascii_count // 4 + non_ascii
+
+def tool_schema_tokens(tool: Any) -> int:
+    """估算单个工具随每次模型调用发送的schema的token数"""
+    try:
+        schema = convert_to_openai_tool(tool)
+    except Exception:
+        schema = {"name": getattr(tool, 'name', ''), "description": getattr(tool, 'description', '')}
+    return estimate_tokens(json.dumps(schema, ensure_ascii=False))
+
+def _matches(name: str, patterns: List[str]) -> bool:
+    """工具名是否匹配任一通配符模式（如 money_*、*_data）"""
+    return any(fnmatchcase(name, pattern) for pattern in patterns)
+
+def filter_tools(tools: List[Any], allow: Optional[List[str]] = None, deny: Optional[List[str]] = None) -> List[Any]:
+    """按允许/禁止列表筛选工具
+    
+    Args:
+        tools: 全部工具
+        allow: 允许的工具名模式，为空表示允许全部
+        deny: 禁止的工具名模式，优先级高于allow
+    """
+    allow = allow or []
+    deny = deny or []
+    
+    selected = []
+    for tool in tools:
+        if allow and not _matches(tool.name, allow):
+            continue
+        if deny and _matches(tool.name, deny):
+            continue
+        selected.append(tool)
+    return selected
+
+def tool_savings_report(all_tools: List[Any], selected_tools: List[Any]) -> Dict[str, Any]:
+    """统计工具筛选前后每次模型调用携带的schema token数"""
+    full_tokens = sum(tool_schema_tokens(tool) for tool in all_tools)
+    selected_tokens = sum(tool_schema_tokens(tool) for tool in selected_tools)
+    
+    return {
+        "total_tools": len(all_tools),
+        "selected_tools": len(selected_tools),
+        "full_schema_tokens": full_tokens,
+        "selected_schema_tokens": selected_tokens,
+        "saved_tokens_per_call": full_tokens - selected_tokens,
+        "saved_ratio": round((full_tokens - selected_tokens) / full_tokens, 4) if full_tokens else 0.0
+    }
@@ -5,8 +5,9 @@ import asyncio
 import json
 import time
 import yaml
+import math
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Callable
 import sys
 import os
 
@@ -14,6 +15,8 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from src.agents.team_manager import AgentTeamManager
+from src.agents.run_coordinator import RunCoordinator
+from src.monitoring.logs import setup_logging
 
 def load_config():
     """加载配置文件"""
@@ -119,6 +122,8 @@ def init_session_state():
         st.session_state.final_decisions = []
     if 'current_stock' not in st.session_state:
         st.session_state.current_stock = ""
+    if 'html_cache' not in st.session_state:
+        st.session_state.html_cache = {}
 
 def display_agent_card(agent_info: Dict[str, Any]):
     """显示智能体信息卡片"""
@@ -138,28 +143,43 @@ def display_agent_card(agent_info: Dict[str, Any]):
     </div>
     """, unsafe_allow_html=True)
 
-def display_chat_message(message: Dict[str, Any], show_tools: bool = True):
-    """显示聊天消息"""
+def _format_time(timestamp: str) -> str:
+    """格式化时间戳"""
+    if not timestamp:
+        return ''
+    try:
+        dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+        return dt.strftime('%H:%M:%S')
+    except:
+        return timestamp
+
+def _cached_fragment(key: tuple, build: Callable[[], str]) -> str:
+    """按消息缓存已格式化的HTML片段，未变化的消息不再重复格式化"""
+    cache = st.session_state.html_cache
+    fragment = cache.get(key)
+    if fragment is None:
+        fragment = build()
+        cache[key] = fragment
+    return fragment
+
+def _drop_cached_fragments(predicate: Callable[[tuple], bool]):
+    """删除被新结果替换的消息的缓存片段，避免重复辩论、决策时缓存不断增长"""
+    cache = st.session_state.html_cache
+    for key in [key for key in cache if predicate(key)]:
+        del cache[key]
+
+def _build_chat_message_html(message: Dict[str, Any], show_tools: bool) -> str:
+    """生成聊天消息的HTML片段（含工具调用）"""
     agent_name = message.get('agent_name', '系统')
     role = message.get('role', '')
     content = message.get('analysis', message.get('response', message.get('decision', '')))
-    timestamp = message.get('timestamp', '')
     tool_calls = message.get('tool_calls', [])
     
     avatar = AGENT_AVATARS.get(agent_name, "🤖")
     color_class = AGENT_COLORS.get(role, "")
+    time_str = _format_time(message.get('timestamp', ''))
     
-    # 格式化时间戳
-    if timestamp:
-        try:
-            dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-            time_str = dt.strftime('%H:%M:%S')
-        except:
-            time_str = timestamp
-    else:
-        time_str = ''
-    
-    st.markdown(f"""
+    html = f"""
     <div class="chat-message {color_class}">
         <div style="display: flex; align-items: center; margin-bottom: 0.5rem;">
             <span style="font-size: 1.2rem; margin-right: 0.5rem;">{avatar}</span>
@@ -169,40 +189,43 @@ def display_chat_message(message: Dict[str, Any], show_tools: bool = True):
         </div>
         <div>{content}</div>
     </div>
-    """, unsafe_allow_html=True)
+    """
     
-    # 显示工具调用
+    # 工具调用参数只在首次格式化时序列化
     if show_tools and tool_calls:
         for tool_call in tool_calls:
             tool_name = tool_call.get('tool', '未知工具')
             tool_args = tool_call.get('args', {})
-            st.markdown(f"""
+            html += f"""
             <div class="tool-call">
                 🔧 调用工具: <strong>{tool_name}</strong><br>
                 📝 参数: {json.dumps(tool_args, ensure_ascii=False, indent=2)}
             </div>
-            """, unsafe_allow_html=True)
+            """
+    return html
 
-def display_decision_card(decision: Dict[str, Any]):
-    """显示决策卡片"""
+def display_chat_message(message: Dict[str, Any], show_tools: bool = True):
+    """显示聊天消息"""
+    key = (
+        "chat",
+        message.get('agent_name', ''),
+        message.get('round', 0),
+        message.get('timestamp', ''),
+        show_tools
+    )
+    html = _cached_fragment(key, lambda: _build_chat_message_html(message, show_tools))
+    st.markdown(html, unsafe_allow_html=True)
+
+def _build_decision_card_html(decision: Dict[str, Any]) -> str:
+    """生成决策卡片的HTML片段"""
     agent_name = decision.get('agent_name', '未知')
     role = decision.get('role', '')
     decision_content = decision.get('decision', '')
-    timestamp = decision.get('timestamp', '')
     
     avatar = AGENT_AVATARS.get(agent_name, "🤖")
+    time_str = _format_time(decision.get('timestamp', ''))
     
-    # 格式化时间戳
-    if timestamp:
-        try:
-            dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-            time_str = dt.strftime('%H:%M:%S')
-        except:
-            time_str = timestamp
-    else:
-        time_str = ''
-    
-    st.markdown(f"""
+    return f"""
     <div class="decision-card">
         <div style="display: flex; align-items: center; margin-bottom: 0.5rem;">
             <span style="font-size: 1.2rem; margin-right: 0.5rem;">{avatar}</span>
@@ -213,7 +236,42 @@ def display_decision_card(decision: Dict[str, Any]):
         <div><strong>最终决策:</strong></div>
         <div>{decision_content}</div>
     </div>
-    """, unsafe_allow_html=True)
+    """
+
+def display_decision_card(decision: Dict[str, Any]):
+    """显示决策卡片"""
+    key = ("decision", decision.get('agent_name', ''), decision.get('timestamp', ''))
+    html = _cached_fragment(key, lambda: _build_decision_card_html(decision))
+    st.markdown(html, unsafe_allow_html=True)
+
+def paginate(items: List[Any], page_size: int, key: str, label: str = "页码") -> List[Any]:
+    """分页显示列表，返回当前页的元素"""
+    page_size = max(1, int(page_size))
+    total_pages = max(1, math.ceil(len(items) / page_size))
+    if total_pages == 1:
+        return items
+    
+    # 列表变短（如换了一只股票）后，会话中保存的页码可能超出新的页数
+    stored = st.session_state.get(key)
+    if stored is not None and not 1 <= stored <= total_pages:
+        st.session_state[key] = min(max(1, int(stored)), total_pages)
+    
+    page = st.number_input(
+        f"{label} (共 {total_pages} 页)",
+        min_value=1,
+        max_value=total_pages,
+        value=1,
+        step=1,
+        key=key
+    )
+    start = (int(page) - 1) * page_size
+    return items[start:start + page_size]
+
+def lazy_section(label: str, key: str, render: Callable[[], None], expanded: bool = False):
+    """可折叠区块，只有展开时才渲染其内容"""
+    if st.toggle(label, value=expanded, key=key):
+        with st.container():
+            render()
 
 async def initialize_team():
     """初始化智能体团队"""
@@ -228,10 +286,67 @@ async def initialize_team():
         st.error(f"团队初始化失败: {e}")
         return False
 
+@st.cache_resource
+def get_coordinator() -> RunCoordinator:
+    """进程内所有会话共享的智能体团队和运行协调器，相同股票的并发请求只运行一次"""
+    freshness_seconds = (load_config().get('coalescing') or {}).get('freshness_seconds', 300)
+    coordinator = RunCoordinator(AgentTeamManager("config.yaml"), freshness_seconds)
+    coordinator.start()
+    return coordinator
+
+PROGRESS_LABELS = {
+    "queued": "⏳ 排队等待其他股票的运行完成",
+    "started": "🚀 开始运行",
+    "analysis": "📊 分析中",
+    "pipeline": "📊 分析与辩论进行中",
+    "debate": "🗣️ 辩论中",
+    "decision": "🎯 决策中",
+    "done": "✅ 决策完成",
+    "finished": "🗂️ 结果已保存",
+    "error": "❌ 运行失败"
+}
+
+def _format_progress(event: Dict[str, Any]) -> str:
+    label = PROGRESS_LABELS.get(event.get("stage"), event.get("stage", ""))
+    if "analyses" not in event:
+        return label
+    return (f"{label}：分析 {event['analyses']} 份，辩论发言 {event['debate_posts']} 条，"
+            f"决策 {event['decisions']} 份")
+
+def run_shared(stock_code: str):
+    """通过共享团队完整运行（分析+辩论+决策），实时显示进度"""
+    try:
+        coordinator = get_coordinator()
+        flight, joined = coordinator.submit(stock_code)
+        if joined:
+            st.info(f"已有相同的 {stock_code} 运行，直接共享其进度和结果")
+        
+        with st.status(f"正在分析股票 {stock_code}...", expanded=True) as status:
+            cursor = 0
+            while True:
+                events = flight.events_since(cursor, timeout=1.0)
+                for event in events:
+                    status.write(_format_progress(event))
+                cursor += len(events)
+                if flight.done() and cursor >= len(flight.events):
+                    break
+            result = flight.result()
+            status.update(label=f"股票 {stock_code} 分析完成", state="complete")
+        
+        st.session_state.analysis_results = result.get('analysis_results', [])
+        st.session_state.debate_history = result.get('debate_history', [])
+        st.session_state.final_decisions = result.get('final_decisions', [])
+        st.session_state.current_stock = stock_code
+        st.session_state.html_cache = {}
+        # 共享团队运行在协调器线程上，本会话只展示结果；分步按钮仍需先初始化本会话的团队
+    
+    except Exception as e:
+        st.error(f"分析失败: {e}")
+
 async def analyze_stock(stock_code: str):
     """分析股票"""
     try:
-        if not st.session_state.team_initialized:
+        if not st.session_state.team_initialized or st.session_state.team_manager is None:
             st.error("请先初始化团队")
             return
         
@@ -240,6 +355,7 @@ async def analyze_stock(stock_code: str):
         st.session_state.debate_history = []
         st.session_state.final_decisions = []
         st.session_state.current_stock = stock_code
+        st.session_state.html_cache = {}
         
         # 执行分析
         with st.spinner(f"正在分析股票 {stock_code}..."):
@@ -247,7 +363,7 @@ async def analyze_stock(stock_code: str):
             st.session_state.analysis_results = result.get('analysis_results', [])
         
         st.success(f"股票 {stock_code} 分析完成！")
-        
+    
     except Exception as e:
         st.error(f"分析失败: {e}")
 
@@ -263,9 +379,11 @@ async def conduct_debate(stock_code: str):
                 stock_code, st.session_state.analysis_results
             )
             st.session_state.debate_history = debate_results
+            # 分析消息没有轮次（为0），旧的辩论发言随新的辩论一起失效
+            _drop_cached_fragments(lambda key: key[0] == "chat" and key[2] != 0)
         
         st.success("团队辩论完成！")
-        
+    
     except Exception as e:
         st.error(f"辩论失败: {e}")
 
@@ -279,9 +397,10 @@ async def make_decisions(stock_code: str):
         with st.spinner(f"正在做出最终决策..."):
             decisions = await st.session_state.team_manager.make_final_decisions(stock_code)
             st.session_state.final_decisions = decisions
+            _drop_cached_fragments(lambda key: key[0] == "decision")
         
         st.success("最终决策完成！")
-        
+    
     except Exception as e:
         st.error(f"决策失败: {e}")
 
@@ -291,6 +410,8 @@ def main():
     
     # 加载配置
     config = load_config()
+    # Streamlit每次交互都会重新执行脚本，日志只在进程内第一次执行时配置
+    setup_logging(config.get('logging'))
     ui_config = config.get('ui', {})
     
     # 使用配置中的标题
@@ -324,7 +445,8 @@ def main():
         # 分析按钮
         col1, col2 = st.columns(2)
         with col1:
-            if st.button("🔍 开始分析", disabled=not st.session_state.team_initialized):
+            if st.button("🔍 开始分析", disabled=not st.session_state.team_initialized
+                         or st.session_state.team_manager is None):
                 if stock_code:
                     asyncio.run(analyze_stock(stock_code))
                     st.rerun()
@@ -332,15 +454,25 @@ def main():
                     st.error("请输入股票代码")
         
         with col2:
-            if st.button("🗣️ 开始辩论", disabled=not bool(st.session_state.analysis_results)):
+            if st.button("🗣️ 开始辩论", disabled=not bool(st.session_state.analysis_results)
+                         or st.session_state.team_manager is None):
                 asyncio.run(conduct_debate(st.session_state.current_stock))
                 st.rerun()
         
         # 决策按钮
-        if st.button("🎯 最终决策", disabled=not bool(st.session_state.debate_history)):
+        if st.button("🎯 最终决策", disabled=not bool(st.session_state.debate_history)
+                     or st.session_state.team_manager is None):
             asyncio.run(make_decisions(st.session_state.current_stock))
             st.rerun()
         
+        # 一键完整分析：所有会话共享同一团队，同时请求同一股票只运行一次
+        if st.button("⚡ 一键完整分析（多会话共享）"):
+            if stock_code:
+                run_shared(stock_code)
+                st.rerun()
+            else:
+                st.error("请输入股票代码")
+        
         st.markdown("---")
         
         # 导出结果
@@ -356,8 +488,8 @@ def main():
         show_tool_calls = st.checkbox("显示工具调用", value=True)
         auto_scroll = st.checkbox("自动滚动", value=True)
     
-    # 主内容区域
-    if st.session_state.team_initialized:
+    # 主内容区域：本会话初始化了团队，或已有共享运行的结果
+    if st.session_state.team_initialized or st.session_state.analysis_results:
         # 显示团队状态
         if st.session_state.team_manager:
             team_status = st.session_state.team_manager.get_team_status()
@@ -384,17 +516,31 @@ def main():
                 with cols[i]:
                     display_agent_card(agent_info)
         
+        # 分页与折叠设置
+        agents_per_page = ui_config.get('agents_per_page', 5)
+        rounds_per_page = ui_config.get('rounds_per_page', 3)
+        expand_messages = not ui_config.get('collapse_messages', True)
+        
         # 分析结果
         if st.session_state.analysis_results:
             st.header(f"📊 分析结果 - {st.session_state.current_stock}")
             
-            for result in st.session_state.analysis_results:
+            page_results = paginate(
+                st.session_state.analysis_results, agents_per_page, "analysis_page", "分析结果页码"
+            )
+            for i, result in enumerate(page_results):
+                agent_name = result.get('agent_name', result.get('agent_key', '未知智能体'))
                 if 'error' not in result:
-                    display_chat_message(result, show_tool_calls)
+                    lazy_section(
+                        f"{AGENT_AVATARS.get(agent_name, '🤖')} {agent_name} ({result.get('role', '')})",
+                        f"analysis_toggle_{agent_name}_{i}",
+                        lambda r=result: display_chat_message(r, show_tool_calls),
+                        expanded=expand_messages
+                    )
                 else:
                     st.markdown(f"""
                     <div class="error-message">
-                        ❌ {result.get('agent_name', '未知智能体')} 分析失败: {result.get('error', '未知错误')}
+                        ❌ {agent_name} 分析失败: {result.get('error', '未知错误')}
                     </div>
                     """, unsafe_allow_html=True)
         
@@ -402,30 +548,53 @@ def main():
         if st.session_state.debate_history:
             st.header("🗣️ 团队辩论")
             
+            # 按智能体筛选
+            agent_names = list(dict.fromkeys(
+                d.get('agent_name', '未知') for d in st.session_state.debate_history
+            ))
+            selected_agents = st.multiselect(
+                "筛选智能体", agent_names, default=agent_names, key="debate_agent_filter"
+            )
+            
             # 按轮次分组显示
             rounds = {}
             for debate in st.session_state.debate_history:
+                if debate.get('agent_name', '未知') not in selected_agents:
+                    continue
                 round_num = debate.get('round', 1)
                 if round_num not in rounds:
                     rounds[round_num] = []
                 rounds[round_num].append(debate)
             
-            for round_num in sorted(rounds.keys()):
+            page_rounds = paginate(sorted(rounds.keys()), rounds_per_page, "debate_page", "辩论轮次页码")
+            for round_num in page_rounds:
                 st.subheader(f"第 {round_num} 轮辩论")
                 for debate in rounds[round_num]:
-                    display_chat_message(debate, show_tool_calls)
+                    agent_name = debate.get('agent_name', '未知')
+                    lazy_section(
+                        f"{AGENT_AVATARS.get(agent_name, '🤖')} {agent_name} ({debate.get('role', '')})",
+                        f"debate_toggle_{round_num}_{agent_name}",
+                        lambda d=debate: display_chat_message(d, show_tool_calls),
+                        expanded=expand_messages
+                    )
         
         # 最终决策
         if st.session_state.final_decisions:
             st.header("🎯 最终投资决策")
             
-            for decision in st.session_state.final_decisions:
+            for i, decision in enumerate(st.session_state.final_decisions):
+                agent_name = decision.get('agent_name', '未知智能体')
                 if 'error' not in decision:
-                    display_decision_card(decision)
+                    lazy_section(
+                        f"{AGENT_AVATARS.get(agent_name, '🤖')} {agent_name} 的最终决策",
+                        f"decision_toggle_{agent_name}_{i}",
+                        lambda d=decision: display_decision_card(d),
+                        expanded=expand_messages
+                    )
                 else:
                     st.markdown(f"""
                     <div class="error-message">
-                        ❌ {decision.get('agent_name', '未知智能体')} 决策失败: {decision.get('error', '未知错误')}
+                        ❌ {agent_name} 决策失败: {decision.get('error', '未知错误')}
                     </div>
                     """, unsafe_allow_html=True)
     
@@ -0,0 +1,64 @@
+# MCP工具层测试
+
+import asyncio
+from types import SimpleNamespace
+from typing import Dict, Any, Optional
+
+import httpx
+from langchain_core.messages import ToolMessage
+from langchain_core.tools import StructuredTool
+
+from src.agents.agent_memory import AgentMemory
+from src.agents.base_agent import BaseAgent
+from src.tools.circuit_breaker import CircuitBreaker
+from src.tools.mcp_layer import MCPToolLayer
+from src.tools.replica_pool import ReplicaPool
+
+def make_layer(error: Exception, server_config: Optional[Dict[str, Any]] = None, delay: float = 0) -> MCPToolLayer:
+    """只有一个副本、工具总是抛出error的工具层"""
+    async def _fail(stock_code: str):
+        await asyncio.sleep(delay)
+        raise error
+    
+    raw = StructuredTool.from_function(coroutine=_fail, name="stock_data", description="行情数据")
+    raw.handle_tool_error = False
+    layer = MCPToolLayer({"servers": {"finance": server_config or {}}},
+                         {"timeout": 30, "circuit_breaker": {"failure_threshold": 3}})
+    layer.raw_tools = {"stock_data": raw}
+    layer.tool_servers = {"stock_data": "finance"}
+    layer.replica_tools = {("finance", "stock_data"): raw}
+    layer.pools = {"finance": ReplicaPool("finance", ["finance"], 0)}
+    layer.tool_breakers = {"stock_data": CircuitBreaker("stock_data", 3, 60)}
+    layer.server_breakers = {"finance": CircuitBreaker("finance", 5, 60)}
+    layer.tools = [layer._wrap_tool(raw)]
+    return layer
+
+def invoke(tool: StructuredTool) -> ToolMessage:
+    call = {"type": "tool_call", "name": tool.name, "args": {"stock_code": "000001"}, "id": "call-1"}
+    return asyncio.run(tool.ainvoke(call))
+
+def test_transport_error_returns_tool_message_on_first_failure():
+    layer = make_layer(httpx.ConnectError("connection refused"))
+    message = invoke(layer.tools[0])
+    assert isinstance(message, ToolMessage)
+    assert "调用失败" in message.content
+    assert layer.error_count == 1
+    assert layer.server_breakers["finance"].consecutive_failures == 1
+
+def test_tool_error_through_memory_wrapper_is_graceful():
+    layer = make_layer(ValueError("参数错误"))
+    agent = SimpleNamespace(name="测试", memory=AgentMemory())
+    tool = BaseAgent._wrap_with_memory(agent, layer.tools[0])
+    message = invoke(tool)
+    assert isinstance(message, ToolMessage)
+    assert "参数错误" in message.content
+    # 工具自身的错误不计入服务器
+    assert layer.server_breakers["finance"].consecutive_failures == 0
+    assert agent.memory.lookup("stock_data", {"stock_code": "000001"}) is None
+
+def test_server_timeout_overrides_tools_config():
+    layer = make_layer(ValueError("不应到达"), {"timeout": 0.05}, delay=1)
+    assert make_layer(ValueError()).server_timeout("finance") == 30
+    message = invoke(layer.tools[0])
+    assert "调用超时（0.05秒）" in message.content
+    assert layer.server_breakers["finance"].consecutive_failures == 1
@@ -0,0 +1,37 @@
+# 工具输出压缩测试
+
+import json
+
+from src.tools.output_compactor import ToolOutputCompactor
+
+def compact(payload) -> str:
+    text = payload if isinstance(payload, str) else json.dumps(payload)
+    return ToolOutputCompactor({"min_chars": 0}).compact("stock_data", text)
+
+def test_json_identifier_columns_stay_strings():
+    records = [{"ts_code": "000001.SZ", "symbol": "000001", "trade_date": f"202501{day:02d}", "close": 10.0 + day}
+               for day in range(1, 21)]
+    output = compact(records)
+    assert "symbol=000001" in output
+    assert "ts_code=000001.SZ" in output
+    assert "变化" in output
+
+def test_markdown_keeps_leading_zero_codes():
+    lines = ["| 代码 | 名称 | 涨跌幅 |", "|---|---|---|"]
+    lines += [f"| 00000{i} | 股票{i} | 1.{i} |" for i in range(1, 9)]
+    output = compact("\n".join(lines))
+    assert "000001|股票1|1.1" in output
+    assert "\n1|" not in output
+
+def test_multi_security_table_has_no_first_last_change():
+    records = [{"ts_code": code, "trade_date": f"202501{day:02d}", "close": 10.0 + day}
+               for day in range(1, 11) for code in ("000001.SZ", "600036.SH")]
+    output = compact(records)
+    assert "含 2 只证券" in output
+    assert "close: min 11 max 20" in output
+    assert "变化" not in output and "首 " not in output
+
+def test_json_strings_are_not_coerced():
+    records = [{"ts_code": "000001.SZ", "trade_date": f"202501{day:02d}", "ann_type": "01", "close": 10.0 + day}
+               for day in range(1, 21)]
+    assert "ann_type=01" in compact(records)
@@ -0,0 +1,41 @@
+# 模型请求限速测试
+
+import asyncio
+
+import pytest
+
+from src.agents.rate_limiter import RequestRateLimiter, shared_rate_limiter
+
+def test_burst_then_throttle():
+    limiter = RequestRateLimiter(60, burst=2)
+    assert limiter.reserve() == 0.0
+    assert limiter.reserve() == 0.0
+    assert limiter.reserve() == pytest.approx(1.0, abs=0.05)
+    # 预约到未来：第四个请求再等一秒
+    assert limiter.reserve() == pytest.approx(2.0, abs=0.05)
+    status = limiter.get_status()
+    assert status["requests_per_minute"] == pytest.approx(60)
+    assert status["throttled"] == 2
+    assert status["waited_seconds"] == pytest.approx(3.0, abs=0.1)
+
+def test_acquire_waits_for_reserved_slot():
+    limiter = RequestRateLimiter(600, burst=1)
+    
+    async def run():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await limiter.acquire()
+        await limiter.acquire()
+        return loop.time() - start
+    
+    assert asyncio.run(run()) >= 0.09
+    assert limiter.get_status()["throttled"] == 1
+
+def test_shared_limiter_per_provider_host():
+    assert shared_rate_limiter(None, "https://a.example/v1") is None
+    assert shared_rate_limiter({"requests_per_minute": 0}, "https://a.example/v1") is None
+    config = {"requests_per_minute": 30, "burst": 3}
+    first = shared_rate_limiter(config, "https://rate-test.example/v1")
+    assert shared_rate_limiter(config, "https://rate-test.example/v2/chat") is first
+    assert shared_rate_limiter(config, "https://other-rate-test.example/v1") is not first
+    assert first.burst == 3
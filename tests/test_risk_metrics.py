@@ -0,0 +1,60 @@
+# 风险指标计算测试
+
+import numpy as np
+import pytest
+
+from src.tools.risk_metrics import compute_risk_metrics, drawdown_stats, value_at_risk
+
+def test_drawdown_indices_and_duration():
+    prices = np.array([10.0, 12.0, 9.0, 11.0, 13.0, 12.0])
+    stats = drawdown_stats(prices)
+    assert stats["max_drawdown"] == pytest.approx(9.0 / 12.0 - 1.0)
+    assert stats["max_drawdown_peak_index"] == 1
+    assert stats["max_drawdown_trough_index"] == 2
+    assert stats["max_drawdown_duration"] == 2
+    assert stats["current_drawdown_duration"] == 1
+
+def test_value_at_risk_is_positive_loss():
+    returns = np.random.default_rng(0).normal(0.0, 0.02, 2000)
+    var = value_at_risk(returns, (0.95,))["95%"]
+    assert var["historical_var"] == pytest.approx(0.033, abs=0.004)
+    assert var["historical_cvar"] > var["historical_var"]
+    assert var["parametric_cvar"] > var["parametric_var"] > 0
+
+def test_drawdown_indices_point_into_unfiltered_series():
+    prices = np.array([np.nan, 10.0, 12.0, np.nan, 9.0, 11.0, 13.0])
+    metrics = compute_risk_metrics(prices)
+    assert metrics["max_drawdown_peak_index"] == 2
+    assert metrics["max_drawdown_trough_index"] == 4
+    assert metrics["observations"] == 4
+    assert "beta" not in metrics
+    assert metrics["notes"] == []
+
+def test_joint_mask_keeps_stock_and_benchmark_aligned():
+    rng = np.random.default_rng(1)
+    benchmark = 100 * np.cumprod(1 + rng.normal(0, 0.01, 60))
+    prices = 10 * (benchmark / 100) ** 2
+    prices[5] = np.nan
+    benchmark[20] = np.nan
+    metrics = compute_risk_metrics(prices, benchmark)
+    # 个股收益率约为基准的两倍；错位时Beta会远离2
+    assert metrics["beta"] == pytest.approx(2.0, abs=0.05)
+    assert metrics["correlation"] > 0.99
+    assert metrics["observations"] == 57
+    assert metrics["notes"] == []
+
+def test_benchmark_length_mismatch_is_reported():
+    prices = np.linspace(10, 12, 30)
+    metrics = compute_risk_metrics(prices, np.linspace(100, 110, 29))
+    assert "beta" not in metrics
+    assert "长度" in metrics["notes"][0]
+
+def test_flat_benchmark_reports_missing_beta():
+    prices = np.array([10.0, 10.5, 10.2, 10.8, 11.0])
+    metrics = compute_risk_metrics(prices, np.full(5, 100.0))
+    assert metrics["beta"] is None
+    assert metrics["notes"]
+
+def test_too_few_valid_points_raises():
+    with pytest.raises(ValueError):
+        compute_risk_metrics(np.array([10.0, np.nan, 11.0]))
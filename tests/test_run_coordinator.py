@@ -0,0 +1,40 @@
+# 运行请求合并测试
+
+import asyncio
+
+import pytest
+
+from src.agents.run_coordinator import RunCoordinator
+from src.monitoring.metrics import QUEUE_DEPTH
+
+class BlockingTeam:
+    """运行一直挂起直到被取消的替身团队"""
+    
+    def __init__(self):
+        self.progress_listeners = []
+    
+    async def initialize_team(self, offline: bool = False):
+        pass
+    
+    async def run_stock(self, stock_code: str, **params):
+        await asyncio.Event().wait()
+    
+    async def close_team(self):
+        pass
+
+def test_cancelled_queued_run_releases_waiters_and_gauge():
+    baseline = QUEUE_DEPTH.value(queue="coordinator")
+    coordinator = RunCoordinator(BlockingTeam())
+    coordinator.start()
+    running, _ = coordinator.submit("000001")
+    queued, _ = coordinator.submit("600036")
+    waiter, coalesced = coordinator.submit("600036")
+    assert coalesced and waiter is queued
+    
+    coordinator.close()
+    for flight in (running, queued):
+        with pytest.raises(RuntimeError, match="运行已取消"):
+            flight.result(timeout=5)
+    assert queued.events[-1]["stage"] == "error"
+    assert QUEUE_DEPTH.value(queue="coordinator") == baseline
+    assert coordinator.flights == {}
@@ -0,0 +1,46 @@
+# 全市场量化初筛测试
+
+import numpy as np
+
+from src.data.price_store import PriceStore
+from src.tools.screener import UniverseScreener, load_panel
+
+DATES = [20261009, 20261012, 20261013, 20261014, 20261015, 20261016]
+
+def make_store(tmp_path) -> PriceStore:
+    store = PriceStore(str(tmp_path / "prices"))
+    store.append("000001.SZ", {"date": DATES, "close": [10.0, 10.5, 11.0, 11.5, 12.0, 12.5],
+                               "amount": [100.0] * 6})
+    # 10-13、10-14停牌，10-16尚未同步
+    store.append("600036.SH", {"date": [20261009, 20261012, 20261015], "close": [40.0, 41.0, 42.0],
+                               "amount": [200.0, 200.0, 400.0]})
+    return store
+
+def test_panel_aligns_on_dates_with_gaps(tmp_path):
+    panel = load_panel(make_store(tmp_path), ["000001.SZ", "600036.SH"], 5)
+    assert panel["dates"].tolist() == DATES[1:]
+    assert panel["close"][0].tolist() == [10.5, 11.0, 11.5, 12.0, 12.5]
+    close = panel["close"][1]
+    assert close[0] == 41.0 and close[3] == 42.0
+    assert np.isnan(close[[1, 2, 4]]).all()
+    assert panel["last_dates"].tolist() == [20261016, 20261015]
+
+def test_panel_pads_short_history_on_the_left(tmp_path):
+    panel = load_panel(make_store(tmp_path), ["600036.SH"], 8)
+    assert panel["dates"].tolist() == [20261009, 20261012, 20261015]
+    assert np.isnan(panel["close"][0, :5]).all()
+    assert panel["close"][0, 5:].tolist() == [40.0, 41.0, 42.0]
+
+def test_gap_days_are_skipped_by_liquidity_and_break_momentum(tmp_path):
+    screener = UniverseScreener(make_store(tmp_path), {
+        "lookback_bars": 5, "max_stale_days": 7, "weights": {"liquidity": 1.0},
+        "filters": {"momentum": {"window": 2}, "volatility": {"window": 2}, "liquidity": {"window": 4}}})
+    result = screener.screen(codes=["000001.SZ", "600036.SH"])
+    assert [item["ts_code"] for item in result["candidates"]] == ["000001.SZ"]
+    steps = {step["step"]: step["remaining"] for step in result["steps"]}
+    assert steps["最新交易"] == 2 and steps["momentum"] == 1
+
+def test_empty_code_list_screens_nothing(tmp_path):
+    result = UniverseScreener(make_store(tmp_path)).screen(codes=[])
+    assert result["universe"] == 0
+    assert result["candidates"] == []
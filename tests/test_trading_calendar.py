@@ -0,0 +1,54 @@
+# 交易日历与cron表达式测试
+
+from datetime import date, datetime
+
+import pytest
+
+from src.data.trading_calendar import CronSchedule, TradingCalendar
+
+def test_builtin_holidays_are_loaded():
+    calendar = TradingCalendar()
+    assert not calendar.is_trading_day("20251001")
+    assert not calendar.is_trading_day("2026-02-17")
+    assert calendar.is_trading_day("20260930")
+    assert calendar.next_trading_day("20260930") == date(2026, 10, 8)
+    assert calendar.previous_trading_day("20261008") == date(2026, 9, 30)
+
+def test_extra_holidays_and_builtin_switch(tmp_path):
+    holidays_file = tmp_path / "holidays.txt"
+    holidays_file.write_text("# 自定义\n20261104\n", encoding="utf-8")
+    calendar = TradingCalendar(["2026-11-03"], str(holidays_file))
+    assert not calendar.is_trading_day("20261103")
+    assert not calendar.is_trading_day("20261104")
+    assert not calendar.is_trading_day("20261001")
+    assert TradingCalendar(builtin=False).is_trading_day("20261001")
+
+def test_fields_ranges_steps_and_names():
+    schedule = CronSchedule("*/15 9-11,14 1 1-3 mon-fri")
+    assert schedule.minutes == {0, 15, 30, 45}
+    assert schedule.hours == {9, 10, 11, 14}
+    assert schedule.months == {1, 2, 3}
+    assert schedule.weekdays == {1, 2, 3, 4, 5}
+    assert CronSchedule("0 0 * * 7").weekdays == {0}
+
+@pytest.mark.parametrize("expression", ["0 0 * *", "60 0 * * *", "0 24 * * *", "0 0 0 * *", "0 0 * 13 *"])
+def test_invalid_expressions_raise(expression):
+    with pytest.raises(ValueError):
+        CronSchedule(expression)
+
+def test_trading_day_field_skips_weekends_and_holidays():
+    schedule = CronSchedule("30 16 * * T")
+    assert schedule.upcoming(datetime(2026, 9, 30, 17, 0), 3) == [
+        datetime(2026, 10, 8, 16, 30), datetime(2026, 10, 9, 16, 30), datetime(2026, 10, 12, 16, 30)]
+    # 触发时刻之前查询时返回当天
+    assert schedule.next_after(datetime(2026, 9, 30, 16, 29, 59)) == datetime(2026, 9, 30, 16, 30)
+
+def test_aliases():
+    assert CronSchedule("@after_close").expression == "30 15 * * T"
+    assert CronSchedule("@daily").next_after(datetime(2026, 10, 1, 12, 0)) == datetime(2026, 10, 2, 0, 0)
+
+def test_day_and_weekday_restrictions_are_or_ed():
+    schedule = CronSchedule("0 9 1 * mon")
+    # 2026-10-01是周四（日字段匹配），10-05是周一（周字段匹配）
+    assert schedule.upcoming(datetime(2026, 9, 30, 12, 0), 2) == [datetime(2026, 10, 1, 9, 0), datetime(2026, 10, 5, 9, 0)]
+    assert not CronSchedule("0 9 1 * *").matches_day(date(2026, 10, 5))
@@ -0,0 +1,80 @@
+# 自选股定时运行测试
+
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+from src.agents.watchlist_scheduler import WatchlistScheduler
+
+class FakeTeam:
+    """每次运行消耗固定token的替身团队"""
+    
+    def __init__(self, tokens_per_run: int = 100, fail_init: bool = False):
+        self.tokens_per_run = tokens_per_run
+        self.fail_init = fail_init
+        self.agents = {"analyst": SimpleNamespace(token_usage={"input_tokens": 0, "output_tokens": 0})}
+        self.runs = []
+        self.closed = False
+    
+    async def initialize_team(self):
+        if self.fail_init:
+            raise RuntimeError("模型服务不可用")
+    
+    async def run_stock(self, stock_code: str, incremental: bool = True):
+        await asyncio.sleep(0.01)
+        self.runs.append(stock_code)
+        self.agents["analyst"].token_usage["output_tokens"] += self.tokens_per_run
+        return {"run_id": f"run-{stock_code}", "final_decisions": [{}]}
+    
+    async def close_team(self):
+        self.closed = True
+
+def make_scheduler(teams, **config) -> WatchlistScheduler:
+    config = {"start_interval_seconds": 0, "jitter_seconds": 0, "report_dir": "", **config}
+    pending = list(teams)
+    return WatchlistScheduler(config, lambda: pending.pop(0))
+
+def statuses(report):
+    return [(item["stock_code"], item["status"]) for item in report["results"]]
+
+def test_runs_stop_when_budget_would_be_exceeded():
+    team = FakeTeam()
+    scheduler = make_scheduler([team], token_budget=250, estimated_tokens_per_run=100)
+    report = asyncio.run(scheduler.run_once(["A", "B", "C"]))
+    assert statuses(report) == [("A", "ok"), ("B", "ok"), ("C", "skipped_budget")]
+    assert report["tokens_used"] == 200
+    assert team.closed
+
+def test_in_flight_runs_reserve_budget():
+    # 第一次运行进行中时已预留预估额度，第二个槽位不能再启动
+    scheduler = make_scheduler([FakeTeam(), FakeTeam()], max_concurrency=2, token_budget=150,
+                               estimated_tokens_per_run=100)
+    report = asyncio.run(scheduler.run_once(["A", "B"]))
+    assert statuses(report) == [("A", "ok"), ("B", "skipped_budget")]
+
+def test_failed_slot_returns_stock_to_queue():
+    healthy = FakeTeam()
+    scheduler = make_scheduler([FakeTeam(fail_init=True), healthy], max_concurrency=2)
+    report = asyncio.run(scheduler.run_once(["A", "B"]))
+    assert statuses(report) == [("A", "ok"), ("B", "ok")]
+    assert sorted(healthy.runs) == ["A", "B"]
+
+def test_deadline_is_not_rolled_over_for_late_batches():
+    scheduler = make_scheduler([], cron="30 16 * * T", deadline="19:00")
+    assert scheduler.deadline_for(datetime(2026, 10, 9, 16, 30)) == datetime(2026, 10, 9, 19, 0)
+    assert scheduler.deadline_for(datetime(2026, 10, 9, 20, 15)) == datetime(2026, 10, 9, 19, 0)
+    # 手动运行早于触发时刻时截止时间仍在当天
+    assert scheduler.deadline_for(datetime(2026, 10, 9, 10, 0)) == datetime(2026, 10, 9, 19, 0)
+    assert make_scheduler([]).deadline_for(datetime(2026, 10, 9, 16, 30)) is None
+
+def test_deadline_after_midnight_belongs_to_next_day():
+    scheduler = make_scheduler([], cron="0 22 * * T", deadline="02:00")
+    assert scheduler.deadline_for(datetime(2026, 10, 9, 22, 0)) == datetime(2026, 10, 10, 2, 0)
+    # 凌晨补跑的是前一天的批次
+    assert scheduler.deadline_for(datetime(2026, 10, 10, 1, 0)) == datetime(2026, 10, 10, 2, 0)
+
+def test_report_records_missed_deadline():
+    scheduler = make_scheduler([FakeTeam()], deadline="17:00")
+    report = asyncio.run(scheduler.run_once(["A"], scheduled_at=datetime(2026, 10, 9, 16, 30)))
+    assert report["met_deadline"] is False
+    assert report["slack_seconds"] < 0